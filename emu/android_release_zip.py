@@ -12,6 +12,8 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 import collections
+import functools
+import hashlib
 import logging
 import os
 import shutil
@@ -42,6 +44,37 @@ API_LETTER_MAPPING = {
     "33": "T",
 }
 
+# Granularity at which holes are detected when extracting sparse files.
+SPARSE_BLOCK_SIZE = 64 * 1024
+
+
+# Extension of the file next to a zip that holds its digest, so later runs do not hash it again.
+DIGEST_SUFFIX = ".sha256"
+
+
+@functools.lru_cache(maxsize=None)
+def _file_sha256(path: str, size: int, mtime_ns: int) -> str:
+    key = [str(size), str(mtime_ns)]
+    sidecar = path + DIGEST_SUFFIX
+    try:
+        with open(sidecar, "r", encoding="utf-8") as fd:
+            cached = fd.read().split()
+        if cached[:2] == key and len(cached) == 3:
+            return cached[2]
+    except OSError:
+        pass
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as fd:
+        for chunk in iter(lambda: fd.read(1024 * 1024), b""):
+            digest.update(chunk)
+    try:
+        with open(sidecar, "w", encoding="utf-8") as fd:
+            fd.write(" ".join(key + [digest.hexdigest()]) + "\n")
+    except OSError as err:
+        logging.debug("Unable to store the digest of %s due to %s", path, err)
+    return digest.hexdigest()
+
 
 def api_codename(api):
     """First letter of the desert, if any."""
@@ -103,6 +136,14 @@ class AndroidReleaseZip(object):
             return self.props.get("Pkg.BuildId")
         return self.revision()
 
+    def sha256(self) -> str:
+        """The sha256 of the zip file, computed once per path, size and modification time.
+
+        The digest is stored next to the zip file, so it is not computed again by later runs.
+        """
+        stat = os.stat(self.file_name)
+        return _file_sha256(os.path.abspath(self.file_name), stat.st_size, stat.st_mtime_ns)
+
     def is_system_image(self) -> bool:
         """True if this zip file contains a system image."""
         return (
@@ -132,21 +173,54 @@ class AndroidReleaseZip(object):
             logging.warning("Will not copy to itself, ignoring..")
             return self.file_name
 
-    def extract(self, destination: str) -> None:
+    def extract(self, destination: str, sparse: bool = False) -> None:
         """Extract this release zip to the given destination
 
         Args:
             destination (str): The destination to extract the zipfile to.
+            sparse (bool, optional): Write blocks of zeros as holes, so disk images
+                like userdata.img and system.img only take the space they use.
         """
 
         zip_file = zipfile.ZipFile(self.file_name)
         print(f"Extracting: {self.file_name} -> {destination}")
         for info in tqdm(iterable=zip_file.infolist(), total=len(zip_file.infolist())):
-            filename = zip_file.extract(info, path=destination)
+            if sparse and not info.is_dir():
+                filename = self._extract_sparse(zip_file, info, destination)
+            else:
+                filename = zip_file.extract(info, path=destination)
             mode = info.external_attr >> 16
             if mode:
                 os.chmod(filename, mode)
 
+    def _extract_sparse(
+        self, zip_file: zipfile.ZipFile, info: zipfile.ZipInfo, destination: str
+    ) -> str:
+        """Extracts a single member, seeking over blocks of zeros instead of writing them.
+
+        Returns:
+            str: The path of the extracted file.
+        """
+        root = os.path.realpath(destination)
+        filename = os.path.realpath(os.path.join(root, info.filename))
+        if os.path.commonpath([root, filename]) != root:
+            raise NotAZipfile(f"{info.filename} would be extracted outside of {destination}")
+
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        zero_block = bytes(SPARSE_BLOCK_SIZE)
+        with zip_file.open(info) as src, open(filename, "wb") as dst:
+            while True:
+                block = src.read(SPARSE_BLOCK_SIZE)
+                if not block:
+                    break
+                if block == zero_block[: len(block)]:
+                    dst.seek(len(block), os.SEEK_CUR)
+                else:
+                    dst.write(block)
+            # Materialize a trailing hole, if any.
+            dst.truncate()
+        return filename
+
 
 class SystemImageReleaseZip(AndroidReleaseZip):
     """An Android Release Zipfile containing an emulator system image."""
@@ -0,0 +1,220 @@
+# Copyright 2026 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Keeps the large files of a build context out of git.
+
+Large files and directories of a build context are uploaded to a content
+addressed store, where they live under sha256/<digest>. The context gets an
+artifacts.lock that lists them by digest, and a .gitignore that keeps them
+out of the repository. The build fetches them back with fetch-artifacts.sh,
+which verifies every digest.
+
+The store is either a directory, which is useful for testing, or an http(s)
+endpoint that accepts PUT requests.
+"""
+import abc
+import gzip
+import hashlib
+import logging
+import os
+import shutil
+import tarfile
+import tempfile
+from pathlib import Path
+from typing import List, NamedTuple
+
+import requests
+
+LOCK_FILE = "artifacts.lock"
+FETCH_SCRIPT = "fetch-artifacts.sh"
+
+# Top level entries of a build context that are larger than this are stored externally.
+ARTIFACT_THRESHOLD = 1024 * 1024
+
+# Files that are always kept in the build context.
+_KEEP = {LOCK_FILE, ".gitignore", ".dockerignore", ".fingerprint", "Dockerfile"}
+
+
+class ArtifactStoreException(Exception):
+    pass
+
+
+class Artifact(NamedTuple):
+    """An entry of a build context that lives in the store."""
+
+    # Either "file", or "tree" for a directory that is stored as a tar.gz
+    kind: str
+    digest: str
+    # Path relative to the build context.
+    path: str
+
+
+def _sha256(file_name) -> str:
+    digest = hashlib.sha256()
+    with open(file_name, "rb") as handle:
+        for chunk in iter(lambda: handle.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _tree_size(path: Path) -> int:
+    if path.is_file():
+        return path.stat().st_size
+    return sum(entry.stat().st_size for entry in path.rglob("*") if entry.is_file())
+
+
+def _normalize(info: tarfile.TarInfo) -> tarfile.TarInfo:
+    info.mtime = 0
+    info.uid = info.gid = 0
+    info.uname = info.gname = ""
+    return info
+
+
+def pack_tree(directory: Path, dest_file: Path):
+    """Writes the directory as a tar.gz that only depends on the names, modes and contents."""
+    with open(dest_file, "wb") as raw, gzip.GzipFile(filename="", mode="wb", fileobj=raw, mtime=0) as zipped:
+        with tarfile.open(fileobj=zipped, mode="w", format=tarfile.GNU_FORMAT) as tar:
+            tar.add(directory, arcname=".", filter=_normalize)
+
+
+class ArtifactStore(abc.ABC):
+    """A store in which artifacts are addressed by the sha256 of their contents."""
+
+    def __init__(self, location: str):
+        self.location = location
+
+    @property
+    @abc.abstractmethod
+    def url(self) -> str:
+        """The url from which the build fetches the artifacts."""
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    def exists(self, digest: str) -> bool:
+        raise NotImplementedError()
+
+    @abc.abstractmethod
+    def upload(self, file_name: Path, digest: str):
+        raise NotImplementedError()
+
+    def put(self, file_name: Path) -> str:
+        """Stores the file, unless it is already there.
+
+        Returns:
+            str: The digest under which the file is stored.
+        """
+        digest = _sha256(file_name)
+        if self.exists(digest):
+            logging.info("%s is already stored as %s", file_name, digest)
+        else:
+            logging.info("Storing %s as %s", file_name, digest)
+            self.upload(file_name, digest)
+        return digest
+
+
+class LocalArtifactStore(ArtifactStore):
+    """Stores artifacts in a directory."""
+
+    @property
+    def url(self):
+        return Path(self.location).absolute().as_uri()
+
+    def _path(self, digest):
+        return Path(self.location) / "sha256" / digest
+
+    def exists(self, digest):
+        return self._path(digest).exists()
+
+    def upload(self, file_name, digest):
+        dest = self._path(digest)
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        # Copy and rename, so a partial copy is never mistaken for the artifact.
+        handle, tmp = tempfile.mkstemp(dir=dest.parent, prefix=f"{digest}.", suffix=".tmp")
+        os.close(handle)
+        try:
+            shutil.copyfile(file_name, tmp)
+            # Another upload of the same content may have completed in the meantime.
+            if not dest.exists():
+                os.replace(tmp, dest)
+        finally:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+
+
+class HttpArtifactStore(ArtifactStore):
+    """Stores artifacts on an http server that accepts PUT requests."""
+
+    @property
+    def url(self):
+        return self.location.rstrip("/")
+
+    def exists(self, digest):
+        return requests.head(f"{self.url}/sha256/{digest}", timeout=30).status_code == 200
+
+    def upload(self, file_name, digest):
+        with open(file_name, "rb") as data:
+            response = requests.put(f"{self.url}/sha256/{digest}", data=data, timeout=600)
+        if not response.ok:
+            raise ArtifactStoreException(f"Failed to store {file_name}: {response.status_code} {response.reason}")
+
+
+def open_store(location: str) -> ArtifactStore:
+    """The store at location, an http(s) url or a directory."""
+    if location.startswith(("http://", "https://")):
+        return HttpArtifactStore(location)
+    return LocalArtifactStore(location)
+
+
+def externalize(context: Path, store: ArtifactStore, threshold: int = ARTIFACT_THRESHOLD) -> List[Artifact]:
+    """Moves the large entries of the build context into the store.
+
+    The entries stay in place, so the context can still be built locally,
+    but are listed in the .gitignore of the context.
+
+    Args:
+        context (Path): The build context.
+        store (ArtifactStore): The store to upload to.
+        threshold (int, optional): Top level entries larger than this are stored.
+
+    Returns:
+        [Artifact]: The stored entries, as written to the lock file.
+    """
+    context = Path(context)
+    artifacts = []
+    for entry in sorted(context.iterdir()):
+        if entry.name in _KEEP or _tree_size(entry) <= threshold:
+            continue
+        if entry.is_dir():
+            with tempfile.TemporaryDirectory() as tmp:
+                packed = Path(tmp) / "tree.tar.gz"
+                pack_tree(entry, packed)
+                artifacts.append(Artifact("tree", "sha256:" + store.put(packed), entry.name))
+        else:
+            artifacts.append(Artifact("file", "sha256:" + store.put(entry), entry.name))
+
+    lines = [f"store {store.url} -"] + [" ".join(artifact) for artifact in artifacts]
+    (context / LOCK_FILE).write_text("\n".join(lines) + "\n", encoding="utf-8")
+    (context / ".gitignore").write_text(
+        "".join(f"/{artifact.path}\n" for artifact in artifacts), encoding="utf-8"
+    )
+    return artifacts
+
+
+def read_lock(context: Path) -> List[Artifact]:
+    """The artifacts listed in the lock file of the build context."""
+    artifacts = []
+    for line in (Path(context) / LOCK_FILE).read_text(encoding="utf-8").splitlines():
+        kind, digest, path = line.split(" ", 2)
+        if kind != "store":
+            artifacts.append(Artifact(kind, digest, path))
+    return artifacts
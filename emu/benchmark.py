@@ -0,0 +1,311 @@
+# Copyright 2026 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Measures how long emulator images take to boot.
+
+Every run launches a container, and derives the time of each boot phase from
+the timestamped, prefixed log stream written by launch-emulator.sh. Whether adb
+actually responds is probed separately, by polling the device from inside the
+container. All timings are in seconds since the container was created. Recorded runs can be replayed
+through a ReplayImage, so the harness can run without docker or KVM.
+"""
+import json
+import logging
+import os
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import docker
+
+from emu.containers.readiness import BOOT_PATTERNS, parse_line, split_lines
+
+# The boot phases we measure, in the order in which they occur. Every phase is
+# reached at the first log line of the channel that matches the pattern.
+PHASES = [
+    # The launch script is about to exec the emulator.
+    ("emulator_start", "emulator", re.compile(r"^\s*emulator/emulator\s")),
+    # First output of the kernel.
+    ("kernel_boot", "kernel", re.compile(r".")),
+    # Android has booted.
+    ("boot_completed", None, None),
+    # logcat mentions adbd, which only tells us the daemon was started.
+    ("adbd_started", "logcat", re.compile(r"\badbd\b")),
+]
+
+# The container itself was started.
+CONTAINER_START = "container_start"
+
+# adb shell got an answer from the booted device.
+ADB_READY = "adb_ready"
+
+# Polled inside the container, it prints 1 once adb can reach a booted device.
+ADB_PROBE = ["/android/sdk/platform-tools/adb", "shell", "getprop", "sys.boot_completed"]
+
+PERCENTILES = [50, 90, 99]
+
+_TIMESTAMP = re.compile(r"^(\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d)(?:\.(\d+))?Z\s?")
+
+
+def parse_timestamp(value: str) -> Optional[datetime]:
+    """Parses a docker (RFC 3339, nanosecond) timestamp, i.e. 2026-10-19T10:00:00.123456789Z."""
+    match = _TIMESTAMP.match(value)
+    if not match:
+        return None
+    fraction = (match.group(2) or "0")[:6].ljust(6, "0")
+    stamp = datetime.strptime(match.group(1), "%Y-%m-%dT%H:%M:%S")
+    return stamp.replace(microsecond=int(fraction), tzinfo=timezone.utc)
+
+
+def phase_timings(lines, created: datetime) -> Dict[str, float]:
+    """Derives the time at which every phase was reached from timestamped log lines.
+
+    Args:
+        lines: Log lines prefixed with a docker timestamp.
+        created (datetime): The moment the container was created.
+
+    Returns:
+        Dict[str, float]: Seconds since creation for every phase that was reached.
+    """
+    timings = {}
+    for line in lines:
+        stamp = parse_timestamp(line)
+        if stamp is None:
+            continue
+        channel, message = parse_line(_TIMESTAMP.sub("", line, count=1))
+        for phase, phase_channel, pattern in PHASES:
+            if phase in timings:
+                continue
+            if phase == "boot_completed":
+                reached = any(p.search(message) for p in BOOT_PATTERNS)
+            else:
+                reached = channel == phase_channel and pattern.search(message)
+            if reached:
+                timings[phase] = (stamp - created).total_seconds()
+        if len(timings) == len(PHASES):
+            break
+    return timings
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """The pct-th percentile of the values, interpolating between the closest ranks."""
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100
+    lower = int(rank)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (rank - lower)
+
+
+def summarize(runs: List[Dict[str, float]]) -> Dict[str, Dict[str, float]]:
+    """Computes the percentiles of every phase over all the runs."""
+    summary = {}
+    for phase in [CONTAINER_START] + [name for name, _, _ in PHASES] + [ADB_READY]:
+        values = [run[phase] for run in runs if phase in run]
+        if not values:
+            continue
+        summary[phase] = {f"p{pct}": round(percentile(values, pct), 3) for pct in PERCENTILES}
+        summary[phase]["runs"] = len(values)
+    return summary
+
+
+def compare(summary, baseline, tolerance: float = 0.1) -> List[str]:
+    """Compares a summary against a baseline summary.
+
+    Args:
+        tolerance (float, optional): Fraction by which a phase may be slower than the baseline.
+
+    Returns:
+        List[str]: A description of every percentile that regressed.
+    """
+    regressions = []
+    for phase, expected in baseline.items():
+        for pct in PERCENTILES:
+            key = f"p{pct}"
+            if key not in expected:
+                continue
+            actual = summary.get(phase, {}).get(key)
+            if actual is None:
+                regressions.append(f"{phase} was not reached")
+                break
+            if actual > expected[key] * (1 + tolerance):
+                regressions.append(f"{phase} {key}: {actual:.2f}s, baseline {expected[key]:.2f}s")
+    return regressions
+
+
+class BootBenchmark:
+    """Launches an image a number of times, and records the boot phases of every run."""
+
+    def __init__(self, image, runs: int = 5, timeout: float = 600):
+        """Creates a benchmark.
+
+        Args:
+            image (LocalImage): The image to launch, or a ReplayImage.
+            runs (int, optional): The number of times the image is launched.
+            timeout (float, optional): Seconds a single run gets to reach all the phases.
+        """
+        self.image = image
+        self.runs = runs
+        self.timeout = timeout
+
+    def run(self) -> List[Dict[str, float]]:
+        """Runs the benchmark, returning the phase timings of every run."""
+        results = []
+        for idx in range(self.runs):
+            timings = self.run_once()
+            logging.info("Run %d: %s", idx, timings)
+            results.append(timings)
+        return results
+
+    def run_once(self) -> Dict[str, float]:
+        container = self.image.launch({})
+        if container is None:
+            return {}
+        try:
+            container.reload()
+            created = parse_timestamp(container.attrs["Created"])
+            started = parse_timestamp(container.attrs["State"]["StartedAt"])
+            deadline = time.monotonic() + self.timeout
+            # Probe adb while we follow the logs, so its timing does not depend on them.
+            probed = {}
+            stop = threading.Event()
+            probe = threading.Thread(
+                target=lambda: probed.update(at=self.image.wait_for_adb(container, stop)), daemon=True
+            )
+            probe.start()
+            stream = container.logs(stream=True, follow=True, timestamps=True)
+            # Stop following the logs if the device does not reach all the phases in time.
+            timer = threading.Timer(self.timeout, getattr(stream, "close", lambda: None))
+            timer.start()
+            try:
+                timings = phase_timings(split_lines(stream), created)
+                probe.join(max(0, deadline - time.monotonic()))
+            finally:
+                timer.cancel()
+                stop.set()
+                probe.join()
+            timings[CONTAINER_START] = (started - created).total_seconds()
+            if probed.get("at"):
+                timings[ADB_READY] = (probed["at"] - created).total_seconds()
+            return timings
+        finally:
+            container.remove(force=True)
+
+
+class LocalImage:
+    """Launches an image that is available in the local docker daemon."""
+
+    def __init__(self, reference: str):
+        self.reference = reference
+
+    def image_name(self):
+        return self.reference
+
+    def launch(self, port_map):
+        client = docker.from_env()
+        return client.containers.run(
+            image=self.reference,
+            privileged=True,
+            publish_all_ports=not port_map,
+            ports=port_map,
+            devices=["/dev/kvm"] if os.path.exists("/dev/kvm") else [],
+            detach=True,
+        )
+
+    def wait_for_adb(self, container, stop: threading.Event, interval: float = 1) -> Optional[datetime]:
+        """Polls adb inside the container until the booted device answers.
+
+        The moment is taken from the local clock, which is the clock of the
+        docker daemon that timestamped the container.
+
+        Args:
+            container (Container): The launched container.
+            stop (threading.Event): Set when we should give up.
+            interval (float, optional): Seconds between two probes.
+
+        Returns:
+            Optional[datetime]: When adb answered, or None if we gave up.
+        """
+        while not stop.is_set():
+            try:
+                result = container.exec_run(ADB_PROBE)
+                if result.exit_code == 0 and result.output.strip() == b"1":
+                    return datetime.now(timezone.utc)
+            except docker.errors.APIError as err:
+                logging.debug("adb probe failed: %s", err)
+            stop.wait(interval)
+        return None
+
+
+class ReplayContainer:
+    """A stand-in for a docker container that replays a recorded log."""
+
+    def __init__(self, name, recording):
+        self.name = name
+        self.attrs = {
+            "Created": recording["created"],
+            "State": {"StartedAt": recording["started_at"]},
+        }
+        self.log = recording["log"]
+        self.adb_ready_at = recording.get("adb_ready_at")
+        self.removed = False
+
+    def reload(self):
+        pass
+
+    def logs(self, **kwargs):
+        return iter([line.encode("utf-8") + b"\n" for line in self.log])
+
+    def remove(self, **kwargs):
+        self.removed = True
+
+
+class ReplayImage:
+    """A stand-in for an image, every launch replays the next recorded run.
+
+    A recording is a json list of runs, each holding the "created" and
+    "started_at" timestamps of the container, and its "log" as written by
+    docker logs --timestamps. The optional "adb_ready_at" timestamp records
+    when the adb probe succeeded.
+    """
+
+    def __init__(self, recordings: List[Dict]):
+        self.recordings = recordings
+        self.launched = 0
+
+    @staticmethod
+    def from_file(path: Path) -> "ReplayImage":
+        return ReplayImage(json.loads(Path(path).read_text(encoding="utf-8")))
+
+    def image_name(self):
+        return "replay"
+
+    def launch(self, port_map):
+        recording = self.recordings[self.launched % len(self.recordings)]
+        self.launched += 1
+        return ReplayContainer(f"replay-{self.launched}", recording)
+
+    def wait_for_adb(self, container, stop):
+        if container.adb_ready_at is None:
+            return None
+        return parse_timestamp(container.adb_ready_at)
+
+
+def load_baseline(path: Path) -> Dict[str, Dict[str, float]]:
+    return json.loads(Path(path).read_text(encoding="utf-8"))
+
+
+def save_baseline(path: Path, summary: Dict[str, Dict[str, float]]):
+    Path(path).write_text(json.dumps(summary, indent=2, sort_keys=True), encoding="utf-8")
@@ -11,20 +11,38 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
-import itertools
+import collections
+import heapq
+import json
 import logging
 import os
 import re
+import shlex
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 import yaml
 
+import emu.artifact_store as artifact_store
 import emu.emu_downloads_menu as emu_downloads_menu
 from emu.containers.emulator_container import EmulatorContainer
+from emu.containers.metrics_container import MetricsContainer
 from emu.containers.system_image_container import SystemImageContainer
 from emu.emu_downloads_menu import accept_licenses
-from emu.template_writer import TemplateWriter
+from emu.platform_tools import PlatformTools
+from emu.template_writer import Render, TemplateWriter, write_all
+
+# Index of the configs written when sharding a build.
+SHARD_INDEX = "shards.json"
+# Bounds of a shard timeout, cloud build does not accept more than 24 hours.
+SHARD_MIN_TIMEOUT = 3600
+SHARD_MAX_TIMEOUT = 86400
+# Fixed cost of a step (pulling base images, pushing), and the build throughput.
+SHARD_STEP_SECONDS = 600
+SHARD_BYTES_PER_SECOND = 1024 * 1024
+# Assumed size of an image when the catalog does not list one.
+UNKNOWN_BUILD_SIZE = 2 * 1024 * 1024 * 1024
 
 
 def mkdir_p(path):
@@ -33,35 +51,237 @@ def mkdir_p(path):
         os.makedirs(path)
 
 
-def git_commit_and_push(dest):
+def git_commit_and_push(dest, paths=None):
     """Commit and pushes this cloud build to the git repo.
 
     Note that this can be *EXTREMELY* slow as you will likely
-    have very large objects in your repo.
+    have very large objects in your repo, unless they are kept
+    in an artifact store.
 
     Args:
         dest ({string}): The destination of the git repository.
+        paths ([string], optional): Only add these paths, everything is added when None.
     """
-    subprocess.check_call(["git", "add", "--verbose", "*"], cwd=dest)
+    subprocess.check_call(["git", "add", "--verbose", "--all"] + (paths or ["*"]), cwd=dest)
     subprocess.check_call(["git", "commit", "-F", "README.MD"], cwd=dest)
     subprocess.check_call(["git", "push"], cwd=dest)
 
 
-def create_build_step(for_container, destination):
+def create_build_step(for_container, destination, force=False, store=None):
+    """Writes the build context of the container, returning its cloud build step.
+
+    Build contexts that were written before from the same inputs are left as is,
+    unless force is set. No step is created for images that are already in the
+    registry. When a store is given the large files of the context are uploaded
+    to it, and the step fetches them before building.
+    """
     build_destination = Path(destination) / for_container.image_name()
     logging.info("Generating %s", build_destination)
-    for_container.write(build_destination)
-    if for_container.can_pull():
+    if force:
+        for_container.write(build_destination)
+    elif not for_container.write_if_changed(build_destination):
+        logging.info("%s is unchanged, reusing the existing context.", for_container.image_name())
+    if for_container.in_registry():
         logging.warning("Container already available, no need to create step.")
         return {}
 
     step = for_container.create_cloud_build_step(for_container.image_name())
-    step["waitFor"] = ["-"]
+    if store:
+        artifact_store.externalize(build_destination, store)
+        step = fetch_before_build(step, for_container.image_name())
+    step["waitFor"] = [for_container.depends_on()]
     step["id"] = for_container.image_name()
     logging.info("Adding step: %s", step)
     return step
 
 
+def fetch_before_build(step, context):
+    """Turns the docker build step into one that first fetches the artifacts of the context."""
+    fetch = f"bash {artifact_store.FETCH_SCRIPT} {shlex.quote(context)}"
+    return dict(step, entrypoint="bash", args=["-c", f"{fetch} && docker {shlex.join(step['args'])}"])
+
+
+def schedule_steps(steps, max_parallel=0):
+    """Orders the steps so that every step follows the steps it waits for.
+
+    Dependencies on steps that are not part of the build are dropped, these
+    images are expected to be available in the registry. When max_parallel is
+    set the steps are divided over that many lanes, a step waits for the step
+    before it in its lane, so no more than max_parallel steps run at once.
+
+    Args:
+        steps ([dict]): The cloud build steps, with an id and waitFor.
+        max_parallel (int, optional): The maximum number of concurrent steps, 0 for no limit.
+
+    Returns:
+        [dict]: The steps in the order in which they can run.
+    """
+    by_id = {step["id"]: step for step in steps}
+    ordered = []
+    done = set()
+    visiting = set()
+
+    def visit(step):
+        if step["id"] in done:
+            return
+        if step["id"] in visiting:
+            raise ValueError(f"Build steps form a cycle at {step['id']}")
+        visiting.add(step["id"])
+        for dep in step["waitFor"]:
+            if dep in by_id:
+                visit(by_id[dep])
+            elif dep != "-":
+                logging.warning("%s waits for %s, which is not built, assuming it can be pulled.", step["id"], dep)
+        done.add(step["id"])
+        ordered.append(step)
+
+    for step in steps:
+        visit(step)
+
+    for idx, step in enumerate(ordered):
+        wait_for = [dep for dep in step["waitFor"] if dep in by_id]
+        if max_parallel and idx >= max_parallel:
+            lane = ordered[idx - max_parallel]["id"]
+            if lane not in wait_for:
+                wait_for.append(lane)
+        step["waitFor"] = wait_for or ["-"]
+    return ordered
+
+
+def image_build_steps(img, emulator_zips, repo, dest, sys=False, force=False, store=None, platform_tools=None):
+    """Writes the build contexts of a single system image, and the emulators using it.
+
+    Args:
+        img: A SysImgInfo, or the path to a system image zip file.
+        emulator_zips ([str]): The emulator zip files to combine with the system image.
+        repo (str): The repository of the images.
+        dest (str): The directory in which the build contexts are written.
+        sys (bool, optional): Only write the system image context.
+        force (bool, optional): Rewrite contexts that did not change.
+        store (ArtifactStore, optional): Store for the large files of the contexts.
+        platform_tools (str, optional): The platform tools zip to take adb from.
+
+    Returns:
+        ([(dict, DockerContainer)], [DockerContainer]): The build steps with their
+            container, and all the emulator containers, with and without metrics, built or not.
+    """
+    built = []
+    emulator_containers = []
+    system_container = SystemImageContainer(img, repo, platform_tools=platform_tools)
+    if sys:
+        logging.info("Processing %s", img)
+        step = create_build_step(system_container, dest, force, store)
+        if step:
+            built.append((step, system_container))
+        return built, emulator_containers
+
+    for emu in emulator_zips:
+        logging.info("Processing %s, %s", img, emu)
+        emulator_container = EmulatorContainer(emu, system_container, repo, False)
+        dependency = emulator_container.depends_on()
+        if dependency != "-" and dependency not in [step["id"] for step, _ in built]:
+            # The system image is not in the registry, so it has to be built
+            # before the emulator, regardless of whether its context changed.
+            step = create_build_step(system_container, dest, True, store)
+            if step:
+                built.append((step, system_container))
+
+        # The image with metrics is a single layer on top of the one without.
+        metrics_container = MetricsContainer(emulator_container)
+        emulator_containers.extend([metrics_container, emulator_container])
+        for container in [emulator_container, metrics_container]:
+            step = create_build_step(container, dest, force, store)
+            if step:
+                built.append((step, container))
+    return built, emulator_containers
+
+
+def balance_shards(costs, shards):
+    """Divides the groups over the shards, so every shard gets about the same cost.
+
+    The most expensive group is repeatedly assigned to the cheapest shard.
+
+    Args:
+        costs (dict): The cost of every group.
+        shards (int): The number of shards.
+
+    Returns:
+        [[str]]: The groups of every shard, shards can be empty.
+    """
+    assignment = [[] for _ in range(shards)]
+    loads = [(0, idx) for idx in range(shards)]
+    for group in sorted(costs, key=lambda name: (-costs[name], name)):
+        load, idx = heapq.heappop(loads)
+        assignment[idx].append(group)
+        heapq.heappush(loads, (load + costs[group], idx))
+    return assignment
+
+
+def shard_timeout(step_count, size):
+    """Estimated number of seconds a shard needs to build step_count images of size bytes."""
+    estimate = step_count * SHARD_STEP_SECONDS + size // SHARD_BYTES_PER_SECOND
+    return min(SHARD_MAX_TIMEOUT, max(SHARD_MIN_TIMEOUT, estimate))
+
+
+def write_shards(dest, steps, images, sizes, groups, shards, max_parallel=0, options=None):
+    """Splits the steps over several cloud build configs, with an index in shards.json.
+
+    Steps that share a system image stay in the same shard, so an emulator
+    step always lives next to the system image step it waits for. The shards
+    are balanced on the size of the images they build.
+
+    Args:
+        dest (str): The directory to write the configs to.
+        steps ([dict]): All the build steps.
+        images (dict): The image pushed by a step, by step id.
+        sizes (dict): The estimated size of the image of a step, by step id, None if unknown.
+        groups (dict): The system image of a step, by step id.
+        shards (int): The number of configs to create.
+        max_parallel (int, optional): The maximum number of concurrent steps within a shard.
+        options (dict, optional): Cloud build options for every shard.
+
+    Returns:
+        [str]: The written files, relative to dest.
+    """
+    costs = collections.Counter()
+    for step in steps:
+        size = sizes.get(step["id"])
+        costs[groups[step["id"]]] += UNKNOWN_BUILD_SIZE if size is None else size
+
+    index = []
+    for shard_groups in balance_shards(costs, shards):
+        shard_steps = [step for step in steps if groups[step["id"]] in shard_groups]
+        if not shard_steps:
+            continue
+        name = f"cloudbuild-{len(index) + 1}.yaml"
+        ids = [step["id"] for step in shard_steps]
+        size = sum(costs[group] for group in shard_groups)
+        timeout = f"{shard_timeout(len(shard_steps), size)}s"
+        cloudbuild = {
+            "steps": schedule_steps(shard_steps, max_parallel),
+            "images": [images[step_id] for step_id in ids if step_id in images],
+            "timeout": timeout,
+        }
+        if options:
+            cloudbuild["options"] = options
+        logging.info("Writing shard %s with %d steps in %s", name, len(shard_steps), dest)
+        with open(os.path.join(dest, name), "w", encoding="utf-8") as ymlfile:
+            yaml.dump(cloudbuild, ymlfile)
+        index.append(
+            {
+                "config": name,
+                "timeout": timeout,
+                "estimated_bytes": size,
+                "steps": ids,
+                "images": cloudbuild["images"],
+            }
+        )
+
+    with open(os.path.join(dest, SHARD_INDEX), "w", encoding="utf-8") as index_file:
+        json.dump({"shards": index}, index_file, indent=2)
+    return [shard["config"] for shard in index] + [SHARD_INDEX]
+
+
 def cloud_build(args):
     """Prepares the cloud build yaml and all its dependencies.
 
@@ -88,45 +308,77 @@ def cloud_build(args):
         logging.warning("Treating %s as a build id", emulator_zip[0])
         emulator_zip = [emu_downloads_menu.download_build(emulator_zip[0])]
 
+    force = getattr(args, "force", False)
     steps = []
-    images = []
+    images = {}
+    sizes = {}
+    groups = {}
     emulators = set()
     emulator_images = []
+    changed = []
 
-    for (img, emu) in itertools.product(image_zip, emulator_zip):
-        logging.info("Processing %s, %s", img, emu)
-        system_container = SystemImageContainer(img, args.repo)
-        if args.sys:
-            steps.append(create_build_step(system_container, args.dest))
-        else:
-            for metrics in [True, False]:
-                emulator_container = EmulatorContainer(emu, system_container, args.repo, metrics)
+    store = None
+    configs = []
+    if getattr(args, "artifact_store", None):
+        store = artifact_store.open_store(args.artifact_store)
+        TemplateWriter(args.dest).write_template(artifact_store.FETCH_SCRIPT, {})
+        configs.append(artifact_store.FETCH_SCRIPT)
+
+    # Every system image context gets adb from the same zip, download it before
+    # the jobs start so they do not download it to the same file at once.
+    platform_tools = PlatformTools().download()
+
+    def write_contexts(img):
+        return image_build_steps(img, emulator_zip, args.repo, args.dest, args.sys, force, store, platform_tools)
+
+    # Once adb is available writing a context and probing the registry are
+    # independent for every system image, map keeps the results in matrix order.
+    with ThreadPoolExecutor(max_workers=getattr(args, "jobs", 4)) as executor:
+        for built, emulator_containers in executor.map(write_contexts, image_zip):
+            for emulator_container in emulator_containers:
                 emulators.add(emulator_container.props["emu_build_id"])
-                steps.append(create_build_step(emulator_container, args.dest))
-                images.append(emulator_container.full_name())
                 emulator_images.append(emulator_container.full_name())
+            for step, container in built:
+                steps.append(step)
+                changed.append(container.image_name())
+                sizes[step["id"]] = container.build_size()
+                groups[step["id"]] = getattr(container, "system_image_container", container).image_name()
+                if not args.sys:
+                    images[step["id"]] = container.full_name()
 
-    cloudbuild = {"steps": steps, "images": images, "timeout": "21600s"}
-    logging.info("Writing cloud yaml [%s] in %s", yaml, args.dest)
-    with open(os.path.join(args.dest, "cloudbuild.yaml"), "w", encoding="utf-8") as ymlfile:
-        yaml.dump(cloudbuild, ymlfile)
-
-    writer = TemplateWriter(args.dest)
-    writer.write_template(
-        "cloudbuild.README.MD",
-        {"emu_version": ", ".join(emulators),
-         "emu_images": "\n".join([f"* {x}" for x in emulator_images])},
-        rename_as="README.MD",
-    )
-    writer.write_template(
-        "registry.README.MD",
-        {
-            "emu_version": ", ".join(emulators),
-            "emu_images": "\n".join([f"* {x}" for x in images]),
-            "first_image": next(iter(images), None),
-        },
-        rename_as="REGISTRY.MD",
+    logging.info("%d build contexts changed", len(changed))
+    options = {}
+    machine_type = getattr(args, "machine_type", None)
+    if machine_type:
+        options["machineType"] = machine_type
+    max_parallel = getattr(args, "max_parallel", 0)
+    shards = getattr(args, "shards", 1)
+    if shards > 1:
+        configs += write_shards(args.dest, steps, images, sizes, groups, shards, max_parallel, options)
+    else:
+        cloudbuild = {
+            "steps": schedule_steps(steps, max_parallel),
+            "images": list(images.values()),
+            "timeout": "21600s",
+        }
+        if options:
+            cloudbuild["options"] = options
+        logging.info("Writing cloud yaml [%s] in %s", yaml, args.dest)
+        with open(os.path.join(args.dest, "cloudbuild.yaml"), "w", encoding="utf-8") as ymlfile:
+            yaml.dump(cloudbuild, ymlfile)
+        configs.append("cloudbuild.yaml")
+
+    docs = {
+        "emu_version": ", ".join(emulators),
+        "emu_images": "\n".join([f"* {x}" for x in emulator_images]),
+        "first_image": next(iter(emulator_images), None),
+    }
+    write_all(
+        [
+            Render(args.dest, "cloudbuild.README.MD", docs, "README.MD"),
+            Render(args.dest, "registry.README.MD", docs, "REGISTRY.MD"),
+        ]
     )
 
     if args.git:
-        git_commit_and_push(args.dest)
+        git_commit_and_push(args.dest, configs + ["README.MD", "REGISTRY.MD"] + changed)
@@ -0,0 +1,123 @@
+# Copyright 2026 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import logging
+import subprocess
+import tempfile
+from pathlib import Path
+from typing import List, Optional
+
+
+class BuildxBuilder:
+    """Builds docker images with BuildKit by driving `docker buildx build`.
+
+    Layers are imported from, and exported to, a registry cache so ephemeral
+    build hosts can reuse the apt and unzip layers of earlier builds.
+
+    Every image is built with inline cache metadata, and previously pushed
+    images are used as a cache source. This works with the default docker
+    driver. Exporting a separate registry cache (cache_repo) requires a builder
+    that uses the docker-container driver, for example one created with:
+
+        docker buildx create --name emu --driver docker-container
+
+    Note that a docker-container builder cannot see images that only exist
+    in the local daemon, so the system image must be available in the
+    registry before an emulator image can be built on top of it.
+    """
+
+    CACHE_TAG = "buildcache"
+
+    def __init__(
+        self,
+        cache_repo: Optional[str] = None,
+        cache_mode: str = "max",
+        inline_cache: bool = True,
+        builder: Optional[str] = None,
+    ):
+        """Creates a buildx builder.
+
+        Args:
+            cache_repo (str, optional): Repository used to import and export the build cache.
+            cache_mode (str, optional): Export mode of the registry cache, "min" or "max".
+            inline_cache (bool, optional): Embed cache metadata in the built image.
+            builder (str, optional): Name of the buildx builder instance to use.
+        """
+        if cache_repo and cache_repo[-1] != "/":
+            cache_repo += "/"
+        self.cache_repo = cache_repo
+        self.cache_mode = cache_mode
+        self.inline_cache = inline_cache
+        self.builder = builder
+
+    def cache_ref(self, image_name: str) -> Optional[str]:
+        """The registry reference holding the build cache of the given image, if any."""
+        if not self.cache_repo:
+            return None
+        return f"{self.cache_repo}{image_name}:{BuildxBuilder.CACHE_TAG}"
+
+    def command(
+        self,
+        dest: Path,
+        tag: str,
+        image_name: str,
+        latest: Optional[str],
+        platform: str,
+        iidfile: Path,
+    ) -> List[str]:
+        """The buildx command line that builds the context in dest.
+
+        Args:
+            dest (Path): The directory containing the Dockerfile and build context.
+            tag (str): The tag to give the image.
+            image_name (str): The image name, used to derive the cache reference.
+            latest (str, optional): A previously published image to import inline cache from.
+            platform (str): The platform to build for.
+            iidfile (Path): File to which buildx writes the image id.
+
+        Returns:
+            List[str]: The command to execute.
+        """
+        cmd = ["docker", "buildx", "build"]
+        if self.builder:
+            cmd += ["--builder", self.builder]
+        cmd += ["--platform", platform, "--load", "--iidfile", str(iidfile), "-t", tag]
+
+        if latest:
+            cmd += ["--cache-from", f"type=registry,ref={latest}"]
+
+        cache_ref = self.cache_ref(image_name)
+        if cache_ref:
+            cmd += ["--cache-from", f"type=registry,ref={cache_ref}"]
+            cmd += ["--cache-to", f"type=registry,ref={cache_ref},mode={self.cache_mode}"]
+
+        if self.inline_cache:
+            cmd += ["--cache-to", "type=inline"]
+
+        cmd.append(str(dest.absolute()))
+        return cmd
+
+    def build(
+        self, dest: Path, tag: str, image_name: str, latest: Optional[str], platform: str
+    ) -> Optional[str]:
+        """Builds the context in dest, returning the image id or None in case of failure."""
+        with tempfile.TemporaryDirectory() as tmp:
+            iidfile = Path(tmp) / "iid"
+            cmd = self.command(dest, tag, image_name, latest, platform, iidfile)
+            logging.info("Building: %s", " ".join(cmd))
+            try:
+                subprocess.check_call(cmd)
+            except (OSError, subprocess.CalledProcessError) as err:
+                logging.error("Failed to build %s due to %s", tag, err)
+                return None
+            return iidfile.read_text(encoding="utf-8").strip()
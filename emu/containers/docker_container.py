@@ -1,15 +1,24 @@
 import abc
+import hashlib
+import json
 import logging
 import os
 import re
 import shutil
 from pathlib import Path
-from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Optional
 
 import docker
 from docker.models.images import Image
 
-from emu.containers.progress_tracker import ProgressTracker
+from emu import tracing
+from emu.containers.progress_tracker import AggregateProgressTracker, ProgressTracker
+from emu.containers.resource_profile import (
+    DATA_PARTITION_LABEL,
+    DEFAULT_DATA_PARTITION,
+    ephemeral_tmpfs,
+)
 
 
 class DockerContainer:
@@ -24,10 +33,14 @@ class DockerContainer:
     # Update this once arm is really an option.
     DEFAULT_PLATFORM = "linux/amd64"
 
+    # Holds the fingerprint of the inputs a build context was written from.
+    FINGERPRINT_FILE = ".fingerprint"
+
     def __init__(self, repo: Optional[str] = None):
         if repo and repo[-1] != "/":
             repo += "/"
         self.repo: Optional[str] = repo
+        self._in_registry: Optional[bool] = None
 
     def get_client(self) -> docker.DockerClient:
         return docker.from_env()
@@ -48,39 +61,89 @@ class DockerContainer:
         logging.info(api_client.version())
         return api_client
 
-    def push(self) -> None:
-        image: str = self.full_name()
+    def push(self) -> Optional[str]:
+        """Pushes this image to the repository.
+
+        Returns the digest of the pushed image, or None in case of failure.
+        """
         print(
             f"Pushing docker image: {self.full_name()}.. be patient this can take a while!"
         )
+        return self._push(ProgressTracker())
 
-        tracker: ProgressTracker = ProgressTracker()
-        try:
-            client: docker.DockerClient = docker.from_env()
-            result = client.images.push(image, "latest", stream=True, decode=True)
-            for entry in result:
-                tracker.update(entry)
-            self.docker_image().tag(f"{self.repo}{self.image_name()}:latest")
-        except docker.errors.APIError as err:
-            logging.error("Failed to push image due to %s", err, exc_info=True)
-            logging.warning("You can manually push the image as follows:")
-            logging.warning("docker push %s", image)
+    def _push(self, tracker) -> Optional[str]:
+        """Pushes this image, reporting the progress to the given tracker.
 
-    def launch(self, port_map) -> Image:
-        """Launches the container with the given sha, publishing adb on port 5555, and gRPC on port 8554
+        Returns the digest of the pushed image, or None in case of failure.
+        """
+        image: str = self.full_name()
+        digest: Optional[str] = None
+        with tracing.span("docker", "push", image=image):
+            try:
+                client: docker.DockerClient = docker.from_env()
+                result = client.images.push(image, "latest", stream=True, decode=True)
+                for entry in result:
+                    tracker.update(entry)
+                    if "error" in entry:
+                        logging.error("Failed to push %s: %s", image, entry["error"])
+                        return None
+                    digest = entry.get("aux", {}).get("Digest", digest)
+                self.docker_image().tag(f"{self.repo}{self.image_name()}:latest")
+            except docker.errors.APIError as err:
+                logging.error("Failed to push image due to %s", err, exc_info=True)
+                logging.warning("You can manually push the image as follows:")
+                logging.warning("docker push %s", image)
+                return None
+
+        return digest
+
+    def launch(self, port_map, profile=None, ephemeral=False, token=None) -> Image:
+        """Launches the container with the given sha, publishing the ports in the port_map.
+
+        All the exposed ports are published on random host ports when the port_map is empty.
+
+        Args:
+            port_map (Dict[str, int]): Container port to host port.
+            profile (ResourceProfile, optional): The cpu, memory and tmpfs limits of the container.
+            ephemeral (bool, optional): Keep /data and /tmp in RAM, sized after the AVD data partition.
+                All userdata is lost when the container is removed.
+            token (str, optional): Console auth token, the emulator console is only
+                forwarded on port 5554 when set.
 
         Returns the container.
         """
         image: Image = self.docker_image()
         client: docker.DockerClient = docker.from_env()
+        resources = {}
+        if ephemeral:
+            partition = (image.labels or {}).get(DATA_PARTITION_LABEL, DEFAULT_DATA_PARTITION)
+            if profile:
+                # Also raises the memory limit, as the tmpfs mounts are accounted to it.
+                profile = profile.ephemeral(partition)
+            else:
+                resources["tmpfs"] = ephemeral_tmpfs(partition)
+        if profile:
+            resources = profile.docker_args()
+            resources["environment"] = profile.environment()
+            logging.info("Launching %s with profile %s", image.id, profile)
+            if not profile.matches_snapshot(image.labels):
+                logging.warning(
+                    "The snapshot of %s was created with other resources than %s, the emulator will cold boot.",
+                    image.id,
+                    profile,
+                )
+        if token:
+            resources.setdefault("environment", {})["TOKEN"] = token
         try:
-            container = client.containers.run(
-                image=image.id,
-                privileged=True,
-                publish_all_ports=True,
-                detach=True,
-                ports=port_map,
-            )
+            with tracing.span("docker", "launch", image=image.id, resources=lambda: sorted(resources)):
+                container = client.containers.run(
+                    image=image.id,
+                    privileged=True,
+                    publish_all_ports=not port_map,
+                    detach=True,
+                    ports=port_map,
+                    **resources,
+                )
             print(f"Launched {container.name} (id:{container.id})")
             print(f"docker logs -f {container.name}")
             print(f"docker stop {container.name}")
@@ -90,8 +153,16 @@ class DockerContainer:
             print("Unable to start the container, try running it as:")
             print(f"./run.sh {image.id}")
 
-    def create_container(self, dest: Path) -> str:
-        """Creates the docker container, returning the sha of the container, or None in case of failure."""
+    def create_container(self, dest: Path, builder=None) -> str:
+        """Creates the docker container, returning the sha of the container, or None in case of failure.
+
+        Args:
+            dest (Path): The directory containing the Dockerfile and build context.
+            builder (BuildxBuilder, optional): Build with BuildKit instead of the legacy builder.
+        """
+        if builder:
+            return self._create_container_buildx(dest, builder)
+
         identity = None
         image_tag = self.full_name()
         print(f"docker build {dest} -t {image_tag}")
@@ -100,17 +171,18 @@ class DockerContainer:
             logging.info(
                 "build(path=%s, tag=%s, rm=True, decode=True)", dest, image_tag
             )
-            result = api_client.build(
-                path=str(dest.absolute()), tag=image_tag, rm=True, decode=True,
-                platform=DockerContainer.DEFAULT_PLATFORM
-            )
-            for entry in result:
-                if "stream" in entry and entry["stream"].strip():
-                    logging.info(entry["stream"])
-                if "aux" in entry and "ID" in entry["aux"]:
-                    identity = entry["aux"]["ID"]
-                if "error" in entry:
-                    logging.error(entry["error"])
+            with tracing.span("docker", "build", image=image_tag):
+                result = api_client.build(
+                    path=str(dest.absolute()), tag=image_tag, rm=True, decode=True,
+                    platform=DockerContainer.DEFAULT_PLATFORM
+                )
+                for entry in result:
+                    if "stream" in entry and entry["stream"].strip():
+                        logging.info(entry["stream"])
+                    if "aux" in entry and "ID" in entry["aux"]:
+                        identity = entry["aux"]["ID"]
+                    if "error" in entry:
+                        logging.error(entry["error"])
             client = docker.from_env()
             image = client.images.get(identity)
             image.tag(self.repo + self.image_name(), "latest")
@@ -121,32 +193,65 @@ class DockerContainer:
 
         return identity
 
-    def clean(self, dest: Path) -> None:
+    def _create_container_buildx(self, dest: Path, builder) -> str:
+        """Creates the docker container using BuildKit, returning the sha of the container, or None in case of failure."""
+        image_tag = self.full_name()
+        latest = f"{self.repo}{self.image_name()}:latest" if self.repo else None
+        print(f"docker buildx build {dest} -t {image_tag}")
+        identity = builder.build(
+            dest, image_tag, self.image_name(), latest, DockerContainer.DEFAULT_PLATFORM
+        )
+        if not identity:
+            logging.warning("You can manually create the container as follows:")
+            logging.warning("docker build -t %s %s", image_tag, dest)
+            return None
+
+        try:
+            client = docker.from_env()
+            client.images.get(identity).tag(self.repo + self.image_name(), "latest")
+        except docker.errors.APIError as err:
+            logging.error("Failed to tag container due to %s.", err, exc_info=True)
+
+        return identity
+
+    def clean(self, dest: Path, keep: Iterable[Path] = ()) -> None:
+        """Empties the destination directory, creating it if needed.
+
+        Args:
+            dest (Path): The directory to clean.
+            keep (Iterable[Path], optional): Files in dest that are about to be rewritten.
+                They are left in place, so files that end up with the same content keep
+                their modification time.
+        """
+        dest = Path(dest)
+        keep = {Path(path).absolute() for path in keep}
         if dest.exists():
-            shutil.rmtree(dest)
+            for entry in dest.absolute().iterdir():
+                _prune(entry, keep)
 
-        dest.mkdir(parents=True)
+        dest.mkdir(parents=True, exist_ok=True)
 
     def pull(self) -> Image:
         """Tries to retrieve the given image and tag.
 
         Return True if succeeded, False when failed.
         """
-        client = self.get_api_client()
-        try:
-            tracker = ProgressTracker()
-            result = client.pull(self.repo + self.image_name(), self.docker_tag())
-            for entry in result:
-                tracker.update(entry)
-        except docker.errors.APIError as err:
-            logging.debug(
-                "Unable to pull image %s%s:%s due to %s",
-                self.repo,
-                self.image_name(),
-                self.docker_tag(),
-                err,
-            )
-            return None
+        with tracing.span("docker", "pull", image=lambda: self.repo + self.image_name()):
+            client = self.get_api_client()
+            try:
+                tracker = ProgressTracker()
+                result = client.pull(self.repo + self.image_name(), self.docker_tag())
+                for entry in result:
+                    tracker.update(entry)
+            except docker.errors.APIError as err:
+                logging.debug(
+                    "Unable to pull image %s%s:%s due to %s",
+                    self.repo,
+                    self.image_name(),
+                    self.docker_tag(),
+                    err,
+                )
+                return None
 
         # We obtained the image, so it should exist.
         return self.docker_image()
@@ -210,15 +315,67 @@ class DockerContainer:
             return True
         return False
 
-    def build(self, dest: Path):
+    def fingerprint_inputs(self) -> Optional[Dict]:
+        """Everything the build context is generated from, None if it cannot be determined.
+
+        Subclasses that return the template sources, zip checksums and properties
+        they write can have their build context regenerated only when these change.
+        """
+        return None
+
+    def fingerprint(self) -> Optional[str]:
+        """A digest of the inputs of the build context, None if unknown."""
+        inputs = self.fingerprint_inputs()
+        if inputs is None:
+            return None
+        return hashlib.sha256(json.dumps(inputs, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+    def write_if_changed(self, dest: Path) -> bool:
+        """Writes the build context, unless it was written before from the same inputs.
+
+        The fingerprint of the inputs is stored in the build context.
+
+        Returns:
+            bool: True if the build context was (re)written.
+        """
+        dest = Path(dest)
+        fingerprint = self.fingerprint()
+        marker = dest / DockerContainer.FINGERPRINT_FILE
+        if fingerprint and marker.exists() and marker.read_text(encoding="utf-8").strip() == fingerprint:
+            logging.info("%s is up to date", dest)
+            return False
+
+        self.write(dest)
+        if fingerprint:
+            marker.write_text(fingerprint, encoding="utf-8")
+        return True
+
+    def build(self, dest: Path, builder=None):
         logging.info("Building %s in %s", self, dest)
         self.write(Path(dest))
-        return self.create_container(Path(dest))
+        return self.create_container(Path(dest), builder)
 
     def can_pull(self):
         """True if this container image can be pulled from a registry."""
         return self.pull() is not None
 
+    def in_registry(self) -> bool:
+        """True if this container image is in its registry.
+
+        Unlike can_pull() only the manifest is looked up, nothing is downloaded.
+        The answer is remembered for the lifetime of this object.
+        """
+        if self._in_registry is None:
+            name = f"{self.repo or ''}{self.image_name()}:{self.docker_tag()}"
+            with tracing.span("docker", "registry", image=name):
+                try:
+                    self.get_client().images.get_registry_data(name)
+                    self._in_registry = True
+                except docker.errors.DockerException as err:
+                    logging.debug("%s is not in the registry: %s", name, err)
+                    self._in_registry = False
+        return self._in_registry
+
     @abc.abstractmethod
     def write(self, destination: Path):
         """Method responsible for writing the Dockerfile and all necessary files to build a container.
@@ -244,6 +401,13 @@ class DockerContainer:
     def docker_tag(self):
         raise NotImplementedError()
 
+    def build_size(self) -> Optional[int]:
+        """Estimated number of bytes that go into the image, None if unknown.
+
+        This is used to balance builds, it does not have to be exact.
+        """
+        return None
+
     @abc.abstractmethod
     def depends_on(self):
         """Name of the system image this container is build on."""
@@ -251,3 +415,55 @@ class DockerContainer:
 
     def __str__(self):
         return self.image_name() + ":" + self.docker_tag()
+
+
+def _prune(path: Path, keep) -> None:
+    """Removes path, except for the files in keep."""
+    if path in keep:
+        return
+    if path.is_dir() and not path.is_symlink():
+        if any(path in kept.parents for kept in keep):
+            for entry in path.iterdir():
+                _prune(entry, keep)
+        else:
+            shutil.rmtree(path)
+    else:
+        path.unlink()
+
+
+def push_all(containers: Iterable[DockerContainer], max_workers: int = 4) -> Dict[str, Optional[str]]:
+    """Pushes several images concurrently, reporting the aggregated progress.
+
+    The pushes share a single progress bar. Layers that are shared between
+    images are uploaded only once by the daemon, the other pushes will wait
+    for the upload to complete and mount the layer.
+
+    Args:
+        containers: The containers whose images should be pushed. Duplicates are pushed once.
+        max_workers: The maximum number of concurrent pushes.
+
+    Returns:
+        A dictionary of image name to pushed digest, the digest is None if the push failed.
+    """
+    unique = {}
+    for container in containers:
+        unique.setdefault(container.full_name(), container)
+
+    if not unique:
+        return {}
+
+    print(f"Pushing {len(unique)} docker images.. be patient this can take a while!")
+    tracker = AggregateProgressTracker()
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                name: executor.submit(container._push, tracker)
+                for name, container in unique.items()
+            }
+            digests = {name: future.result() for name, future in futures.items()}
+    finally:
+        tracker.close()
+
+    for name, digest in digests.items():
+        print(f"{name}: {digest or 'push failed'}")
+    return digests
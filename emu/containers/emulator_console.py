@@ -0,0 +1,162 @@
+# Copyright 2026 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Saves and restores snapshots of running emulator containers through the emulator console.
+
+The console is only forwarded by launch-emulator.sh when the container is
+started with a console token, see DockerContainer.launch.
+"""
+import logging
+import socket
+from pathlib import Path
+from typing import List, Optional
+
+# The container port on which launch-emulator.sh forwards the console.
+CONSOLE_PORT = "5554/tcp"
+
+# The quickboot snapshot, present in images created with --snapshot.
+DEFAULT_SNAPSHOT = "default_boot"
+
+TOKEN_FILE = Path.home() / ".emulator_console_auth_token"
+
+
+class ConsoleException(Exception):
+    pass
+
+
+def read_token(path: Path = TOKEN_FILE) -> Optional[str]:
+    """The console token stored in the given file, if any."""
+    path = Path(path)
+    if not path.exists():
+        return None
+    return path.read_text(encoding="utf-8").strip() or None
+
+
+class EmulatorConsole:
+    """A connection to the console of an emulator.
+
+    Every command returns the lines the emulator wrote before its final "OK",
+    failed commands raise a ConsoleException holding the reason. Can be used as
+    a context manager to close the connection.
+    """
+
+    def __init__(self, host: str, port: int, token: Optional[str] = None, timeout: float = 60):
+        """Connects to the console, and authenticates when the emulator asks for it.
+
+        Args:
+            host (str): The host on which the console is published.
+            port (int): The host port of the console.
+            token (str, optional): The console auth token the container was started with.
+            timeout (float, optional): Seconds to wait for a response, loading a snapshot can take a while.
+        """
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.pending = b""
+        try:
+            banner = self._response()
+            if any("Authentication required" in line for line in banner):
+                if not token:
+                    raise ConsoleException(f"The console on {host}:{port} requires a token")
+                self.command(f"auth {token}")
+        except Exception:
+            self.close()
+            raise
+
+    def command(self, cmd: str) -> List[str]:
+        """Runs a console command, for example "avd status"."""
+        logging.debug("Console: %s", cmd.split(" ")[0])
+        self.sock.sendall(cmd.encode("utf-8") + b"\n")
+        return self._response()
+
+    def snapshot_save(self, name: str = DEFAULT_SNAPSHOT):
+        self.command(f"avd snapshot save {name}")
+
+    def snapshot_load(self, name: str = DEFAULT_SNAPSHOT):
+        self.command(f"avd snapshot load {name}")
+
+    def snapshot_delete(self, name: str):
+        self.command(f"avd snapshot delete {name}")
+
+    def snapshot_list(self) -> List[str]:
+        """The names of the snapshots of the running AVD."""
+        # The output is a table, i.e. "ID  TAG  VM SIZE  DATE  VM CLOCK", preceded by a header.
+        names = []
+        for line in self.command("avd snapshot list"):
+            columns = line.split()
+            if len(columns) > 1 and columns[0] not in ("ID", "List"):
+                names.append(columns[1])
+        return names
+
+    def close(self):
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
+
+    def _response(self) -> List[str]:
+        lines = []
+        while True:
+            while b"\n" not in self.pending:
+                try:
+                    chunk = self.sock.recv(4096)
+                except socket.timeout as err:
+                    raise ConsoleException("Timed out waiting for the emulator console") from err
+                if not chunk:
+                    raise ConsoleException("The emulator console closed the connection")
+                self.pending += chunk
+            raw, self.pending = self.pending.split(b"\n", 1)
+            line = raw.decode("utf-8", errors="replace").rstrip("\r")
+            if line == "OK":
+                return lines
+            if line.startswith("KO"):
+                raise ConsoleException(line[3:].strip() or "Command failed")
+            lines.append(line)
+
+
+def console_port(container) -> int:
+    """The host port on which the console of a launched container is published."""
+    container.reload()
+    bindings = (container.ports or {}).get(CONSOLE_PORT)
+    if not bindings:
+        raise ConsoleException(
+            f"The console of {container.name} is not published, launch it with a console token"
+        )
+    return int(bindings[0]["HostPort"])
+
+
+def connect(container, token: Optional[str] = None, host: str = "localhost") -> EmulatorConsole:
+    """Opens the console of a container launched by DockerContainer.launch.
+
+    Args:
+        container (docker.models.containers.Container): A running emulator container.
+        token (str, optional): The console token, read from ~/.emulator_console_auth_token if not set.
+        host (str, optional): The host the container ports are published on.
+    """
+    return EmulatorConsole(host, console_port(container), token or read_token())
+
+
+def reset(container, token: Optional[str] = None, snapshot: str = DEFAULT_SNAPSHOT) -> bool:
+    """Restores a running container to a snapshot, returning True on success.
+
+    This can be used as the reset of an EmulatorPool, released devices are then
+    restored in seconds instead of being replaced by a freshly booted container.
+    """
+    try:
+        with connect(container, token) as console:
+            console.snapshot_load(snapshot)
+        return True
+    except (OSError, ConsoleException) as err:
+        logging.warning("Unable to restore %s to %s: %s", container.name, snapshot, err)
+        return False
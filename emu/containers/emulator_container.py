@@ -11,13 +11,16 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import hashlib
+import logging
 import os
 import shutil
 
 import emu
 from emu.android_release_zip import AndroidReleaseZip
 from emu.containers.docker_container import DockerContainer
-from emu.template_writer import TemplateWriter
+from emu.containers.resource_profile import SNAPSHOT_RESOURCES_LABEL
+from emu.template_writer import Render, TemplateWriter, write_all
 
 
 class EmulatorContainer(DockerContainer):
@@ -30,13 +33,29 @@ class EmulatorContainer(DockerContainer):
         """
     NO_METRICS_MESSAGE = "No metrics are collected when running this container."
 
+    # Time the emulator gets to boot when creating a quickboot snapshot, in seconds.
+    SNAPSHOT_BOOT_TIMEOUT = 300
+    SNAPSHOT_BOOT_TIMEOUT_NO_KVM = 1800
+
+    # The cores and RAM of the AVD, written to avd/MediumPhone.avd/config.ini. The
+    # snapshot is created with these, and cannot be restored with other values.
+    SNAPSHOT_CORES = 4
+    SNAPSHOT_RAM_MB = 4096
+
+    # Size of the userdata partition of the AVD, the image is labeled with it
+    # so an ephemeral /data tmpfs can be sized accordingly.
+    DATA_PARTITION_SIZE = "10G"
+
     def __init__(
-        self, emulator, system_image_container, repository=None, metrics=False, extra="", name=None
+        self, emulator, system_image_container, repository=None, metrics=False, extra="", name=None,
+        runtime=None, snapshot=False
     ):
         self.emulator_zip = AndroidReleaseZip(emulator)
         self.system_image_container = system_image_container
         self.metrics = metrics
         self.name = name
+        self.runtime = runtime
+        self.snapshot = snapshot
 
         if type(extra) is list:
             extra = " ".join([f'"{s}"' for s in extra])
@@ -54,6 +73,11 @@ class EmulatorContainer(DockerContainer):
         self.props["metrics"] = metrics_msg
         self.props["emu_build_id"] = self.emulator_zip.build_id()
         self.props["from_base_img"] = system_image_container.full_name()
+        self.props["data_partition_size"] = EmulatorContainer.DATA_PARTITION_SIZE
+        self.props["avd_cores"] = EmulatorContainer.SNAPSHOT_CORES
+        self.props["avd_ram_mb"] = EmulatorContainer.SNAPSHOT_RAM_MB
+        if runtime:
+            self.props["runtime_img"] = runtime.full_name()
 
         for expect in [
             "ro.build.version.sdk",
@@ -72,33 +96,127 @@ class EmulatorContainer(DockerContainer):
         else:
             return '"-shell-serial" "file:/tmp/android-unknown/kernel.log" "-logcat-output" "/tmp/android-unknown/logcat.log"'
 
+    def templates(self):
+        """The templates the build context is written from."""
+        templates = ["avd/MediumPhone.ini", "avd/MediumPhone.avd/config.ini", "emulator.README.MD"]
+        if self.runtime:
+            return templates + ["launch-flags.sh", "Dockerfile.emulator_runtime"]
+        return templates + ["launch-emulator.sh", "default.pa", "log-mux.pl", "Dockerfile.emulator"]
+
+    def fingerprint_inputs(self):
+        writer = TemplateWriter(".")
+        return {
+            "version": emu.__version__,
+            "templates": {
+                name: hashlib.sha256(writer.template_source(name).encode("utf-8")).hexdigest()
+                for name in self.templates()
+            },
+            "emulator": self.emulator_zip.sha256(),
+            "props": self.props,
+            "extra": self.extra,
+            "snapshot": self.snapshot,
+        }
+
+    def build_size(self):
+        return self.system_image_container.build_size() + os.path.getsize(self.emulator_zip.file_name)
+
     def write(self, dest):
-        # Make sure the destination directory is empty.
-        self.clean(dest)
-
-        writer = TemplateWriter(dest)
-        writer.write_template("avd/MediumPhone.ini", self.props)
-        writer.write_template("avd/MediumPhone.avd/config.ini", self.props)
-
-        # Include a README.MD message.
-        writer.write_template(
-            "emulator.README.MD",
-            self.props,
-            rename_as="README.MD",
-        )
+        renders = [
+            Render(dest, "avd/MediumPhone.ini", self.props),
+            Render(dest, "avd/MediumPhone.avd/config.ini", self.props),
+            # Include a README.MD message.
+            Render(dest, "emulator.README.MD", self.props, "README.MD"),
+        ]
+        if self.runtime:
+            # The launch script and its dependencies live in the runtime image.
+            renders += [
+                Render(dest, "launch-flags.sh", {"extra": self.extra}),
+                Render(dest, "Dockerfile.emulator_runtime", self.props, "Dockerfile"),
+            ]
+        else:
+            renders += [
+                Render(dest, "launch-emulator.sh", {"extra": self.extra, "version": emu.__version__}),
+                Render(dest, "default.pa", {}),
+                Render(dest, "log-mux.pl", {}),
+                Render(dest, "Dockerfile.emulator", self.props, "Dockerfile"),
+            ]
+        # Make sure the destination directory only has the files we are about to write.
+        self.clean(dest, [render.dest_file() for render in renders])
+        changed = write_all(renders)
+        logging.info("%d of %d templates changed in %s", len(changed), len(renders), dest)
 
-        writer.write_template(
-            "launch-emulator.sh", {"extra": self.extra, "version": emu.__version__}
-        )
-        writer.write_template("default.pa", {})
+        self.emulator_zip.extract(os.path.join(dest, "emu"))
 
-        writer.write_template(
-            "Dockerfile.emulator",
-            self.props,
-            rename_as="Dockerfile",
-        )
+    def build(self, dest, builder=None):
+        identity = super().build(dest, builder)
+        if identity and self.snapshot:
+            identity = self.bake_snapshot(identity)
+        return identity
 
-        self.emulator_zip.extract(os.path.join(dest, "emu"))
+    def bake_snapshot(self, identity):
+        """Boots the image once, and commits the resulting quickboot snapshot to the image.
+
+        KVM is used when it is available, otherwise the emulator boots without
+        acceleration which is considerably slower. Keep in mind that a snapshot can
+        only be restored on a host that offers the same type of acceleration.
+
+        Args:
+            identity (str): The id of the image to boot.
+
+        Returns:
+            str: The id of the image with the snapshot, or the given id in case of failure.
+        """
+        kvm = os.path.exists("/dev/kvm")
+        timeout = EmulatorContainer.SNAPSHOT_BOOT_TIMEOUT
+        if not kvm:
+            logging.warning("KVM is not available, creating the snapshot can take a long time.")
+            timeout = EmulatorContainer.SNAPSHOT_BOOT_TIMEOUT_NO_KVM
+
+        print(f"Creating a quickboot snapshot for {self.full_name()}, this can take a while.")
+        cores, ram_mb = EmulatorContainer.SNAPSHOT_CORES, EmulatorContainer.SNAPSHOT_RAM_MB
+        client = self.get_client()
+        container = None
+        try:
+            container = client.containers.run(
+                image=identity,
+                command=["/android/sdk/launch-emulator.sh", "--bake-snapshot", str(timeout)],
+                privileged=True,
+                devices=["/dev/kvm"] if kvm else [],
+                environment={"EMULATOR_CORES": str(cores), "EMULATOR_RAM_MB": str(ram_mb)},
+                detach=True,
+            )
+            # Give the emulator some time to write out the snapshot.
+            result = container.wait(timeout=timeout + 120)
+            if result.get("StatusCode") != 0:
+                logging.error(
+                    "Failed to create snapshot, emulator exited with %s: %s",
+                    result.get("StatusCode"),
+                    container.logs(tail=50).decode("utf-8", errors="replace"),
+                )
+                return identity
+
+            image = container.commit(
+                repository=self.repo + self.image_name(),
+                tag=self.docker_tag(),
+                changes=[
+                    'CMD ["/android/sdk/launch-emulator.sh"]',
+                    'LABEL com.google.android.emulator.snapshot="quickboot"',
+                    f'LABEL {SNAPSHOT_RESOURCES_LABEL}="{cores}:{ram_mb}"',
+                    # launch-emulator.sh cold boots when it is started with other resources.
+                    # The resources of the bake itself are not kept, a container only
+                    # gets them from its profile.
+                    f"ENV EMULATOR_SNAPSHOT_CORES={cores} EMULATOR_SNAPSHOT_RAM_MB={ram_mb} "
+                    "EMULATOR_CORES= EMULATOR_RAM_MB=",
+                ],
+            )
+            image.tag(self.repo + self.image_name(), "latest")
+            return image.id
+        except Exception as err:
+            logging.warning("Failed to create snapshot due to %s, using the image without snapshot.", err)
+            return identity
+        finally:
+            if container:
+                container.remove(force=True)
 
     def image_name(self):
         if self.name:
@@ -119,7 +237,7 @@ class EmulatorContainer(DockerContainer):
         return self.props["emu_build_id"]
 
     def depends_on(self):
-        if not self.system_image_container.can_pull():
+        if not self.system_image_container.in_registry():
             return self.system_image_container.image_name()
         else:
             return "-"
@@ -0,0 +1,274 @@
+# Copyright 2026 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import logging
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+from emu.containers import port_allocator
+from emu.containers.docker_container import DockerContainer
+from emu.containers.readiness import DeviceBootException, wait_for_boot
+from emu.containers.resource_profile import ResourceProfile
+
+
+class PoolExhaustedException(Exception):
+    pass
+
+
+# Put on the ready queue once none of the devices of a pool could be booted.
+_NO_DEVICES = object()
+
+
+class Lease:
+    """A booted emulator container handed out by an EmulatorPool.
+
+    The lease should be released once the device is no longer needed, it
+    can be used as a context manager to do so automatically.
+    """
+
+    def __init__(self, pool, device):
+        self.pool = pool
+        self.device = device
+        self.released = False
+
+    @property
+    def ports(self) -> Dict[str, str]:
+        """The published ports of the device, for example {"5555/tcp": "49153"}."""
+        # The container returned by run() does not know its port bindings yet.
+        self.device.reload()
+        return {
+            port: bindings[0]["HostPort"]
+            for port, bindings in self.device.ports.items()
+            if bindings
+        }
+
+    def release(self, recycle: bool = True):
+        """Returns the device to the pool, releasing a lease more than once has no effect.
+
+        Args:
+            recycle (bool, optional): Reset the device so it can be handed out again,
+                when False the device is replaced by a fresh container.
+        """
+        self.pool.release(self, recycle)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.release()
+
+
+class EmulatorPool:
+    """Keeps a number of booted emulator containers of a single image ready for use.
+
+    Devices are handed out through acquire(), which returns immediately when a
+    booted device is available. Released devices are reset and returned to the
+    pool, or replaced by a freshly launched container if they cannot be reset.
+    A device that fails to boot is retried with a backoff, after boot_attempts
+    failures the pool shrinks by one device.
+    """
+
+    def __init__(
+        self,
+        container: DockerContainer,
+        size: int = 2,
+        boot_timeout: int = 300,
+        reset: Optional[Callable] = None,
+        allocator: Optional[port_allocator.PortAllocator] = None,
+        profile: Optional[ResourceProfile] = None,
+        ephemeral: bool = False,
+        token: Optional[str] = None,
+        boot_attempts: int = 3,
+        retry_delay: float = 5,
+    ):
+        """Creates a pool, call start() to launch the devices.
+
+        Args:
+            container (DockerContainer): The image to launch devices from.
+            size (int, optional): The number of devices to keep.
+            boot_timeout (int, optional): Seconds a device gets to boot.
+            reset (Callable, optional): Restores a released device to a clean state, called
+                with the device and the console token of the pool, i.e. emulator_console.reset.
+                Returns True on success. Devices are replaced when not set, or when the
+                reset fails.
+            allocator (PortAllocator, optional): Publishes the devices on ports from this
+                allocator, instead of random host ports.
+            profile (ResourceProfile, optional): The resources every device is limited to.
+            ephemeral (bool, optional): Keep /data and /tmp of every device in RAM.
+            token (str, optional): Console auth token of the devices, needed to reset
+                them through emulator_console.reset.
+            boot_attempts (int, optional): Times a device is launched before giving up on it.
+            retry_delay (float, optional): Seconds to wait before the first retry, doubled
+                on every following retry.
+        """
+        self.container = container
+        self.size = size
+        self.boot_timeout = boot_timeout
+        self.reset = reset
+        self.allocator = allocator
+        self.profile = profile
+        self.ephemeral = ephemeral
+        self.token = token
+        self.boot_attempts = boot_attempts
+        self.retry_delay = retry_delay
+        self.handles = {}
+        self.ready = queue.Queue()
+        self.devices = set()
+        # The number of devices that are booting, ready or leased.
+        self.live = size
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.executor = ThreadPoolExecutor(max_workers=size)
+
+    def start(self):
+        """Launches all the devices of the pool in the background."""
+        for _ in range(self.size):
+            self.executor.submit(self._add_device)
+
+    def acquire(self, timeout: Optional[float] = None) -> Lease:
+        """Hands out a booted device.
+
+        Args:
+            timeout (float, optional): Seconds to wait for a device, waits forever if None.
+
+        Raises:
+            PoolExhaustedException: No device became available within the timeout, or
+                none of the devices of the pool could be booted.
+        """
+        try:
+            device = self.ready.get(timeout=timeout)
+        except queue.Empty as err:
+            raise PoolExhaustedException(
+                f"No {self.container.image_name()} device available after {timeout}s"
+            ) from err
+        if device is _NO_DEVICES:
+            # Wake up the next waiter as well.
+            self.ready.put(_NO_DEVICES)
+            raise PoolExhaustedException(f"None of the {self.container.image_name()} devices could be booted")
+        return Lease(self, device)
+
+    def release(self, lease: Lease, recycle: bool = True):
+        """Returns the leased device to the pool, it is reset in the background."""
+        with self.lock:
+            if lease.released:
+                return
+            lease.released = True
+        self.executor.submit(self._recycle, lease.device, recycle)
+
+    def shutdown(self):
+        """Stops all the devices of this pool."""
+        self.stopped.set()
+        self.executor.shutdown(wait=True, cancel_futures=True)
+        with self.lock:
+            devices = list(self.devices)
+        for device in devices:
+            self._remove(device)
+
+    def _add_device(self):
+        for attempt in range(self.boot_attempts):
+            if attempt and self.stopped.wait(self.retry_delay * 2 ** (attempt - 1)):
+                return
+            if self.stopped.is_set() or self._boot():
+                return
+
+        logging.error("Giving up on a %s device after %d attempts.", self.container.image_name(), self.boot_attempts)
+        with self.lock:
+            self.live -= 1
+            exhausted = self.live == 0
+        if exhausted:
+            self.ready.put(_NO_DEVICES)
+
+    def _boot(self) -> bool:
+        """Launches a device and waits until it is ready, returning True on success."""
+        device = None
+        try:
+            device = self._launch()
+            if device is None:
+                raise DeviceBootException(f"Unable to launch {self.container.image_name()}")
+            with self.lock:
+                self.devices.add(device)
+            self._wait_until_ready(device)
+            self.ready.put(device)
+            return True
+        except Exception as err:
+            logging.error("Failed to add a device to the pool: %s", err)
+            if device is not None:
+                self._remove(device)
+            return False
+
+    def _launch(self):
+        if not self.allocator:
+            return self.container.launch({}, self.profile, self.ephemeral, self.token)
+
+        handle = port_allocator.launch(
+            self.container, self.allocator, self.profile, self.ephemeral, self.token
+        )
+        if handle is None:
+            return None
+        with self.lock:
+            self.handles[handle.container] = handle
+        return handle.container
+
+    def _recycle(self, device, recycle):
+        if self.stopped.is_set():
+            return
+        try:
+            if recycle and self.reset and self.reset(device, self.token):
+                self.ready.put(device)
+                return
+        except Exception as err:
+            logging.warning("Failed to reset %s due to %s, replacing it.", device.name, err)
+
+        self._remove(device)
+        self._add_device()
+
+    def _remove(self, device):
+        with self.lock:
+            self.devices.discard(device)
+            handle = self.handles.pop(device, None)
+        try:
+            device.remove(force=True)
+        except Exception as err:
+            logging.warning("Unable to remove %s due to %s", device.name, err)
+        if handle:
+            self.allocator.release(handle.ports)
+
+    def _wait_until_ready(self, device):
+        """Waits until the log stream of the device reports that it has booted."""
+        waited = wait_for_boot(device, self.boot_timeout)
+        logging.info("%s booted in %.1fs", device.name, waited)
+
+
+class PoolManager:
+    """Manages a pool of ready devices for several images."""
+
+    def __init__(self):
+        self.pools: Dict[str, EmulatorPool] = {}
+
+    def add(self, container: DockerContainer, size: int = 2, **kwargs) -> EmulatorPool:
+        """Starts a pool of the given size for the container image."""
+        pool = EmulatorPool(container, size, **kwargs)
+        self.pools[container.image_name()] = pool
+        pool.start()
+        return pool
+
+    def acquire(self, image_name: str, timeout: Optional[float] = None) -> Lease:
+        """Hands out a booted device of the given image."""
+        return self.pools[image_name].acquire(timeout)
+
+    def shutdown(self):
+        """Stops the devices of all the pools."""
+        for pool in self.pools.values():
+            pool.shutdown()
@@ -0,0 +1,83 @@
+# Copyright 2026 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import hashlib
+
+import emu
+from emu.containers.docker_container import DockerContainer
+from emu.containers.emulator_container import EmulatorContainer
+from emu.template_writer import Render, TemplateWriter, write_all
+
+
+class MetricsContainer(DockerContainer):
+    """An emulator image that collects usage metrics.
+
+    The image is a single layer on top of the same emulator image without
+    metrics. It sets EMULATOR_METRICS, which makes the launch script pass
+    -metrics-collection to the emulator, so the emulator and system image
+    are only built, and stored, once.
+    """
+
+    TEMPLATES = ["Dockerfile.metrics", "emulator.README.MD"]
+
+    # The layer only holds a README and an environment variable.
+    BUILD_SIZE = 64 * 1024
+
+    def __init__(self, base: EmulatorContainer):
+        """Creates the metrics variant of the given emulator container.
+
+        Args:
+            base (EmulatorContainer): The emulator image, without metrics, to build on.
+        """
+        assert not base.metrics, "{} already collects metrics".format(base.image_name())
+        self.base = base
+        self.system_image_container = base.system_image_container
+        self.props = dict(base.props)
+        self.props["metrics"] = EmulatorContainer.METRICS_MESSAGE
+        # The base may only exist in the registry, so refer to it by its full name.
+        self.props["from_emulator_img"] = f"{base.repo or ''}{base.image_name()}:{base.docker_tag()}"
+        super().__init__(base.repo)
+
+    def fingerprint_inputs(self):
+        writer = TemplateWriter(".")
+        return {
+            "version": emu.__version__,
+            "templates": {
+                name: hashlib.sha256(writer.template_source(name).encode("utf-8")).hexdigest()
+                for name in MetricsContainer.TEMPLATES
+            },
+            "base": self.base.fingerprint(),
+        }
+
+    def write(self, dest):
+        renders = [
+            Render(dest, "emulator.README.MD", self.props, "README.MD"),
+            Render(dest, "Dockerfile.metrics", self.props, "Dockerfile"),
+        ]
+        self.clean(dest, [render.dest_file() for render in renders])
+        write_all(renders)
+
+    def build_size(self):
+        return MetricsContainer.BUILD_SIZE
+
+    def image_name(self):
+        name = self.base.image_name()
+        if name.endswith("-no-metrics"):
+            return name[: -len("-no-metrics")]
+        return name + "-metrics"
+
+    def docker_tag(self):
+        return self.base.docker_tag()
+
+    def depends_on(self):
+        return self.base.image_name()
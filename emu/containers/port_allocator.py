@@ -0,0 +1,256 @@
+# Copyright 2026 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import contextlib
+import fcntl
+import json
+import logging
+import os
+import socket
+import threading
+from contextlib import closing
+from pathlib import Path
+from typing import Dict, NamedTuple, Optional, Set
+
+import docker
+
+from emu.containers import readiness
+
+# Owner of an allocation whose container has not been launched yet.
+_PENDING = "pid:"
+
+
+class PortsExhaustedException(Exception):
+    pass
+
+
+class EmulatorPorts(NamedTuple):
+    """The host ports on which the console, adb and gRPC port of a container are published."""
+
+    console: int
+    adb: int
+    grpc: int
+
+    def port_map(self) -> Dict[str, int]:
+        """The port mapping as expected by DockerContainer.launch."""
+        return {"5554/tcp": self.console, "5555/tcp": self.adb, "8554/tcp": self.grpc}
+
+
+class EmulatorHandle:
+    """A launched emulator container, and the host ports it was given."""
+
+    def __init__(self, container, ports: EmulatorPorts, allocator):
+        self.container = container
+        self.ports = ports
+        self.allocator = allocator
+
+    @property
+    def name(self) -> str:
+        return self.container.name
+
+    def adb_address(self) -> str:
+        """The address to pass to adb connect."""
+        return f"localhost:{self.ports.adb}"
+
+    def grpc_address(self) -> str:
+        """The address of the gRPC endpoint."""
+        return f"localhost:{self.ports.grpc}"
+
+    def wait_for_boot(self, timeout: float = 300) -> float:
+        """Waits until the emulator has booted, returning the seconds waited."""
+        return readiness.wait_for_boot(self.container, timeout)
+
+    def stop(self):
+        """Removes the container and releases its ports."""
+        try:
+            self.container.remove(force=True)
+        finally:
+            self.allocator.release(self.ports)
+
+    def __str__(self):
+        return f"{self.name} (console: {self.ports.console}, adb: {self.ports.adb}, grpc: {self.ports.grpc})"
+
+
+class PortAllocator:
+    """Allocates free console/adb/gRPC port triples from a range of host ports.
+
+    Triples are consecutive ports, starting at the first port of the range. A triple
+    is only handed out if none of its ports is in use on the host. Allocations are
+    recorded, and can be persisted in a json file so separate invocations on the
+    same host do not hand out the same ports. The file is locked while it is
+    updated, and allocations of containers that no longer exist are reclaimed.
+    """
+
+    def __init__(
+        self,
+        first: int = 5554,
+        last: int = 5853,
+        host: str = "0.0.0.0",
+        state_file: Optional[Path] = None,
+    ):
+        """Creates an allocator for the ports [first, last].
+
+        Args:
+            first (int, optional): The first port of the range.
+            last (int, optional): The last port of the range.
+            host (str, optional): The host interface the ports are published on.
+            state_file (Path, optional): Json file in which the allocations are recorded.
+        """
+        self.first = first
+        self.last = last
+        self.host = host
+        self.state_file = Path(state_file) if state_file else None
+        self.lock = threading.Lock()
+        self.allocations: Dict[int, str] = {}
+
+    @staticmethod
+    def from_range(port_range: str, **kwargs) -> "PortAllocator":
+        """Creates an allocator from a "first-last" string, for example "5554-5853"."""
+        first, last = [int(port) for port in port_range.split("-")]
+        return PortAllocator(first, last, **kwargs)
+
+    def allocate(self, owner: str = "") -> EmulatorPorts:
+        """Allocates a free port triple.
+
+        Args:
+            owner (str, optional): Recorded with the allocation, for example a container name.
+                Defaults to this process, until record() is called.
+
+        Raises:
+            PortsExhaustedException: There are no free ports left in the range.
+        """
+        owner = owner or f"{_PENDING}{os.getpid()}"
+        with self._locked():
+            self._prune()
+            for console in range(self.first, self.last - 1, 3):
+                ports = EmulatorPorts(console, console + 1, console + 2)
+                if console in self.allocations or not all(self._is_free(p) for p in ports):
+                    continue
+                self.allocations[console] = owner
+                self._save()
+                logging.info("Allocated %s to %s", ports, owner)
+                return ports
+
+        raise PortsExhaustedException(f"No free ports left in {self.first}-{self.last}")
+
+    def record(self, ports: EmulatorPorts, owner: str):
+        """Updates the owner of an allocation."""
+        with self._locked():
+            self.allocations[ports.console] = owner
+            self._save()
+
+    def release(self, ports: EmulatorPorts):
+        """Returns the ports to the range."""
+        with self._locked():
+            self.allocations.pop(ports.console, None)
+            self._save()
+
+    @contextlib.contextmanager
+    def _locked(self):
+        """Holds the allocations of all threads and processes sharing the state file."""
+        with self.lock:
+            if not self.state_file:
+                yield
+                return
+            self.state_file.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.state_file.with_name(self.state_file.name + ".lock"), "w") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    self._load()
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _prune(self):
+        """Drops the shared allocations of containers and processes that are gone."""
+        if not self.state_file or not self.allocations:
+            return
+        containers = _live_containers()
+        for console, owner in list(self.allocations.items()):
+            if owner.startswith(_PENDING):
+                gone = not _process_exists(int(owner[len(_PENDING):]))
+            else:
+                gone = containers is not None and owner not in containers
+            if gone:
+                logging.info("Reclaiming ports %d-%d of %s", console, console + 2, owner)
+                del self.allocations[console]
+
+    def _is_free(self, port: int) -> bool:
+        with closing(socket.socket(socket.AF_INET, socket.SOCK_STREAM)) as sock:
+            try:
+                sock.bind((self.host, port))
+                return True
+            except OSError:
+                return False
+
+    def _load(self):
+        if self.state_file and self.state_file.exists():
+            state = json.loads(self.state_file.read_text(encoding="utf-8"))
+            self.allocations = {int(port): owner for port, owner in state.items()}
+
+    def _save(self):
+        if self.state_file:
+            tmp = self.state_file.with_name(self.state_file.name + ".tmp")
+            tmp.write_text(
+                json.dumps({str(port): owner for port, owner in self.allocations.items()}, indent=2),
+                encoding="utf-8",
+            )
+            os.replace(tmp, self.state_file)
+
+
+def _live_containers() -> Optional[Set[str]]:
+    """The names of all the containers on this host, None if docker cannot be reached."""
+    try:
+        return {container.name for container in docker.from_env().containers.list(all=True)}
+    except Exception as err:
+        logging.debug("Unable to list containers due to %s", err)
+        return None
+
+
+def _process_exists(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def launch(
+    container,
+    allocator: PortAllocator,
+    profile=None,
+    ephemeral: bool = False,
+    token: Optional[str] = None,
+) -> Optional[EmulatorHandle]:
+    """Launches the container on a free port triple.
+
+    Args:
+        container (DockerContainer): The image to launch.
+        allocator (PortAllocator): The allocator handing out the host ports.
+        profile (ResourceProfile, optional): The resources the container is limited to.
+        ephemeral (bool, optional): Keep /data and /tmp of the container in RAM.
+        token (str, optional): Console auth token, forwards the console on the console port.
+
+    Returns:
+        EmulatorHandle: The launched container, or None if it could not be started.
+    """
+    ports = allocator.allocate()
+    device = container.launch(ports.port_map(), profile, ephemeral, token)
+    if device is None:
+        allocator.release(ports)
+        return None
+
+    allocator.record(ports, device.name)
+    return EmulatorHandle(device, ports, allocator)
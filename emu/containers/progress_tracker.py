@@ -11,6 +11,8 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import threading
+
 from tqdm import tqdm
 
 
@@ -58,3 +60,45 @@ class ProgressTracker:
             diff = current - prog["current"]
             prog["current"] = current
             prog["tqdm"].update(diff)
+
+
+class AggregateProgressTracker:
+    """
+    A class that tracks the combined progress of several concurrent pushes using a single tqdm bar.
+
+    Layers are keyed by their id, so a layer that is shared between images is only
+    counted once, no matter which of the pushes reports on it.
+    """
+
+    def __init__(self, description="Pushing"):
+        """Initializes a new instance of AggregateProgressTracker with an empty layer dictionary."""
+        self.lock = threading.Lock()
+        self.layers = {}
+        self.tqdm = tqdm(total=0, unit="B", unit_scale=True, desc=description)
+
+    def close(self):
+        """Closes the tqdm progress bar."""
+        self.tqdm.close()
+
+    def update(self, entry):
+        """Updates the aggregated progress bar given an entry dictionary.
+
+        This method is safe to call from multiple threads.
+        """
+        if "id" not in entry:
+            return
+
+        identity = entry["id"]
+        total = int(entry.get("progressDetail", {}).get("total", -1))
+        current = int(entry.get("progressDetail", {}).get("current", 0))
+
+        with self.lock:
+            layer = self.layers.setdefault(identity, {"total": 0, "current": 0})
+            if total != -1 and layer["total"] != total:
+                self.tqdm.total += total - layer["total"]
+                layer["total"] = total
+                self.tqdm.refresh()
+
+            if current > layer["current"]:
+                self.tqdm.update(current - layer["current"])
+                layer["current"] = current
@@ -0,0 +1,158 @@
+# Copyright 2026 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Detects when the emulator in a container has booted by following its log stream.
+
+launch-emulator.sh prefixes every line with the channel it originates from,
+for example "kernel: " or "logcat: ". Lines without a prefix are written by
+the emulator process itself. When the container runs with LOG_FORMAT=json the
+channels are written as json objects holding the channel and message instead.
+"""
+import json
+import logging
+import queue
+import re
+import socket
+import threading
+import time
+from typing import Iterable, Iterator, List, Pattern, Tuple
+
+# The prefixes added by launch-emulator.sh
+CHANNELS = ("emulator", "logcat", "kernel", "video", "pulse", "version")
+
+# Lines that indicate that Android has completed booting.
+BOOT_PATTERNS: List[Pattern] = [
+    # Written by the emulator, i.e. "INFO | Boot completed in 12345 ms"
+    re.compile(r"boot completed", re.IGNORECASE),
+    # Written by init to the kernel log once sys.boot_completed is set.
+    re.compile(r"sys\.boot_completed=1"),
+]
+
+_PREFIX = re.compile(r"^({}):\s?".format("|".join(CHANNELS)))
+
+
+class DeviceBootException(Exception):
+    pass
+
+
+class BootTimeoutException(DeviceBootException):
+    pass
+
+
+def parse_line(line: str) -> Tuple[str, str]:
+    """Splits a log line into its channel and message.
+
+    Lines without a known prefix come from the emulator process.
+
+    Returns:
+        (str, str): The channel, and the message without the prefix.
+    """
+    if line.startswith('{"time"'):
+        try:
+            record = json.loads(line)
+            return record["channel"], record["message"]
+        except (ValueError, KeyError):
+            pass
+    match = _PREFIX.match(line)
+    if match:
+        return match.group(1), line[match.end():]
+    return "emulator", line
+
+
+def split_lines(chunks: Iterable[bytes]) -> Iterator[str]:
+    """Turns a stream of (partial) log chunks into lines."""
+    pending = b""
+    for chunk in chunks:
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            yield line.decode("utf-8", errors="replace").rstrip("\r")
+    if pending:
+        yield pending.decode("utf-8", errors="replace")
+
+
+def is_boot_completed(line: str, patterns: List[Pattern] = None) -> bool:
+    """True if the log line signals that Android has booted."""
+    _, message = parse_line(line)
+    return any(pattern.search(message) for pattern in patterns or BOOT_PATTERNS)
+
+
+def wait_for_boot(container, timeout: float = 300, patterns: List[Pattern] = None) -> float:
+    """Follows the log stream of the container until Android has booted.
+
+    Args:
+        container (docker.models.containers.Container): A launched emulator container.
+        timeout (float, optional): Seconds to wait for the boot to complete.
+        patterns (List[Pattern], optional): Log lines that signal a completed boot.
+
+    Returns:
+        float: The number of seconds we waited.
+
+    Raises:
+        BootTimeoutException: The device did not boot within the timeout.
+        DeviceBootException: The container exited before the device booted.
+    """
+    start = time.monotonic()
+    stream = container.logs(stream=True, follow=True)
+    lines = queue.Queue()
+
+    def _follow():
+        try:
+            for line in split_lines(stream):
+                lines.put(line)
+        finally:
+            lines.put(None)
+
+    threading.Thread(target=_follow, daemon=True).start()
+    try:
+        while True:
+            remaining = timeout - (time.monotonic() - start)
+            try:
+                line = lines.get(timeout=max(remaining, 0))
+            except queue.Empty as err:
+                raise BootTimeoutException(
+                    f"{container.name} did not boot within {timeout}s"
+                ) from err
+            if line is None:
+                raise DeviceBootException(f"{container.name} exited while booting")
+            if is_boot_completed(line, patterns):
+                return time.monotonic() - start
+    finally:
+        # Stop following the logs, the reader thread ends once the stream is closed.
+        close = getattr(stream, "close", None)
+        if close:
+            try:
+                close()
+            except Exception as err:
+                logging.debug("Unable to close log stream of %s: %s", container.name, err)
+
+
+def wait_for_port(host: str, port: int, timeout: float = 300) -> float:
+    """Waits until a tcp port, for example the gRPC port, accepts connections.
+
+    Keep in mind that the emulator opens its ports before Android has booted.
+
+    Returns:
+        float: The number of seconds we waited.
+
+    Raises:
+        BootTimeoutException: The port did not open within the timeout.
+    """
+    start = time.monotonic()
+    while time.monotonic() - start < timeout:
+        try:
+            with socket.create_connection((host, port), timeout=1):
+                return time.monotonic() - start
+        except OSError:
+            time.sleep(0.25)
+    raise BootTimeoutException(f"{host}:{port} did not open within {timeout}s")
@@ -0,0 +1,163 @@
+# Copyright 2026 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import copy
+import re
+from typing import Any, Dict, Optional
+
+# The label holding the size of the AVD data partition, i.e. "10G".
+DATA_PARTITION_LABEL = "com.google.android.emulator.data_partition"
+DEFAULT_DATA_PARTITION = "10G"
+
+# The label holding the "<cores>:<ram in MB>" the quickboot snapshot of an image was created with.
+SNAPSHOT_RESOURCES_LABEL = "com.google.android.emulator.snapshot.resources"
+
+# Room on the ephemeral /data for the rest of the AVD directory (cache, snapshots).
+EPHEMERAL_HEADROOM_MB = 1024
+EPHEMERAL_TMP = "size=1g"
+
+_SIZE = re.compile(r"^\s*(\d+)\s*([KMG]?)B?\s*$", re.IGNORECASE)
+
+
+class ResourceProfile:
+    """The cpu, memory and shared memory a launched emulator container is limited to.
+
+    The number of cores and the amount of RAM are also handed to launch-emulator.sh,
+    so the AVD matches the limits of its container.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        cores: int,
+        ram_mb: int,
+        cpuset: Optional[str] = None,
+        overhead_mb: int = 1536,
+        shm_size: str = "128m",
+        tmpfs: Optional[Dict[str, str]] = None,
+    ):
+        """Creates a resource profile.
+
+        Args:
+            name (str): The name of the profile.
+            cores (int): The number of cores of the AVD, and cpus of the container.
+            ram_mb (int): The RAM of the AVD in MB.
+            cpuset (str, optional): Pin the container to these cpus, for example "0-3".
+            overhead_mb (int, optional): Memory the emulator needs on top of the AVD RAM.
+            shm_size (str, optional): Size of /dev/shm.
+            tmpfs (Dict[str, str], optional): Mount point to tmpfs options, for example {"/tmp": "size=1g"}.
+        """
+        self.name = name
+        self.cores = cores
+        self.ram_mb = ram_mb
+        self.cpuset = cpuset
+        self.overhead_mb = overhead_mb
+        self.shm_size = shm_size
+        self.tmpfs = tmpfs or {}
+
+    def pinned(self, cpuset: str) -> "ResourceProfile":
+        """A copy of this profile, pinned to the given cpus."""
+        profile = copy.deepcopy(self)
+        profile.cpuset = cpuset
+        return profile
+
+    def ephemeral(self, data_partition: str = DEFAULT_DATA_PARTITION) -> "ResourceProfile":
+        """A copy of this profile that also keeps /data and /tmp in RAM.
+
+        Mounts the profile already has, like its /tmp, are kept. Whatever is
+        written to a tmpfs is accounted to the memory limit of the container,
+        so the limit grows by the size of every mount that is added.
+
+        Args:
+            data_partition (str): The size of the AVD data partition, i.e. "10G".
+        """
+        profile = copy.deepcopy(self)
+        for mount, options in ephemeral_tmpfs(data_partition).items():
+            if mount in profile.tmpfs:
+                continue
+            profile.tmpfs[mount] = options
+            profile.overhead_mb += tmpfs_size_mb(options)
+        return profile
+
+    def docker_args(self) -> Dict[str, Any]:
+        """The keyword arguments to pass to docker's containers.run."""
+        args = {
+            "mem_limit": f"{self.ram_mb + self.overhead_mb}m",
+            "shm_size": self.shm_size,
+        }
+        if self.cpuset:
+            args["cpuset_cpus"] = self.cpuset
+        else:
+            args["nano_cpus"] = self.cores * 1_000_000_000
+        if self.tmpfs:
+            args["tmpfs"] = dict(self.tmpfs)
+        return args
+
+    def environment(self) -> Dict[str, str]:
+        """The environment variables read by launch-emulator.sh."""
+        return {"EMULATOR_CORES": str(self.cores), "EMULATOR_RAM_MB": str(self.ram_mb)}
+
+    def matches_snapshot(self, labels: Dict[str, str]) -> bool:
+        """True if an image with these labels can restore its quickboot snapshot under this profile."""
+        resources = (labels or {}).get(SNAPSHOT_RESOURCES_LABEL)
+        return not resources or resources == f"{self.cores}:{self.ram_mb}"
+
+    def __str__(self):
+        pinned = f", cpus {self.cpuset}" if self.cpuset else ""
+        return f"{self.name} ({self.cores} cores, {self.ram_mb}MB{pinned})"
+
+
+PROFILES = {
+    "small": ResourceProfile("small", cores=2, ram_mb=2048, tmpfs={"/tmp": "size=512m"}),
+    "medium": ResourceProfile("medium", cores=4, ram_mb=4096, shm_size="256m", tmpfs={"/tmp": "size=1g"}),
+    "large": ResourceProfile("large", cores=8, ram_mb=8192, shm_size="512m", tmpfs={"/tmp": "size=2g"}),
+}
+
+
+def size_mb(size: str) -> int:
+    """Converts an AVD config size, i.e. "10G" or "800M", to MB. Sizes without a unit are in bytes."""
+    match = _SIZE.match(size)
+    if not match:
+        raise ValueError(f"Invalid size: {size}")
+    value, unit = int(match.group(1)), match.group(2).upper()
+    return {"G": value * 1024, "M": value, "K": value // 1024, "": value // (1024 * 1024)}[unit]
+
+
+def tmpfs_size_mb(options: str) -> int:
+    """The size in MB of a tmpfs mount with the given options, i.e. "size=1g,mode=1777"."""
+    for option in options.split(","):
+        key, _, value = option.partition("=")
+        if key.strip() == "size":
+            return size_mb(value)
+    return 0
+
+
+def ephemeral_tmpfs(data_partition: str = DEFAULT_DATA_PARTITION) -> Dict[str, str]:
+    """The tmpfs mounts that keep /data and /tmp of an emulator container in RAM.
+
+    launch-emulator.sh moves the AVD to /data when it is mounted, so all userdata
+    writes stay in memory. Keep in mind that whatever is written to a tmpfs is
+    accounted to the memory limit of the container, use ResourceProfile.ephemeral
+    to raise the limit of a profile accordingly.
+
+    Args:
+        data_partition (str): The size of the AVD data partition, i.e. "10G".
+    """
+    data_mb = size_mb(data_partition) + EPHEMERAL_HEADROOM_MB
+    return {"/data": f"size={data_mb}m", "/tmp": EPHEMERAL_TMP}
+
+
+def get_profile(name: str, cpuset: Optional[str] = None) -> ResourceProfile:
+    """Looks up one of the predefined profiles, optionally pinning it to the given cpus."""
+    profile = PROFILES[name]
+    return profile.pinned(cpuset) if cpuset else profile
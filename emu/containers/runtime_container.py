@@ -0,0 +1,72 @@
+# Copyright 2026 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import hashlib
+
+import emu
+from emu.containers.docker_container import DockerContainer
+from emu.template_writer import Render, TemplateWriter, write_all
+
+
+class EmulatorRuntimeContainer(DockerContainer):
+    """The shared runtime on which emulator images can be built.
+
+    The runtime contains the emulator dependencies, the pulse audio configuration
+    and the launch script. It is versioned by the contents of the templates
+    it is created from, so it only needs to be rebuilt when these change.
+    """
+
+    TEMPLATES = ["Dockerfile.runtime", "launch-emulator.sh", "default.pa", "log-mux.pl"]
+
+    def __init__(self, repository=None):
+        super().__init__(repository)
+        self._version = None
+
+    def write(self, dest):
+        renders = [
+            Render(dest, "Dockerfile.runtime", {"runtime_version": self.docker_tag()}, "Dockerfile"),
+            # The emulator flags are provided by the images built on this runtime.
+            Render(dest, "launch-emulator.sh", {"extra": "", "version": emu.__version__}),
+            Render(dest, "default.pa", {}),
+            Render(dest, "log-mux.pl", {}),
+        ]
+        self.clean(dest, [render.dest_file() for render in renders])
+        write_all(renders)
+
+    def image_name(self):
+        return "emulator-runtime"
+
+    def docker_tag(self):
+        if not self._version:
+            writer = TemplateWriter(".")
+            digest = hashlib.sha256(emu.__version__.encode("utf-8"))
+            for template in EmulatorRuntimeContainer.TEMPLATES:
+                digest.update(writer.template_source(template).encode("utf-8"))
+            self._version = digest.hexdigest()[:12]
+        return self._version
+
+    def full_name(self):
+        """The runtime is always referenced by its exact version."""
+        return f"{self.repo or ''}{self.image_name()}:{self.docker_tag()}"
+
+    def docker_image(self):
+        """The local docker image of this exact runtime version, if any."""
+        target = f"{self.image_name()}:{self.docker_tag()}"
+        for img in self.get_client().images.list():
+            for tag in img.tags:
+                if tag.split("/")[-1] == target:
+                    return img
+        return None
+
+    def depends_on(self):
+        return "-"
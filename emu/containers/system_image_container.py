@@ -11,9 +11,14 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import hashlib
 import logging
 import os
+import shutil
+import stat
+from pathlib import Path
 
+import emu
 from emu.android_release_zip import SystemImageReleaseZip
 from emu.platform_tools import PlatformTools
 from emu.template_writer import TemplateWriter
@@ -22,10 +27,24 @@ from emu.emu_downloads_menu import SysImgInfo
 
 
 class SystemImageContainer(DockerContainer):
-    def __init__(self, sort, repo="us-docker.pkg.dev/android-emulator-268719/images"):
+    def __init__(
+        self, sort, repo="us-docker.pkg.dev/android-emulator-268719/images", extract=False, platform_tools=None
+    ):
+        """A container holding a system image.
+
+        Args:
+            sort: A SysImgInfo, or the path to a system image zip file.
+            repo (str, optional): The repository of the image.
+            extract (bool, optional): Extract the system image on the host, instead of
+                unzipping it during the docker build.
+            platform_tools (str, optional): The platform tools zip to take adb from,
+                it is downloaded when needed if not set.
+        """
         super().__init__(repo)
         self.system_image_zip = None
         self.system_image_info = None
+        self.extract = extract
+        self.platform_tools = platform_tools
 
         if isinstance(sort, SysImgInfo):
             self.system_image_info = sort
@@ -33,10 +52,32 @@ class SystemImageContainer(DockerContainer):
             self.system_image_zip = SystemImageReleaseZip(sort)
             assert "ro.build.version.incremental" in self.system_image_zip.props
 
+    def fingerprint_inputs(self):
+        if self.system_image_zip:
+            checksum = self.system_image_zip.sha256()
+        else:
+            checksum = self.system_image_info.checksum
+        if not checksum:
+            return None
+
+        template = "Dockerfile.system_image_extracted" if self.extract else "Dockerfile.system_image"
+        source = TemplateWriter(".").template_source(template)
+        return {
+            "version": emu.__version__,
+            "templates": {template: hashlib.sha256(source.encode("utf-8")).hexdigest()},
+            "system_image": checksum,
+            "extract": self.extract,
+        }
+
+    def build_size(self):
+        if self.system_image_zip:
+            return os.path.getsize(self.system_image_zip.file_name)
+        return self.system_image_info.size
+
     def _copy_adb_to(self, dest):
         """Find adb, or download it if needed."""
         logging.info("Retrieving platform-tools")
-        tools = PlatformTools()
+        tools = PlatformTools(self.platform_tools)
         tools.extract_adb(dest)
 
     def write(self, destination):
@@ -49,9 +90,13 @@ class SystemImageContainer(DockerContainer):
             )
 
         writer = TemplateWriter(destination)
+        props = self.system_image_zip.props
+        if self.extract:
+            self._write_extracted(destination, writer, props)
+            return
+
         self._copy_adb_to(destination)
 
-        props = self.system_image_zip.props
         dest_zip = os.path.basename(self.system_image_zip.copy(destination))
         props["system_image_zip"] = dest_zip
         writer.write_template(
@@ -60,6 +105,25 @@ class SystemImageContainer(DockerContainer):
             rename_as="Dockerfile",
         )
 
+    def _write_extracted(self, destination, writer, props):
+        """Lays out the sdk on the host, so it can be copied in a single layer."""
+        sdk = Path(destination) / "sdk"
+        if sdk.exists():
+            shutil.rmtree(sdk)
+        (sdk / "platforms").mkdir(parents=True)
+        self._copy_adb_to(sdk)
+        adb = sdk / "platform-tools" / "adb"
+        adb.chmod(adb.stat().st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+
+        self.system_image_zip.extract(str(sdk / "system-images" / "android"), sparse=True)
+        # Keep the (downloaded) zip out of the build context.
+        (Path(destination) / ".dockerignore").write_text("*.zip\n", encoding="utf-8")
+        writer.write_template(
+            "Dockerfile.system_image_extracted",
+            props,
+            rename_as="Dockerfile",
+        )
+
     def image_name(self):
         if self.system_image_info:
             return self.system_image_info.image_name()
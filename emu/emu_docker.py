@@ -12,7 +12,12 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-"""Minimal dependency script to create a Dockerfile for a particular combination of emulator and system image."""
+"""Minimal dependency script to create a Dockerfile for a particular combination of emulator and system image.
+
+The CLI is invoked often, so this module only imports what is needed to parse
+the arguments. Every command imports the (heavy) modules it uses, such as
+docker, jinja2 and requests, when it runs.
+"""
 
 import argparse
 import itertools
@@ -22,31 +27,87 @@ import re
 import sys
 from pathlib import Path
 
-import click
-import colorlog
-import emu.emu_downloads_menu as emu_downloads_menu
-from emu.cloud_build import cloud_build
-from emu.containers.emulator_container import EmulatorContainer
-from emu.containers.system_image_container import SystemImageContainer
-from emu.docker_config import DockerConfig
+from emu import tracing
+from emu.containers import emulator_console
+from emu.containers.resource_profile import PROFILES, get_profile
 
 import emu
 
 
 def list_images(args):
     """Lists all the publicly available system and emlator images."""
+    import emu.emu_downloads_menu as emu_downloads_menu
+
     emu_downloads_menu.list_all_downloads(args.arm)
 
 
 def accept_licenses(args):
+    import emu.emu_downloads_menu as emu_downloads_menu
+
     emu_downloads_menu.accept_licenses(args.accept)
 
 
 def create_cloud_build_distribuition(args):
+    from emu.cloud_build import cloud_build
+
     cloud_build(args)
 
 
+def boot_benchmark(args):
+    """Measures the boot phases of an image, optionally comparing them against a baseline."""
+    from emu import benchmark
+
+    if args.replay:
+        image = benchmark.ReplayImage.from_file(args.replay)
+    else:
+        image = benchmark.LocalImage(args.image)
+
+    runs = benchmark.BootBenchmark(image, args.runs, args.timeout).run()
+    summary = benchmark.summarize(runs)
+    for phase, stats in summary.items():
+        print(
+            "{:<16} p50: {:>8.2f}s p90: {:>8.2f}s p99: {:>8.2f}s ({} runs)".format(
+                phase, stats["p50"], stats["p90"], stats["p99"], stats["runs"]
+            )
+        )
+
+    if args.save_baseline:
+        benchmark.save_baseline(args.save_baseline, summary)
+
+    if args.baseline:
+        regressions = benchmark.compare(
+            summary, benchmark.load_baseline(args.baseline), args.tolerance
+        )
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+def snapshot(args):
+    """Saves, loads or lists the snapshots of a running emulator container."""
+    import docker
+
+    container = docker.from_env().containers.get(args.container)
+    token = args.token or emulator_console.read_token()
+    try:
+        with emulator_console.connect(container, token, args.host) as console:
+            if args.action == "save":
+                console.snapshot_save(args.name)
+            elif args.action in ("load", "reset"):
+                console.snapshot_load(args.name)
+            elif args.action == "delete":
+                console.snapshot_delete(args.name)
+            else:
+                for name in console.snapshot_list():
+                    print(name)
+    except (OSError, emulator_console.ConsoleException) as err:
+        sys.exit(f"Unable to {args.action} the snapshot of {args.container}: {err}")
+
+
 def metrics_config(args):
+    from emu.docker_config import DockerConfig
+
     cfg = DockerConfig()
     if args.metrics:
         cfg.set_collect_metrics(True)
@@ -68,6 +129,14 @@ def create_docker_image(args):
 
     Returns the created DockerDevice objects.
     """
+    import emu.emu_downloads_menu as emu_downloads_menu
+    from emu.containers import port_allocator
+    from emu.containers.buildx_builder import BuildxBuilder
+    from emu.containers.docker_container import push_all
+    from emu.containers.emulator_container import EmulatorContainer
+    from emu.containers.runtime_container import EmulatorRuntimeContainer
+    from emu.containers.system_image_container import SystemImageContainer
+
     cfg = metrics_config(args)
     imgzip = [args.imgzip]
     if not os.path.exists(imgzip[0]):
@@ -81,13 +150,29 @@ def create_docker_image(args):
         logging.info("Treating %s as a build id", emuzip[0])
         emuzip = [emu_downloads_menu.download_build(emuzip[0])]
 
+    builder = None
+    if args.buildkit:
+        builder = BuildxBuilder(args.cache_repo, builder=args.builder)
+
     devices = []
+    to_push = []
     logging.info("Using repo %s", args.repo)
+
+    runtime = None
+    if args.runtime:
+        runtime = EmulatorRuntimeContainer(args.repo)
+        if not runtime.available() and not runtime.can_pull():
+            runtime.build(Path(args.dest) / "runtime", builder)
+        else:
+            print(f"No need to build {runtime}, it's already available")
+        if args.push:
+            to_push.append(runtime)
+
     for img, emulator in itertools.product(imgzip, emuzip):
         logging.info("Processing %s, %s", img, emulator)
-        sys_docker = SystemImageContainer(img, args.repo)
+        sys_docker = SystemImageContainer(img, args.repo, args.sys_extract)
         if not sys_docker.available() and not sys_docker.can_pull():
-            sys_docker.build(args.dest / "sys_img")
+            sys_docker.build(Path(args.dest) / "sys_img", builder)
         else:
             logging.info(
                 "Image %s is local: %s, pull: %s",
@@ -97,28 +182,58 @@ def create_docker_image(args):
             )
             print(f"No need to build {sys_docker}, it's already available")
         if args.push:
-            sys_docker.push()
+            to_push.append(sys_docker)
 
         if args.sys:
             continue
 
+        profile = get_profile(args.profile, args.cpuset) if args.profile else None
+        token = None
+        if args.console:
+            token = emulator_console.read_token() or sys.exit(
+                f"--console requires a token in {emulator_console.TOKEN_FILE}"
+            )
         emu_docker = EmulatorContainer(
-            emulator, sys_docker, args.repo, cfg.collect_metrics(), args.extra, args.name
+            emulator, sys_docker, args.repo, cfg.collect_metrics(), args.extra, args.name, runtime,
+            args.snapshot
         )
-        emu_docker.build(Path(args.dest) / "emulator")
+        emu_docker.build(Path(args.dest) / "emulator", builder)
 
         if args.start:
-            emu_docker.launch({"5555/tcp": 5555, "8554/tcp": 8554})
+            if args.port_range:
+                allocator = port_allocator.PortAllocator.from_range(
+                    args.port_range, state_file=args.port_state
+                )
+                handle = port_allocator.launch(
+                    emu_docker, allocator, profile, args.ephemeral, token
+                )
+                if handle:
+                    print(f"Published {handle}")
+            else:
+                port_map = {"5555/tcp": 5555, "8554/tcp": 8554}
+                if token:
+                    port_map[emulator_console.CONSOLE_PORT] = 5554
+                emu_docker.launch(port_map, profile, args.ephemeral, token)
         if args.push:
-            emu_docker.push()
+            to_push.append(emu_docker)
 
         devices.append(emu_docker)
 
+    if to_push:
+        push_all(to_push)
+
     return devices
 
 
 def create_docker_image_interactive(args):
     """Interactively create a docker image by selecting the desired combination from a menu."""
+    import click
+
+    import emu.emu_downloads_menu as emu_downloads_menu
+    from emu.containers.emulator_container import EmulatorContainer
+    from emu.containers.system_image_container import SystemImageContainer
+    from emu.docker_config import DockerConfig
+
     img = emu_downloads_menu.select_image(args.arm) or sys.exit(1)
     emulator = emu_downloads_menu.select_emulator() or sys.exit(1)
     cfg = DockerConfig()
@@ -161,6 +276,19 @@ def main():
         action="store_true",
         help="Set verbose logging",
     )
+    parser.add_argument(
+        "--trace",
+        choices=sorted(tracing.LEVELS),
+        default=None,
+        help="Trace template rendering, catalog queries and docker operations. counts reports the number "
+        "and duration of the operations when done, events also logs a sample of the individual operations.",
+    )
+    parser.add_argument(
+        "--trace-sample",
+        type=float,
+        default=1.0,
+        help="Fraction of the operations that is logged with --trace events.",
+    )
 
     subparsers = parser.add_subparsers()
 
@@ -255,6 +383,79 @@ def main():
     create_parser.add_argument(
         "--sys", action="store_true", help="Process system image layer only."
     )
+    create_parser.add_argument(
+        "--port-range",
+        default=None,
+        help="Publish the console, adb and gRPC ports of a started container on the first free "
+        "consecutive port triple in this range, for example 5554-5853. "
+        "When not set adb is published on 5555 and gRPC on 8554.",
+    )
+    create_parser.add_argument(
+        "--port-state",
+        default=None,
+        type=Path,
+        help="Json file in which the allocated port triples are recorded, shared by all invocations on this host.",
+    )
+    create_parser.add_argument(
+        "--profile",
+        default=None,
+        choices=sorted(PROFILES),
+        help="Limit the cpus, memory and shared memory of a started container, "
+        "the AVD gets the same number of cores and amount of RAM.",
+    )
+    create_parser.add_argument(
+        "--cpuset",
+        default=None,
+        help="Pin a started container to these host cpus, for example 0-3. Requires --profile.",
+    )
+    create_parser.add_argument(
+        "--ephemeral",
+        action="store_true",
+        help="Mount /data and /tmp of a started container as tmpfs, sized after the AVD data partition. "
+        "Userdata stays in RAM and is discarded with the container, which is useful for one-shot test devices.",
+    )
+    create_parser.add_argument(
+        "--console",
+        action="store_true",
+        help="Forward the emulator console of a started container, using the token in "
+        "~/.emulator_console_auth_token. Needed to save and load snapshots with the snapshot command.",
+    )
+    create_parser.add_argument(
+        "--snapshot",
+        action="store_true",
+        help="Boot the emulator once while creating the image, and store a quickboot snapshot in it. "
+        "Containers will restore from the snapshot instead of cold booting. Uses KVM when available. "
+        "The snapshot can only be restored on hosts that offer the same acceleration.",
+    )
+    create_parser.add_argument(
+        "--sys-extract",
+        action="store_true",
+        help="Extract the system image on the host, preserving sparse disk images, and add it as a single layer "
+        "instead of unzipping it during the docker build.",
+    )
+    create_parser.add_argument(
+        "--runtime",
+        action="store_true",
+        help="Build the emulator images on a shared, versioned runtime image that holds all the emulator dependencies. "
+        "The runtime is built once, the emulator and system image are added as the last layers.",
+    )
+    create_parser.add_argument(
+        "--buildkit",
+        action="store_true",
+        help="Build the images with BuildKit (docker buildx build) instead of the legacy builder. "
+        "Images are built with inline cache metadata, and previously pushed images are used as a cache source.",
+    )
+    create_parser.add_argument(
+        "--cache-repo",
+        default=None,
+        help="Repository to import and export the BuildKit layer cache, for example: us.gcr.io/emu-dev/cache. "
+        "Exporting a registry cache requires a buildx builder using the docker-container driver. Requires --buildkit.",
+    )
+    create_parser.add_argument(
+        "--builder",
+        default=None,
+        help="Name of the buildx builder instance to use with --buildkit.",
+    )
     create_parser.add_argument(
         "--name", help="Name to give image when pushed.", default=None
     )
@@ -323,6 +524,44 @@ def main():
         action="store_true",
         help="Write system image steps, otherwise write emulator steps.",
     )
+    dist_parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Regenerate every build context. By default contexts are only regenerated, and built, "
+        "when their templates, zip files or properties changed since they were last written to --dest.",
+    )
+    dist_parser.add_argument(
+        "--max-parallel",
+        type=int,
+        default=0,
+        help="Maximum number of build steps that run at the same time, 0 for no limit.",
+    )
+    dist_parser.add_argument(
+        "--machine-type",
+        default=None,
+        help="Cloud build machine type to run the build on, for example E2_HIGHCPU_32. "
+        "Consider a larger machine when running many steps in parallel.",
+    )
+    dist_parser.add_argument(
+        "--shards",
+        type=int,
+        default=1,
+        help="Split the build over this many cloudbuild-<n>.yaml configs of about the same size, "
+        "each with its own timeout. The configs are listed in shards.json.",
+    )
+    dist_parser.add_argument(
+        "--jobs",
+        type=int,
+        default=4,
+        help="Number of system images for which build contexts are written, and the registry is probed, in parallel.",
+    )
+    dist_parser.add_argument(
+        "--artifact-store",
+        default=None,
+        help="Directory or http(s) url of a content addressed store. Large files of the build contexts, "
+        "such as the emulator and system image, are uploaded to the store instead of being committed to git. "
+        "The build fetches them by digest.",
+    )
     dist_parser.add_argument(
         "emuzip",
         help="Zipfile containing the a publicly released emulator, or (canary|stable|[0-9]+) to use the latest canary, stable, or build id of the emulator to use. "
@@ -336,9 +575,78 @@ def main():
         'Use the list command to show all available images. For example "P google_apis_playstore x86_64".',
     )
     dist_parser.set_defaults(func=create_cloud_build_distribuition)
+
+    bench_parser = subparsers.add_parser(
+        "bench",
+        help="Launches an emulator image a number of times, and reports the percentiles of every boot phase.",
+    )
+    bench_parser.add_argument(
+        "image",
+        nargs="?",
+        help="The local docker image to benchmark, for example us-docker.pkg.dev/android-emulator-268719/images/30-google-x64:latest",
+    )
+    bench_parser.add_argument(
+        "--runs", type=int, default=5, help="Number of times the image is launched."
+    )
+    bench_parser.add_argument(
+        "--timeout", type=float, default=600, help="Seconds a single run gets to boot."
+    )
+    bench_parser.add_argument(
+        "--baseline", type=Path, help="Json baseline to compare against, exits with 1 on regressions."
+    )
+    bench_parser.add_argument(
+        "--save-baseline", type=Path, help="Store the results as a json baseline."
+    )
+    bench_parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.1,
+        help="Fraction by which a phase may be slower than the baseline before it is a regression.",
+    )
+    bench_parser.add_argument(
+        "--replay",
+        type=Path,
+        help="Replay recorded runs from a json file instead of launching containers.",
+    )
+    bench_parser.set_defaults(func=boot_benchmark)
+
+    snapshot_parser = subparsers.add_parser(
+        "snapshot",
+        help="Saves or restores a snapshot of a running emulator container through the emulator console. "
+        "Resetting a device to a snapshot takes seconds, instead of restarting the container.",
+    )
+    snapshot_parser.add_argument(
+        "action",
+        choices=["save", "load", "reset", "delete", "list"],
+        help="reset loads the snapshot, which is the quickboot snapshot unless --name is given.",
+    )
+    snapshot_parser.add_argument("container", help="Name or id of the running container.")
+    snapshot_parser.add_argument(
+        "--name",
+        default=emulator_console.DEFAULT_SNAPSHOT,
+        help="Name of the snapshot.",
+    )
+    snapshot_parser.add_argument(
+        "--token",
+        default=None,
+        help="Console auth token the container was started with, read from "
+        "~/.emulator_console_auth_token when not set.",
+    )
+    snapshot_parser.add_argument(
+        "--host", default="localhost", help="Host on which the container ports are published."
+    )
+    snapshot_parser.set_defaults(func=snapshot)
     args = parser.parse_args()
+    if getattr(args, "func", None) is boot_benchmark and not (args.image or args.replay):
+        bench_parser.error("an image or --replay is required")
+    if getattr(args, "func", None) is create_docker_image and args.cpuset and not args.profile:
+        create_parser.error("--cpuset requires --profile")
+    if getattr(args, "func", None) is create_docker_image and args.cache_repo and not args.buildkit:
+        create_parser.error("--cache-repo requires --buildkit")
 
     # Configure logger.
+    import colorlog
+
     lvl = logging.DEBUG if args.verbose else logging.WARNING
     handler = colorlog.StreamHandler()
     handler.setFormatter(
@@ -348,11 +656,17 @@ def main():
     logging.root.addHandler(handler)
     logging.root.setLevel(lvl)
 
+    if args.trace:
+        tracing.configure(args.trace, args.trace_sample)
+
     if hasattr(args, "func"):
         args.func(args)
     else:
         parser.print_help()
 
+    if tracing.enabled():
+        tracing.report()
+
 
 if __name__ == "__main__":
     main()
@@ -24,6 +24,8 @@ from pathlib import Path
 import click
 import requests
 from consolemenu import SelectionMenu
+
+from emu import tracing
 from emu.utils import download
 from emu.docker_config import DockerConfig
 
@@ -186,10 +188,18 @@ class SysImgInfo(LicensedObject):
 
         # prefer a url for a Linux host in case there are multiple
         url_element = pkg.find(".//archive[host-os='linux']/complete/url")
+        checksum_element = pkg.find(".//archive[host-os='linux']/complete/checksum")
+        size_element = pkg.find(".//archive[host-os='linux']/complete/size")
         # fallback is to pick the first url
         if url_element is None:
             url_element = pkg.find(".//url")
+            checksum_element = pkg.find(".//complete/checksum")
+            size_element = pkg.find(".//complete/size")
         self.zip = url_element.text
+        # The sha1 of the zip, identifies the release without downloading it.
+        self.checksum = checksum_element.text if checksum_element is not None else None
+        # Size of the zip in bytes, 0 if the catalog does not list it.
+        self.size = int(size_element.text) if size_element is not None else 0
 
         # The zip lives under sys-img/<sort_base>/, regardless of how
         # the <tag> element is labelled — for 16KB variants the path
@@ -277,7 +287,8 @@ def get_images_info(arm=False):
     Returns a list of AndroidSystemImages that were found and (hopefully) can boot."""
     xml = []
     for url in SYSIMG_REPOS:
-        response = requests.get(url)
+        with tracing.span("catalog", "fetch", url=url):
+            response = requests.get(url)
         if response.status_code == 200:
             xml.append(response.content)
 
@@ -321,12 +332,8 @@ def find_image(regexpr):
     reg = re.compile(regexpr)
     all_images = get_images_info(True)
     matches = [img for img in all_images if reg.match(str(img))]
-    logging.info(
-        "Found %s matching images: %s from %s",
-        regexpr,
-        [str(x) for x in matches],
-        [str(x) for x in all_images],
-    )
+    logging.info("Found %d of %d images matching %s", len(matches), len(all_images), regexpr)
+    tracing.event("catalog", "find_image", regex=regexpr, matches=lambda: [str(x) for x in matches])
     if not matches:
         raise ImageNotFoundException(
             f"No system image found matching {regexpr}. Run the list command to list available images"
@@ -343,7 +350,8 @@ def find_emulator(channel):
         for x in get_emus_info()
         if "linux" in x.urls and (channel == "all" or x.channel == channel)
     ]
-    logging.info("Found %s matching images: %s", channel, [str(x) for x in emu_infos])
+    logging.info("Found %d emulators in channel %s", len(emu_infos), channel)
+    tracing.event("catalog", "find_emulator", channel=channel, matches=lambda: [str(x) for x in emu_infos])
     if not emu_infos:
         raise EmulatorNotFoundException(f"No emulator found in channel {channel}")
     return emu_infos
@@ -355,7 +363,8 @@ def get_emus_info():
     Returns a list of EmuInfo items that were found."""
     xml = []
     for url in EMU_REPOS:
-        response = requests.get(url)
+        with tracing.span("catalog", "fetch", url=url):
+            response = requests.get(url)
         if response.status_code == 200:
             xml.append(response.content)
 
@@ -0,0 +1,177 @@
+# Copyright 2026 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Generates a docker compose stack in which a single envoy fronts many emulators.
+
+Every device gets its own service, and its own route in envoy. A gRPC-web
+client reaches a device by using https://<host>/<device name> as its endpoint,
+envoy strips the device name before forwarding the request. Requests without
+a device name go to the first device, so the existing web app keeps working.
+"""
+import copy
+import re
+from pathlib import Path
+from typing import List, NamedTuple, Optional, Sequence, Tuple, Union
+
+import yaml
+
+from emu.template_writer import TemplateWriter
+
+DEFAULT_IMAGE = "emulator_emulator:latest"
+
+# The envoy config of the single emulator setup, the stack config is derived from it.
+ENVOY_TEMPLATE = Path(__file__).resolve().parents[1] / "js" / "docker" / "envoy.template.yaml"
+
+# The placeholder of the firebase project id, and the emulator cluster in ENVOY_TEMPLATE.
+FIREBASE_PROJECT_ID = "__FIREBASE_PROJECT_ID__"
+EMULATOR_CLUSTER = "emulator_service_grpc"
+
+# Device names are used as service names, hostnames and url prefixes.
+_NAME = re.compile(r"^[a-z0-9][a-z0-9_-]*$")
+
+
+class StackDevice(NamedTuple):
+    """An emulator service in the stack."""
+
+    name: str
+    image: str = DEFAULT_IMAGE
+    # Host port on which adb is published, if any.
+    adb_port: Optional[int] = None
+
+
+def stack_devices(
+    devices: Union[int, Sequence[str]], image: str = DEFAULT_IMAGE, adb_port: Optional[int] = None
+) -> List[StackDevice]:
+    """Creates the devices of a stack.
+
+    Args:
+        devices: The number of devices, named emulator-1 to emulator-N, or a list of
+            device names. A name can be followed by the image to use, i.e. "pixel=us.gcr.io/emu/30:1234".
+        image (str, optional): The image of devices that do not name one.
+        adb_port (int, optional): Publish adb of the devices on consecutive host ports starting here.
+
+    Raises:
+        ValueError: A device name cannot be used, or is used twice.
+    """
+    if isinstance(devices, int):
+        devices = [f"emulator-{idx + 1}" for idx in range(devices)]
+
+    result = []
+    for idx, spec in enumerate(devices):
+        name, _, device_image = spec.partition("=")
+        if not _NAME.match(name) or name in ("front-envoy", "nginx"):
+            raise ValueError(f"Invalid device name: {name}")
+        if name in [device.name for device in result]:
+            raise ValueError(f"Duplicate device name: {name}")
+        port = adb_port + idx if adb_port else None
+        result.append(StackDevice(name, device_image or image, port))
+
+    if not result:
+        raise ValueError("A stack needs at least one device")
+    return result
+
+
+def render_envoy(template: str, devices: List[StackDevice], firebase_project_id: str) -> str:
+    """Derives the envoy config of the stack from the config of a single emulator.
+
+    Every route and authentication rule of the emulator cluster gets a copy per
+    device, prefixed with the device name, and the emulator cluster is replaced
+    by a cluster per device. The original routes go to the first device.
+
+    Args:
+        template (str): The single emulator config, i.e. the contents of ENVOY_TEMPLATE.
+        devices (List[StackDevice]): The emulators behind envoy.
+        firebase_project_id (str): The firebase project that issues the JWTs envoy accepts.
+
+    Returns:
+        str: The envoy config of the stack.
+    """
+    config = yaml.safe_load(template.replace(FIREBASE_PROJECT_ID, firebase_project_id))
+    resources = config["static_resources"]
+    manager = resources["listeners"][0]["filter_chains"][0]["filters"][0]["typed_config"]
+
+    for host in manager["route_config"]["virtual_hosts"]:
+        emulator_routes = [r for r in host["routes"] if r["route"].get("cluster") == EMULATOR_CLUSTER]
+        prefixes = [route["match"]["prefix"] for route in emulator_routes]
+        routes = []
+        for device in devices:
+            for route in emulator_routes:
+                device_route = copy.deepcopy(route)
+                device_route["match"]["prefix"] = f"/{device.name}{route['match']['prefix']}"
+                device_route["route"]["cluster"] = f"{device.name}_grpc"
+                device_route["route"]["prefix_rewrite"] = route["match"]["prefix"]
+                routes.append(device_route)
+        for route in host["routes"]:
+            if route in emulator_routes:
+                route["route"]["cluster"] = f"{devices[0].name}_grpc"
+            routes.append(route)
+        host["routes"] = routes
+
+    # The JWT filter sees the path before it is rewritten.
+    for http_filter in manager["http_filters"]:
+        if http_filter["name"] != "envoy.filters.http.jwt_authn":
+            continue
+        rules = http_filter["typed_config"]["rules"]
+        http_filter["typed_config"]["rules"] = [
+            dict(copy.deepcopy(rule), match={"prefix": f"/{device.name}{rule['match']['prefix']}"})
+            for device in devices
+            for rule in rules
+            if rule["match"]["prefix"] in prefixes
+        ] + rules
+
+    clusters = []
+    for cluster in resources["clusters"]:
+        if cluster["name"] != EMULATOR_CLUSTER:
+            clusters.append(cluster)
+            continue
+        for device in devices:
+            device_cluster = copy.deepcopy(cluster)
+            device_cluster["name"] = device_cluster["load_assignment"]["cluster_name"] = f"{device.name}_grpc"
+            for endpoints in device_cluster["load_assignment"]["endpoints"]:
+                for endpoint in endpoints["lb_endpoints"]:
+                    endpoint["endpoint"]["address"]["socket_address"]["address"] = device.name
+            clusters.append(device_cluster)
+    resources["clusters"] = clusters
+
+    header = f"# Generated by emu.emulator_stack, one envoy in front of {len(devices)} emulators.\n"
+    return header + yaml.safe_dump(config, sort_keys=False)
+
+
+def write_stack(
+    dest: Path,
+    devices: List[StackDevice],
+    firebase_project_id: str,
+    compose_name: str = "docker-compose.yaml",
+    envoy_template: Path = ENVOY_TEMPLATE,
+) -> Tuple[Path, Path]:
+    """Writes the compose file and envoy.yaml of the stack to dest.
+
+    The envoy service of the compose file mounts the written envoy.yaml.
+
+    Args:
+        dest (Path): The directory to write the files to.
+        devices (List[StackDevice]): The emulators behind envoy.
+        firebase_project_id (str): The firebase project that issues the JWTs envoy accepts.
+        compose_name (str, optional): The name of the compose file.
+        envoy_template (Path, optional): The single emulator envoy config to derive envoy.yaml from.
+
+    Returns:
+        (Path, Path): The written compose file and envoy config.
+    """
+    writer = TemplateWriter(dest)
+    props = {"devices": devices}
+    compose = writer.write_template("stack/docker-compose.yaml", props, rename_as=compose_name)
+    envoy = Path(dest) / "envoy.yaml"
+    template = Path(envoy_template).read_text(encoding="utf-8")
+    envoy.write_text(render_envoy(template, devices, firebase_project_id), encoding="utf-8")
+    return compose, envoy
@@ -0,0 +1,251 @@
+# Copyright 2026 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Collects the logs of many emulator containers at once.
+
+The log stream of every container is split into its channels (kernel, logcat,
+emulator, ...), which are written to compressed, rotated files:
+
+    <dest>/<container>/<channel>.log.gz
+    <dest>/<container>/<channel>.1.log.gz
+    ...
+
+Reading a stream never waits for the disk. Lines are kept in a bounded buffer
+per channel until they are written, when a writer falls behind the oldest
+lines are dropped, and counted.
+"""
+import asyncio
+import collections
+import gzip
+import logging
+import os
+from pathlib import Path
+from typing import AsyncIterator, Callable, Deque, Dict, Iterable, Optional
+
+from emu.containers.readiness import parse_line
+
+
+async def docker_logs(name: str) -> AsyncIterator[str]:
+    """Follows the logs of a container through the docker cli."""
+    proc = await asyncio.create_subprocess_exec(
+        "docker",
+        "logs",
+        "--follow",
+        name,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.STDOUT,
+    )
+    try:
+        async for line in proc.stdout:
+            yield line.decode("utf-8", errors="replace").rstrip("\r\n")
+    finally:
+        if proc.returncode is None:
+            proc.kill()
+        await proc.wait()
+
+
+class ChannelBuffer:
+    """The lines of a single channel that have not been written yet."""
+
+    def __init__(self, max_lines: int):
+        self.lines: Deque[str] = collections.deque(maxlen=max_lines)
+        self.received = 0
+        self.dropped = 0
+
+    def append(self, line: str):
+        if len(self.lines) == self.lines.maxlen:
+            self.dropped += 1
+        self.lines.append(line)
+        self.received += 1
+
+    def take(self):
+        """Removes and returns all the buffered lines."""
+        lines = list(self.lines)
+        self.lines.clear()
+        return lines
+
+
+class RotatingGzipFile:
+    """A gzip compressed log file, rotated once max_bytes of log lines are written to it."""
+
+    def __init__(self, path: Path, max_bytes: int, backups: int):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.written = 0
+        self.file = None
+
+    def write(self, lines: Iterable[str]):
+        for line in lines:
+            if self.file is None:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self.file = gzip.open(self.path, "at", encoding="utf-8")
+            self.file.write(line + "\n")
+            self.written += len(line) + 1
+            if self.written >= self.max_bytes:
+                self.rotate()
+
+    def rotate(self):
+        self.close()
+        stem = self.path.name[: -len(".log.gz")]
+        for idx in range(self.backups - 1, 0, -1):
+            src = self.path.with_name(f"{stem}.{idx}.log.gz")
+            if src.exists():
+                os.replace(src, self.path.with_name(f"{stem}.{idx + 1}.log.gz"))
+        if self.backups:
+            os.replace(self.path, self.path.with_name(f"{stem}.1.log.gz"))
+        else:
+            self.path.unlink()
+        self.written = 0
+
+    def close(self):
+        if self.file:
+            self.file.close()
+            self.file = None
+
+
+class DeviceLogs:
+    """The channel buffers and log files of a single container."""
+
+    def __init__(self, name: str, dest: Path, max_lines: int, max_bytes: int, backups: int):
+        self.name = name
+        self.dest = Path(dest) / name
+        self.max_lines = max_lines
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.buffers: Dict[str, ChannelBuffer] = {}
+        self.files: Dict[str, RotatingGzipFile] = {}
+
+    def add(self, line: str):
+        channel, message = parse_line(line)
+        if channel not in self.buffers:
+            self.buffers[channel] = ChannelBuffer(self.max_lines)
+        self.buffers[channel].append(message)
+
+    def pending(self) -> Dict[str, list]:
+        """Takes the buffered lines of every channel."""
+        return {channel: buffer.take() for channel, buffer in self.buffers.items() if buffer.lines}
+
+    def write(self, pending: Dict[str, list]):
+        for channel, lines in pending.items():
+            if channel not in self.files:
+                self.files[channel] = RotatingGzipFile(
+                    self.dest / f"{channel}.log.gz", self.max_bytes, self.backups
+                )
+            self.files[channel].write(lines)
+
+    def close(self):
+        for log_file in self.files.values():
+            log_file.close()
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {
+            channel: {"received": buffer.received, "dropped": buffer.dropped}
+            for channel, buffer in self.buffers.items()
+        }
+
+
+class LogCollector:
+    """Follows the log streams of many containers concurrently.
+
+    For example:
+
+        collector = LogCollector(Path("logs"))
+        asyncio.run(collector.run(["emulator_1", "emulator_2"]))
+    """
+
+    def __init__(
+        self,
+        dest: Path,
+        source: Callable[[str], AsyncIterator[str]] = docker_logs,
+        max_lines: int = 10000,
+        max_bytes: int = 64 * 1024 * 1024,
+        backups: int = 5,
+        flush_interval: float = 1.0,
+    ):
+        """Creates a log collector.
+
+        Args:
+            dest (Path): Directory in which a directory per container is created.
+            source (Callable, optional): Returns the log lines of a container, follows docker logs by default.
+            max_lines (int, optional): Lines buffered per channel, older lines are dropped when exceeded.
+            max_bytes (int, optional): Uncompressed bytes written to a log file before it is rotated.
+            backups (int, optional): The number of rotated log files to keep.
+            flush_interval (float, optional): Seconds between writes of the buffered lines.
+        """
+        self.dest = Path(dest)
+        self.source = source
+        self.max_lines = max_lines
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.flush_interval = flush_interval
+        self.devices: Dict[str, DeviceLogs] = {}
+        self._stopped: Optional[asyncio.Event] = None
+
+    async def run(self, names: Iterable[str]):
+        """Collects the logs of the containers until all streams end, or stop() is called."""
+        self._stopped = asyncio.Event()
+        readers = [asyncio.create_task(self._follow(name)) for name in names]
+        writer = asyncio.create_task(self._write_loop())
+        stop = asyncio.create_task(self._stopped.wait())
+        try:
+            await asyncio.wait(
+                [stop, asyncio.gather(*readers, return_exceptions=True)],
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+        finally:
+            for task in readers + [stop]:
+                task.cancel()
+            await asyncio.gather(*readers, stop, return_exceptions=True)
+            self._stopped.set()
+            await writer
+            for device in self.devices.values():
+                device.close()
+                dropped = sum(channel["dropped"] for channel in device.stats().values())
+                if dropped:
+                    logging.warning("Dropped %d log lines of %s", dropped, device.name)
+
+    def stop(self):
+        """Stops following the logs, everything that was received is still written."""
+        if self._stopped:
+            self._stopped.set()
+
+    def stats(self) -> Dict[str, Dict[str, Dict[str, int]]]:
+        """The number of received and dropped lines, per container and channel."""
+        return {name: device.stats() for name, device in self.devices.items()}
+
+    async def _follow(self, name: str):
+        device = DeviceLogs(name, self.dest, self.max_lines, self.max_bytes, self.backups)
+        self.devices[name] = device
+        try:
+            async for line in self.source(name):
+                device.add(line)
+        except Exception as err:
+            logging.warning("Stopped following the logs of %s due to %s", name, err)
+
+    async def _write_loop(self):
+        stopped = False
+        while not stopped:
+            try:
+                await asyncio.wait_for(self._stopped.wait(), self.flush_interval)
+                stopped = True
+            except asyncio.TimeoutError:
+                pass
+            await self._flush()
+
+    async def _flush(self):
+        for device in list(self.devices.values()):
+            pending = device.pending()
+            if pending:
+                # Compression and disk I/O happen off the event loop.
+                await asyncio.to_thread(device.write, pending)
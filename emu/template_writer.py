@@ -11,11 +11,76 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import functools
 import logging
+import os
 from pathlib import Path
-from typing import Dict
+from typing import Dict, Iterable, List, NamedTuple, Optional
 
-from jinja2 import Environment, PackageLoader
+from jinja2 import Environment, FileSystemBytecodeCache, PackageLoader
+
+from emu import tracing
+
+# Directory of the compiled templates, shared between runs. Jinja picks a
+# directory in the temp dir of the user when this is not set.
+TEMPLATE_CACHE = os.environ.get("EMU_TEMPLATE_CACHE")
+
+
+@functools.lru_cache(maxsize=None)
+def shared_environment() -> Environment:
+    """The Jinja environment used by all the template writers of this process.
+
+    A template is compiled the first time it is used, and kept for the rest of
+    the run. The compiled templates are cached on disk, so later runs only
+    recompile the templates whose source changed.
+    """
+    if TEMPLATE_CACHE:
+        os.makedirs(TEMPLATE_CACHE, exist_ok=True)
+    return Environment(
+        loader=PackageLoader("emu", "templates"),
+        bytecode_cache=FileSystemBytecodeCache(TEMPLATE_CACHE, "emu-docker-%s.cache"),
+        # Templates are part of the package, they do not change while we run.
+        auto_reload=False,
+        cache_size=-1,
+    )
+
+
+class Render(NamedTuple):
+    """A template to write with write_all."""
+
+    out_dir: Path
+    template_file: str
+    template_dict: Dict[str, str]
+    rename_as: Optional[str] = None
+
+    def dest_file(self) -> Path:
+        """The file the template is written to."""
+        return Path(self.out_dir) / (self.rename_as or self.template_file)
+
+
+def write_all(renders: Iterable[Render]) -> List[Path]:
+    """Fills out many templates, for any number of destination directories.
+
+    Files that already have the rendered content are left untouched.
+
+    Args:
+        renders (Iterable[Render]): The templates to write.
+
+    Returns:
+        [Path]: The files whose content changed, in the order of the renders.
+    """
+    writers = {}
+    changed = []
+    for render in renders:
+        out_dir = Path(render.out_dir)
+        if out_dir not in writers:
+            writers[out_dir] = TemplateWriter(out_dir)
+        writer = writers[out_dir]
+        count = len(writer.changed)
+        path = writer.write_template(render.template_file, render.template_dict, render.rename_as)
+        if len(writer.changed) > count:
+            changed.append(path)
+    return changed
 
 
 class TemplateWriter:
@@ -32,8 +97,10 @@ class TemplateWriter:
         Args:
             out_dir (str): The directory where templates will be written.
         """
-        self.env = Environment(loader=PackageLoader("emu", "templates"))
+        self.env = shared_environment()
         self.dest = Path(out_dir)
+        # The files this writer created, or whose content it changed.
+        self.changed: List[Path] = []
 
     def _jinja_safe_dict(self, props: Dict[str, str]) -> Dict[str, str]:
         """Replaces all the . with _ in the keys of a dictionary.
@@ -46,18 +113,33 @@ class TemplateWriter:
         """
         return {key.replace(".", "_"): val for key, val in props.items()}
 
+    def template_source(self, template_file: str) -> str:
+        """The unrendered source of the given template.
+
+        Args:
+            template_file (str): The name of the template file.
+
+        Returns:
+            str: The contents of the template.
+        """
+        source, _filename, _uptodate = self.env.loader.get_source(self.env, template_file)
+        return source
+
     def write_template(
         self, template_file: str, template_dict: Dict[str, str], rename_as: str = None
     ) -> Path:
         """Fill out the given template, writing it to the destination directory.
 
+        The file is not written when it already has the rendered content, so
+        its modification time is preserved. Check changed to see whether it was.
+
         Args:
             template_file (str): The name of the template file to fill.
             template_dict (dict): The dictionary to use to fill in the template.
             rename_as (str, optional): The name to use for the output file. Defaults to None.
 
         Returns:
-            Path: The path to the written file.
+            Path: The path to the file.
         """
         dest_name = rename_as if rename_as else template_file
         return self._write_template_to(
@@ -66,7 +148,7 @@ class TemplateWriter:
 
     def _write_template_to(
         self, tmpl_file: str, dest_file: Path, template_dict: Dict[str, str]
-    ) -> None:
+    ) -> Path:
         """Loads the given template, writing it to the dest_file.
 
         Note: the template will be written {dest_dir}/{tmpl_file},
@@ -77,9 +159,16 @@ class TemplateWriter:
             dest_file (pathlib.Path): The path to the file to be written.
             template_dict (dict): The dictionary to use to fill in the template.
         """
-        template = self.env.get_template(tmpl_file)
         safe_dict = self._jinja_safe_dict(template_dict)
-        dest_file.parent.mkdir(parents=True, exist_ok=True)
-        logging.info("Writing: %s -> %s with %s", tmpl_file, dest_file, safe_dict)
-        with open(dest_file, "wb") as dfile:
-            dfile.write(template.render(safe_dict).encode("utf-8"))
+        with tracing.span("template", tmpl_file, dest=dest_file, keys=lambda: sorted(safe_dict)):
+            content = self.env.get_template(tmpl_file).render(safe_dict).encode("utf-8")
+            if dest_file.is_file() and dest_file.read_bytes() == content:
+                logging.debug("Unchanged: %s -> %s", tmpl_file, dest_file)
+                return dest_file
+
+            dest_file.parent.mkdir(parents=True, exist_ok=True)
+            logging.debug("Writing: %s -> %s", tmpl_file, dest_file)
+            with open(dest_file, "wb") as dfile:
+                dfile.write(content)
+        self.changed.append(dest_file)
+        return dest_file
@@ -0,0 +1,45 @@
+#!/bin/bash
+# Copyright 2026 - The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# Fetches the artifacts listed in the artifacts.lock of a build context
+# from the artifact store, and verifies their sha256.
+#
+# usage: fetch-artifacts.sh <build context>
+set -euo pipefail
+
+context=$1
+store=""
+while read -r kind digest path; do
+  case "$kind" in
+    store)
+      store=$digest
+      ;;
+    file|tree)
+      hex=${digest#sha256:}
+      tmp="$context/.artifact-$hex"
+      echo "Fetching $path ($digest)"
+      curl --fail --silent --show-error --location --retry 3 --output "$tmp" "$store/sha256/$hex"
+      echo "$hex  $tmp" | sha256sum --check --quiet -
+      rm -rf "${context:?}/$path"
+      if [ "$kind" = "tree" ]; then
+        mkdir -p "$context/$path"
+        tar -xzf "$tmp" -C "$context/$path"
+        rm "$tmp"
+      else
+        mv "$tmp" "$context/$path"
+      fi
+      ;;
+  esac
+done <"$context/artifacts.lock"
@@ -14,10 +14,22 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 VERBOSE=3
-ANDROID_AVD_HOME=/root/.android/avd
+# The AVD as it is shipped in the image, it is copied to the data partition
+# when one is mounted.
+IMAGE_AVD_HOME=/android-home
+DATA_PART=/data
+ANDROID_AVD_HOME=${IMAGE_AVD_HOME}
+QUICKBOOT_SNAPSHOT=/android-home/MediumPhone.avd/snapshots/default_boot
+
+# When invoked as "launch-emulator.sh --bake-snapshot <timeout>" the emulator
+# boots once, and saves a quickboot snapshot in the avd when it exits.
+BAKE_SNAPSHOT=
+if [ "$1" == "--bake-snapshot" ]; then
+  BAKE_SNAPSHOT=${2:-300}
+fi
 
 is_mounted () {
-    mount | grep "$1"
+    mount | grep -q " $1 "
 }
 
 # Run a command, output depends on verbosity level
@@ -124,30 +136,48 @@ setup_pulse_audio() {
   run mkdir -p /root/.config/pulse
   export PULSE_SERVER=unix:/tmp/pulse-socket
   run pulseaudio -D -vvvv --log-time=1 --log-target=newfile:/tmp/pulseverbose.log --log-time=1 --exit-idle-time=-1
-  tail -f /tmp/pulseverbose.log -n +1 | sed -u 's/^/pulse: /g' &
   run pactl list || exit 1
 }
 
 forward_loggers() {
+  # A single process forwards all the logs, prefixed with their channel.
+  # Set LOG_FORMAT=json to get json lines with timestamps instead.
   run mkdir /tmp/android-unknown
   run mkfifo /tmp/android-unknown/kernel.log
   run mkfifo /tmp/android-unknown/logcat.log
-  echo "emulator: It is safe to ignore the warnings from tail. The files will come into existence soon."
-  tail --retry -f /tmp/android-unknown/goldfish_rtc_0 | sed -u 's/^/video: /g' &
-  cat /tmp/android-unknown/kernel.log | sed -u 's/^/kernel: /g' &
-  cat /tmp/android-unknown/logcat.log | sed -u 's/^/logcat: /g' &
+  /android/sdk/log-mux.pl \
+    video=/tmp/android-unknown/goldfish_rtc_0 \
+    kernel=/tmp/android-unknown/kernel.log \
+    logcat=/tmp/android-unknown/logcat.log \
+    pulse=/tmp/pulseverbose.log &
 }
 
 initialize_data_part() {
   # Check if we have mounted a data partition (tmpfs, or persistent)
   # and if so, we will use that as our avd directory.
-  if  is_mounted /data; then
-    run cp -fr /android-home/ /data
-    ln -sf /data/android-home ${ANDROID_AVD_HOME}
+  mkdir -p /root/.android
+  if is_mounted ${DATA_PART}; then
+    run cp -fr ${IMAGE_AVD_HOME}/ ${DATA_PART}
+    export ANDROID_AVD_HOME=${DATA_PART}/android-home
     echo "path=${ANDROID_AVD_HOME}/MediumPhone.avd" > ${ANDROID_AVD_HOME}/MediumPhone.ini
   else
-    ln -sf /android-home ${ANDROID_AVD_HOME}
+    export ANDROID_AVD_HOME=${IMAGE_AVD_HOME}
   fi
+  ln -sfn ${ANDROID_AVD_HOME} /root/.android/avd
+}
+
+snapshot_matches_resources() {
+  # A snapshot can only be restored with the cores and RAM it was created with,
+  # which are recorded in the image when the snapshot is baked.
+  if [ ! -z "${EMULATOR_CORES}" ] && [ "${EMULATOR_CORES}" != "${EMULATOR_SNAPSHOT_CORES:-${EMULATOR_CORES}}" ]; then
+    echo "emulator: Snapshot was created with ${EMULATOR_SNAPSHOT_CORES} cores, not ${EMULATOR_CORES}, cold booting."
+    return 1
+  fi
+  if [ ! -z "${EMULATOR_RAM_MB}" ] && [ "${EMULATOR_RAM_MB}" != "${EMULATOR_SNAPSHOT_RAM_MB:-${EMULATOR_RAM_MB}}" ]; then
+    echo "emulator: Snapshot was created with ${EMULATOR_SNAPSHOT_RAM_MB}MB, not ${EMULATOR_RAM_MB}MB, cold booting."
+    return 1
+  fi
+  return 0
 }
 
 # Let us log the emulator,script and image version.
@@ -177,12 +207,44 @@ socat -d tcp-listen:5555,reuseaddr,fork tcp:127.0.0.1:5557 &
 LAUNCH_CMD=("emulator/emulator")
 LAUNCH_CMD+=("-avd" "MediumPhone")
 LAUNCH_CMD+=("-ports" "5556,5557" "-grpc" "8554" "-no-window")
-LAUNCH_CMD+=("-skip-adb-auth" "-no-snapshot-save" "-wipe-data" "-no-boot-anim")
+LAUNCH_CMD+=("-skip-adb-auth" "-no-boot-anim")
+if [ ! -z "${BAKE_SNAPSHOT}" ]; then
+  echo "emulator: Creating a quickboot snapshot, exiting after boot."
+  LAUNCH_CMD+=("-wipe-data" "-quit-after-boot" "${BAKE_SNAPSHOT}")
+  if [ ! -e /dev/kvm ]; then
+    echo "emulator: KVM is not available, booting without acceleration."
+    LAUNCH_CMD+=("-accel" "off")
+  fi
+elif [ -d "${QUICKBOOT_SNAPSHOT}" ] && snapshot_matches_resources; then
+  echo "emulator: Restoring from the quickboot snapshot."
+  LAUNCH_CMD+=("-no-snapshot-save")
+else
+  LAUNCH_CMD+=("-no-snapshot-save" "-wipe-data")
+fi
 LAUNCH_CMD+=("-shell-serial" "file:/tmp/android-unknown/kernel.log")
 LAUNCH_CMD+=("-logcat" "*:V")
 LAUNCH_CMD+=("-feature" "AllowSnapshotMigration")
 LAUNCH_CMD+=({{extra}})
 
+# Match the AVD to the resources of the container, see ResourceProfile.
+if [ ! -z "${EMULATOR_CORES}" ]; then
+  LAUNCH_CMD+=("-cores" "${EMULATOR_CORES}")
+fi
+if [ ! -z "${EMULATOR_RAM_MB}" ]; then
+  LAUNCH_CMD+=("-memory" "${EMULATOR_RAM_MB}")
+fi
+
+# Images built on the shared emulator runtime carry their flags in a separate file.
+if [ -f "/android/sdk/launch-flags.sh" ]; then
+  . /android/sdk/launch-flags.sh
+  LAUNCH_CMD+=("${EXTRA_FLAGS[@]}")
+fi
+
+# Images that collect usage metrics set this, see Dockerfile.metrics.
+if [ "${EMULATOR_METRICS}" = "true" ]; then
+  LAUNCH_CMD+=("-metrics-collection")
+fi
+
 if [ ! -z "${EMULATOR_PARAMS}" ]; then
   LAUNCH_CMD+=($EMULATOR_PARAMS)
 fi
@@ -194,10 +256,6 @@ fi
 # Add qemu specific parameters
 LAUNCH_CMD+=("-qemu" "-append" "panic=1")
 
-if [ ! -z "${ANDROID_AVD_HOME}" ]; then
-  export ANDROID_AVD_HOME=/android-home
-fi
-
 # Kick off the emulator
 echo "emulator: " $(env)
 echo "emulator: ${LAUNCH_CMD[@]}"
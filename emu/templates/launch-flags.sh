@@ -0,0 +1,2 @@
+# Emulator flags of this image, sourced by launch-emulator.sh.
+EXTRA_FLAGS=({{extra}})
@@ -0,0 +1,133 @@
+#!/usr/bin/perl
+#
+# Copyright 2026 - The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# Forwards the emulator log files to stdout, prefixing every line with its channel.
+#
+# Usage: log-mux.pl channel=path [channel=path ...]
+#
+# FIFOs are read as soon as data is written to them, regular files are followed
+# like "tail --retry -f", they do not need to exist yet. Lines are written in
+# batches instead of one write per line.
+#
+# When LOG_FORMAT=json every line is written as a json object instead, i.e.
+#   {"time":"2026-10-19T10:00:00Z","channel":"kernel","message":"..."}
+#
+# Only modules from perl-base are used, so this runs on a bare Ubuntu image.
+# That rules out Time::HiRes, the timestamps are in whole seconds.
+use strict;
+use warnings;
+use Fcntl qw(O_RDWR O_RDONLY O_NONBLOCK);
+use IO::Select;
+use POSIX qw(strftime sysconf times _SC_CLK_TCK);
+
+my $JSON = ($ENV{LOG_FORMAT} || "") eq "json";
+my $POLL_INTERVAL = 0.25;
+my $CHUNK = 65536;
+my $CLOCK_TICKS = sysconf(_SC_CLK_TCK) || 100;
+
+my (@fifos, @files, %pending);
+for my $arg (@ARGV) {
+    my ($channel, $path) = split(/=/, $arg, 2);
+    die "Usage: $0 channel=path [channel=path ...]\n" unless defined $path;
+    if (-p $path) {
+        # Opening read/write never blocks, and keeps the fifo open when the writer goes away.
+        sysopen(my $fh, $path, O_RDWR | O_NONBLOCK) or die "Unable to open $path: $!\n";
+        push @fifos, {channel => $channel, fh => $fh};
+    } else {
+        push @files, {channel => $channel, path => $path, fh => undef, pos => 0};
+    }
+}
+
+my $select = IO::Select->new(map { $_->{fh} } @fifos);
+my %by_fh = map { fileno($_->{fh}) => $_ } @fifos;
+my $out = "";
+
+sub escape {
+    my ($str) = @_;
+    $str =~ s/(["\\])/\\$1/g;
+    $str =~ s/\t/\\t/g;
+    $str =~ s/([\x00-\x1f])/sprintf("\\u%04x", ord($1))/ge;
+    return $str;
+}
+
+sub emit {
+    my ($channel, $data) = @_;
+    $pending{$channel} .= $data;
+    my @lines = split(/\n/, $pending{$channel}, -1);
+    $pending{$channel} = pop @lines;
+    return unless @lines;
+    if ($JSON) {
+        my $stamp = strftime("%Y-%m-%dT%H:%M:%SZ", gmtime(time));
+        my $prefix = "{\"time\":\"$stamp\",\"channel\":\"" . escape($channel) . "\",\"message\":\"";
+        $out .= $prefix . escape($_) . "\"}\n" for @lines;
+    } else {
+        $out .= "$channel: $_\n" for @lines;
+    }
+}
+
+# Seconds since an arbitrary point, with the resolution of a clock tick.
+sub elapsed {
+    my ($ticks) = times();
+    return $ticks / $CLOCK_TICKS;
+}
+
+sub flush_out {
+    while (length $out) {
+        my $written = syswrite(STDOUT, $out);
+        exit 0 unless defined $written;
+        substr($out, 0, $written, "");
+    }
+}
+
+sub follow_files {
+    for my $file (@files) {
+        if (!$file->{fh}) {
+            sysopen(my $fh, $file->{path}, O_RDONLY) or next;
+            $file->{fh} = $fh;
+            $file->{pos} = 0;
+        }
+        # Start over if the file was truncated.
+        if ((-s $file->{fh} || 0) < $file->{pos}) {
+            sysseek($file->{fh}, 0, 0);
+            $file->{pos} = 0;
+        }
+        while ((my $read = sysread($file->{fh}, my $data, $CHUNK)) > 0) {
+            $file->{pos} += $read;
+            emit($file->{channel}, $data);
+        }
+    }
+}
+
+$SIG{TERM} = $SIG{INT} = sub {
+    emit($_, "\n") for grep { length $pending{$_} } keys %pending;
+    flush_out();
+    exit 0;
+};
+
+my $last_poll = -$POLL_INTERVAL;
+while (1) {
+    my @ready = $select->count ? $select->can_read($POLL_INTERVAL) : ();
+    select(undef, undef, undef, $POLL_INTERVAL) unless $select->count;
+    for my $fh (@ready) {
+        my $read = sysread($fh, my $data, $CHUNK);
+        emit($by_fh{fileno($fh)}->{channel}, $data) if $read;
+    }
+    if (elapsed() - $last_poll >= $POLL_INTERVAL) {
+        follow_files();
+        $last_poll = elapsed();
+    }
+    flush_out();
+}
@@ -0,0 +1,161 @@
+# Copyright 2026 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Lightweight tracing of template rendering, catalog queries and docker operations.
+
+Tracing is off by default, in which case a span is a shared no-op context
+manager. The levels are:
+
+- off: nothing is recorded.
+- counts: the number of operations and their durations are recorded per
+  category and name, see summary() and report().
+- events: in addition, a sample of the operations is logged at debug level.
+  Fields are only formatted when an event is logged, and are truncated.
+  A field can be a callable, which is only invoked when the event is logged.
+
+The level and sample rate come from EMU_TRACE and EMU_TRACE_SAMPLE, or the
+--trace and --trace-sample flags of emu-docker.
+"""
+import contextlib
+import logging
+import os
+import random
+import reprlib
+import sys
+import threading
+import time
+from typing import Dict, Tuple
+
+OFF = 0
+COUNTS = 1
+EVENTS = 2
+
+LEVELS = {"off": OFF, "counts": COUNTS, "events": EVENTS}
+
+_logger = logging.getLogger("emu.tracing")
+_repr = reprlib.Repr()
+_repr.maxstring = 80
+_repr.maxother = 80
+
+_level = OFF
+_sample = 1.0
+_lock = threading.Lock()
+# (category, name) -> [count, total seconds, max seconds]
+_stats: Dict[Tuple[str, str], list] = {}
+
+_NOOP = contextlib.nullcontext()
+
+
+def configure(level: str = "off", sample: float = 1.0) -> None:
+    """Sets the trace level (off, counts or events), and the fraction of events that is logged."""
+    global _level, _sample
+    _level = LEVELS[level]
+    _sample = sample
+    if _level >= EVENTS:
+        # Events are wanted, regardless of how verbose the rest of the logging is.
+        _logger.setLevel(logging.DEBUG)
+
+
+def enabled(level: int = COUNTS) -> bool:
+    return _level >= level
+
+
+class _Fields:
+    """Formats the fields of an event, when the log record is emitted."""
+
+    def __init__(self, fields):
+        self.fields = fields
+
+    def __str__(self):
+        return " ".join(
+            f"{key}={_repr.repr(value() if callable(value) else value)}" for key, value in self.fields.items()
+        )
+
+
+def _record(category, name, elapsed, fields):
+    with _lock:
+        stats = _stats.setdefault((category, name), [0, 0.0, 0.0])
+        stats[0] += 1
+        stats[1] += elapsed
+        stats[2] = max(stats[2], elapsed)
+    if _level >= EVENTS and (_sample >= 1.0 or random.random() < _sample):
+        _logger.debug("%s %s %.1fms %s", category, name, elapsed * 1000, _Fields(fields))
+
+
+class _Span:
+    def __init__(self, category, name, fields):
+        self.category = category
+        self.name = name
+        self.fields = fields
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type:
+            self.fields["error"] = exc_type.__name__
+        _record(self.category, self.name, time.perf_counter() - self.start, self.fields)
+        return False
+
+
+def span(category: str, name: str, **fields):
+    """Times the enclosed block as an operation of the given category.
+
+    Args:
+        category (str): The kind of operation, i.e. template, catalog or docker.
+        name (str): The operation, i.e. the name of the template.
+        fields: Details that are logged with a sampled event.
+    """
+    if _level == OFF:
+        return _NOOP
+    return _Span(category, name, fields)
+
+
+def event(category: str, name: str, **fields) -> None:
+    """Records an operation without a duration."""
+    if _level != OFF:
+        _record(category, name, 0.0, fields)
+
+
+def summary() -> Dict[str, Dict[str, float]]:
+    """The count, total and maximum duration in seconds of every traced operation."""
+    with _lock:
+        return {
+            f"{category}:{name}": {"count": count, "total": total, "max": longest}
+            for (category, name), (count, total, longest) in sorted(_stats.items())
+        }
+
+
+def reset() -> None:
+    with _lock:
+        _stats.clear()
+
+
+def report(stream=None) -> None:
+    """Writes the summary as a table, to stderr by default."""
+    stream = stream or sys.stderr
+    rows = summary()
+    if not rows:
+        return
+    width = max(len(key) for key in rows)
+    print(f"{'operation':<{width}} {'count':>7} {'total ms':>10} {'max ms':>10}", file=stream)
+    for key, stats in rows.items():
+        print(
+            f"{key:<{width}} {stats['count']:>7} {stats['total'] * 1000:>10.1f} {stats['max'] * 1000:>10.1f}",
+            file=stream,
+        )
+
+
+if os.environ.get("EMU_TRACE") in LEVELS:
+    configure(os.environ["EMU_TRACE"], float(os.environ.get("EMU_TRACE_SAMPLE", "1.0")))
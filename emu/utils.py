@@ -12,6 +12,8 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 import logging
+import os
+import tempfile
 from pathlib import Path
 
 import requests
@@ -33,10 +35,16 @@ def download(url, dest : Path) -> Path:
         dest.parent.mkdir(parents=True)
 
     logging.info("Get %s -> %s", url, dest)
-    with requests.get(url, timeout=5, stream=True) as r:
-        with tqdm(r, total=int(r.headers["content-length"]), unit="B", unit_scale=True) as t:
-            with open(dest, "wb") as f:
-                for data in r:
-                    f.write(data)
-                    t.update(len(data))
+    # Download next to the destination and rename, so a partial download is never mistaken for the file.
+    with tempfile.NamedTemporaryFile(dir=dest.parent, prefix=f".{dest.name}.", delete=False) as f:
+        try:
+            with requests.get(url, timeout=5, stream=True) as r:
+                with tqdm(r, total=int(r.headers["content-length"]), unit="B", unit_scale=True) as t:
+                    for data in r:
+                        f.write(data)
+                        t.update(len(data))
+        except BaseException:
+            os.unlink(f.name)
+            raise
+    os.replace(f.name, dest)
     return dest
@@ -10,8 +10,18 @@ Generates (all gitignored — see js/.gitignore):
     develop/envoy.yaml          dev envoy proxy, rendered from develop/envoy.template.yaml
     docker/envoy.yaml           prod envoy proxy, rendered from docker/envoy.template.yaml
 
+To serve several emulators through one envoy, pass a device count or device names
+(requires the emu package, i.e. pip install -e ..):
+
+    python3 config_gen.py firebase_config.json --devices 4
+    python3 config_gen.py firebase_config.json --devices pixel tablet=emulator_tablet:latest
+
+This renders docker/envoy.yaml with a route per device instead, and writes
+docker/docker-compose.devices.yaml with a service per device.
+
 See js/README.md (Authentication section) for the full BYO-Firebase setup walkthrough.
 """
+import argparse
 import json
 import sys
 from pathlib import Path
@@ -32,11 +42,29 @@ def render(template_path: Path, output_path: Path, project_id: str) -> None:
     output_path.write_text(text.replace(SENTINEL, project_id))
 
 
+def write_device_stack(devices, image, adb_port, project_id) -> None:
+    from emu.emulator_stack import stack_devices, write_stack
+
+    if len(devices) == 1 and devices[0].isdigit():
+        devices = int(devices[0])
+    try:
+        stack = stack_devices(devices, image, adb_port)
+    except ValueError as err:
+        sys.exit(f"error: {err}")
+    write_stack(
+        Path("docker"), stack, project_id, "docker-compose.devices.yaml", Path("docker/envoy.template.yaml")
+    )
+
+
 def main() -> None:
-    if len(sys.argv) != 2:
-        sys.exit("usage: config_gen.py <firebase_config.json>")
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("config", help="The firebase_config.json file.")
+    parser.add_argument("--devices", nargs="+", help="Number of emulators, or their names (name[=image]).")
+    parser.add_argument("--image", default="emulator_emulator:latest", help="Image of the emulators.")
+    parser.add_argument("--adb-port", type=int, default=None, help="Publish adb of the emulators from this host port on.")
+    args = parser.parse_args()
 
-    config_path = Path(sys.argv[1])
+    config_path = Path(args.config)
     config = json.loads(config_path.read_text())
     project_id = config.get("projectId", "")
 
@@ -57,7 +85,10 @@ def main() -> None:
     ]))
 
     render(Path("develop/envoy.template.yaml"), Path("develop/envoy.yaml"), project_id)
-    render(Path("docker/envoy.template.yaml"), Path("docker/envoy.yaml"), project_id)
+    if args.devices:
+        write_device_stack(args.devices, args.image, args.adb_port, project_id)
+    else:
+        render(Path("docker/envoy.template.yaml"), Path("docker/envoy.yaml"), project_id)
 
 
 if __name__ == "__main__":
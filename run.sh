@@ -11,11 +11,28 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+# Usage: ./run.sh [--ephemeral] <container> [emulator params]
+#
+# --ephemeral mounts /data and /tmp as tmpfs, so all userdata stays in RAM
+# and is discarded with the container.
+TMPFS=()
+if [ "$1" == "--ephemeral" ]; then
+  shift
+  DATA_PARTITION=$(docker inspect -f '{{ index .Config.Labels "com.google.android.emulator.data_partition" }}' $1 2>/dev/null)
+  case "${DATA_PARTITION}" in
+    *[gG]) DATA_MB=$(( ${DATA_PARTITION%?} * 1024 )) ;;
+    *[mM]) DATA_MB=${DATA_PARTITION%?} ;;
+    *) DATA_MB=10240 ;;
+  esac
+  # Leave room for the rest of the AVD directory.
+  TMPFS=(--tmpfs "/data:size=$(( DATA_MB + 1024 ))m" --tmpfs "/tmp:size=1g")
+fi
 CONTAINER_ID=$1
 shift
 PARAMS="$@"
 docker run \
  --device /dev/kvm \
+ "${TMPFS[@]}" \
  --publish 8554:8554/tcp \
  --publish 5554:5554/tcp \
  --publish 5555:5555/tcp \
@@ -15,6 +15,8 @@ import pytest
 import docker
 import tempfile
 import shutil
+import unittest.mock as mock
+import zipfile
 from pathlib import Path
 
 @pytest.fixture
@@ -42,4 +44,34 @@ def temp_dir():
   """Creates a temporary directory that gets deleted after the test."""
   temp_directory = tempfile.mkdtemp()
   yield  Path(temp_directory)
-  shutil.rmtree(temp_directory)
\ No newline at end of file
+  shutil.rmtree(temp_directory)
+
+@pytest.fixture()
+def emulator_zip(temp_dir):
+  """A minimal emulator release zip."""
+  zip_name = temp_dir / "emulator.zip"
+  with zipfile.ZipFile(zip_name, "w") as zf:
+    zf.writestr(
+        "emulator/source.properties",
+        "Pkg.Desc=Android Emulator\nPkg.Revision=36.1.2\nPkg.BuildId=1234\n",
+    )
+    zf.writestr("emulator/emulator", "#!/bin/sh\n")
+  yield zip_name
+
+
+@pytest.fixture()
+def system_image_container():
+  """A stand-in for a SystemImageContainer that is available locally."""
+  sys_img = mock.Mock()
+  sys_img.full_name.return_value = "us.gcr.io/emu/sys-30-google-x64:6848311"
+  sys_img.image_name.return_value = "sys-30-google-x64"
+  sys_img.image_labels.side_effect = lambda: {
+      "ro.build.version.sdk": "30",
+      "ro.build.version.incremental": "6848311",
+      "ro.product.cpu.abi": "x86_64",
+      "qemu.tag": "google_apis",
+      "qemu.short_tag": "google",
+      "qemu.short_abi": "x64",
+      "qemu.cpu": "x86_64",
+  }
+  yield sys_img
@@ -0,0 +1,105 @@
+# Copyright 2026 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for extracting release zips, and laying out system images on the host."""
+import hashlib
+import os
+import zipfile
+
+import pytest
+
+from emu import android_release_zip
+from emu.android_release_zip import (
+    DIGEST_SUFFIX,
+    SPARSE_BLOCK_SIZE,
+    AndroidReleaseZip,
+    NotAZipfile,
+    SystemImageReleaseZip,
+)
+from emu.containers.system_image_container import SystemImageContainer
+
+# A disk image with data, a large hole and a trailing hole.
+_USERDATA = b"header" + bytes(16 * SPARSE_BLOCK_SIZE) + b"data" + bytes(SPARSE_BLOCK_SIZE * 2)
+
+
+@pytest.fixture()
+def system_image_zip(temp_dir):
+    zip_name = temp_dir / "sysimg.zip"
+    with zipfile.ZipFile(zip_name, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr(
+            "x86_64/source.properties",
+            "Pkg.Desc=Google APIs Intel x86_64 Atom System Image\n"
+            "SystemImage.Abi=x86_64\nSystemImage.TagId=google_apis\nAndroidVersion.ApiLevel=30\n",
+        )
+        zf.writestr("x86_64/build.prop", "ro.build.version.incremental=6848311\n")
+        zf.writestr("x86_64/userdata.img", _USERDATA)
+    yield zip_name
+
+
+def test_sparse_extract_preserves_content(temp_dir, system_image_zip):
+    SystemImageReleaseZip(str(system_image_zip)).extract(str(temp_dir / "out"), sparse=True)
+
+    userdata = temp_dir / "out" / "x86_64" / "userdata.img"
+    assert userdata.read_bytes() == _USERDATA
+    assert (temp_dir / "out" / "x86_64" / "build.prop").exists()
+
+
+def test_sparse_extract_rejects_path_traversal(temp_dir):
+    zip_name = temp_dir / "evil.zip"
+    with zipfile.ZipFile(zip_name, "w") as zf:
+        zf.writestr("source.properties", "Pkg.Desc=Android Emulator\n")
+        zf.writestr("../escaped", "x")
+
+    with pytest.raises(NotAZipfile):
+        AndroidReleaseZip(str(zip_name)).extract(str(temp_dir / "out"), sparse=True)
+    assert not (temp_dir / "escaped").exists()
+
+
+def test_extracted_system_image_is_a_single_copy(temp_dir, system_image_zip, monkeypatch):
+    def fake_adb(self, dest):
+        (dest / "platform-tools").mkdir(parents=True)
+        (dest / "platform-tools" / "adb").write_text("adb")
+
+    monkeypatch.setattr(SystemImageContainer, "_copy_adb_to", fake_adb)
+    container = SystemImageContainer(str(system_image_zip), "us.gcr.io/emu", extract=True)
+    container.write(temp_dir / "sys")
+
+    sdk = temp_dir / "sys" / "sdk"
+    dockerfile = (temp_dir / "sys" / "Dockerfile").read_text()
+    assert "COPY sdk/ /android/sdk/" in dockerfile
+    assert "unzip" not in dockerfile
+    assert (sdk / "system-images" / "android" / "x86_64" / "userdata.img").read_bytes() == _USERDATA
+    assert (sdk / "platform-tools" / "adb").stat().st_mode & 0o111
+    assert not list((temp_dir / "sys").glob("*.zip"))
+
+
+def test_digest_is_kept_next_to_zip(system_image_zip, monkeypatch):
+    expected = hashlib.sha256(system_image_zip.read_bytes()).hexdigest()
+    assert AndroidReleaseZip(system_image_zip).sha256() == expected
+    assert (system_image_zip.parent / (system_image_zip.name + DIGEST_SUFFIX)).read_text().split()[-1] == expected
+
+    # A later run uses the stored digest, instead of reading the zip.
+    android_release_zip._file_sha256.cache_clear()
+    monkeypatch.setattr(android_release_zip.hashlib, "sha256", None)
+    assert AndroidReleaseZip(system_image_zip).sha256() == expected
+
+
+def test_stored_digest_of_modified_zip_is_ignored(system_image_zip):
+    AndroidReleaseZip(system_image_zip).sha256()
+    with zipfile.ZipFile(system_image_zip, "a") as zf:
+        zf.writestr("x86_64/extra.txt", "changed")
+    stat = os.stat(system_image_zip)
+    os.utime(system_image_zip, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+
+    android_release_zip._file_sha256.cache_clear()
+    assert AndroidReleaseZip(system_image_zip).sha256() == hashlib.sha256(system_image_zip.read_bytes()).hexdigest()
@@ -0,0 +1,114 @@
+# Copyright 2026 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import os
+import shutil
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from emu import artifact_store
+from emu.artifact_store import Artifact, HttpArtifactStore, LocalArtifactStore, open_store
+from emu.cloud_build import fetch_before_build
+from emu.template_writer import TemplateWriter
+
+
+@pytest.fixture
+def context(temp_dir):
+    context = temp_dir / "30-google-x64"
+    (context / "emu" / "bin").mkdir(parents=True)
+    emulator = context / "emu" / "bin" / "emulator"
+    emulator.write_bytes(os.urandom(4096))
+    emulator.chmod(0o755)
+    (context / "sys.zip").write_bytes(os.urandom(2048))
+    (context / "Dockerfile").write_text("FROM scratch\n")
+    (context / "launch-emulator.sh").write_text("#!/bin/sh\n")
+    return context
+
+
+def test_open_store(temp_dir):
+    assert isinstance(open_store("https://artifacts.example.com/emu"), HttpArtifactStore)
+    assert isinstance(open_store(str(temp_dir)), LocalArtifactStore)
+
+
+def test_externalize_large_entries(temp_dir, context):
+    store = LocalArtifactStore(temp_dir / "store")
+    artifacts = artifact_store.externalize(context, store, threshold=1024)
+
+    assert [(artifact.kind, artifact.path) for artifact in artifacts] == [("tree", "emu"), ("file", "sys.zip")]
+    assert artifact_store.read_lock(context) == artifacts
+    assert (context / ".gitignore").read_text() == "/emu\n/sys.zip\n"
+    for artifact in artifacts:
+        assert (temp_dir / "store" / "sha256" / artifact.digest[len("sha256:"):]).exists()
+
+
+def test_packed_trees_are_reproducible(temp_dir, context):
+    store = LocalArtifactStore(temp_dir / "store")
+    first = artifact_store.externalize(context, store, threshold=1024)
+    os.utime(context / "emu" / "bin" / "emulator", (0, 12345))
+
+    assert artifact_store.externalize(context, store, threshold=1024) == first
+    assert len(os.listdir(temp_dir / "store" / "sha256")) == 2
+
+
+@pytest.mark.skipif(not shutil.which("curl"), reason="The fetch script needs curl")
+def test_fetch_script_restores_context(temp_dir, context):
+    store = LocalArtifactStore(temp_dir / "store")
+    artifact_store.externalize(context, store, threshold=1024)
+    expected = (context / "emu" / "bin" / "emulator").read_bytes()
+
+    # A checkout of the repository only has the files that were not ignored.
+    checkout = temp_dir / "checkout"
+    TemplateWriter(checkout).write_template(artifact_store.FETCH_SCRIPT, {})
+    shutil.copytree(context, checkout / context.name, ignore=shutil.ignore_patterns("emu", "sys.zip"))
+    subprocess.run(["bash", artifact_store.FETCH_SCRIPT, context.name], cwd=checkout, check=True)
+
+    emulator = checkout / context.name / "emu" / "bin" / "emulator"
+    assert emulator.read_bytes() == expected
+    assert os.access(emulator, os.X_OK)
+    assert (checkout / context.name / "sys.zip").read_bytes() == (context / "sys.zip").read_bytes()
+
+
+@pytest.mark.skipif(not shutil.which("curl"), reason="The fetch script needs curl")
+def test_fetch_script_rejects_corrupt_artifacts(temp_dir, context):
+    store = LocalArtifactStore(temp_dir / "store")
+    artifact = artifact_store.externalize(context, store, threshold=1024)[1]
+    (temp_dir / "store" / "sha256" / artifact.digest[len("sha256:"):]).write_bytes(b"corrupt")
+
+    TemplateWriter(temp_dir).write_template(artifact_store.FETCH_SCRIPT, {})
+    result = subprocess.run(["bash", artifact_store.FETCH_SCRIPT, context.name], cwd=temp_dir)
+    assert result.returncode != 0
+
+
+def test_fetch_before_build():
+    step = {"name": "gcr.io/cloud-builders/docker", "args": ["build", "-t", "us.gcr.io/emu/30:1", "30"]}
+    assert fetch_before_build(step, "30") == {
+        "name": "gcr.io/cloud-builders/docker",
+        "entrypoint": "bash",
+        "args": ["-c", "bash fetch-artifacts.sh 30 && docker build -t us.gcr.io/emu/30:1 30"],
+    }
+
+
+def test_concurrent_uploads_of_same_content(temp_dir):
+    store = LocalArtifactStore(str(temp_dir / "store"))
+    sources = []
+    for idx in range(8):
+        source = temp_dir / f"source-{idx}"
+        source.write_bytes(b"x" * 1024 * 1024)
+        sources.append(source)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(lambda source: store.upload(source, "abc"), sources))
+
+    assert os.listdir(temp_dir / "store" / "sha256") == ["abc"]
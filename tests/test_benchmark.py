@@ -0,0 +1,120 @@
+# Copyright 2026 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for the boot benchmark, replaying recorded logs."""
+import json
+import threading
+from unittest import mock
+
+from emu import benchmark
+
+
+def _recording(boot_seconds):
+    """A recorded run in which Android boots after the given number of seconds."""
+    return {
+        "created": "2026-10-19T10:00:00.000000000Z",
+        "started_at": "2026-10-19T10:00:00.500000000Z",
+        "adb_ready_at": f"2026-10-19T10:00:{11 + boot_seconds:02d}.000000000Z",
+        "log": [
+            "2026-10-19T10:00:00.600000000Z version: launch_script: 0.1",
+            "2026-10-19T10:00:01.000000000Z emulator: No adb key provided, creating internal one.",
+            "2026-10-19T10:00:02.000000000Z emulator: emulator/emulator -avd MediumPhone -ports 5556,5557",
+            "2026-10-19T10:00:03.250000000Z kernel: [    0.000000] Linux version 5.15.41",
+            f"2026-10-19T10:00:{5 + boot_seconds:02d}.000000000Z logcat: I/adbd    (  300): adbd started",
+            f"2026-10-19T10:00:{10 + boot_seconds:02d}.000000000Z INFO    | Boot completed in {boot_seconds}000 ms",
+        ],
+    }
+
+
+def test_parse_timestamp_truncates_nanoseconds():
+    stamp = benchmark.parse_timestamp("2026-10-19T10:00:01.123456789Z kernel: x")
+    assert stamp.microsecond == 123456
+    assert benchmark.parse_timestamp("kernel: x") is None
+
+
+def test_phase_timings():
+    recording = _recording(20)
+    created = benchmark.parse_timestamp(recording["created"])
+
+    assert benchmark.phase_timings(recording["log"], created) == {
+        "emulator_start": 2.0,
+        "kernel_boot": 3.25,
+        "adbd_started": 25.0,
+        "boot_completed": 30.0,
+    }
+
+
+def test_replayed_benchmark_reports_percentiles():
+    image = benchmark.ReplayImage([_recording(10), _recording(20), _recording(30)])
+
+    runs = benchmark.BootBenchmark(image, runs=3).run()
+    summary = benchmark.summarize(runs)
+
+    assert summary["container_start"]["p50"] == 0.5
+    assert summary["boot_completed"] == {"p50": 30.0, "p90": 38.0, "p99": 39.8, "runs": 3}
+    assert summary["adb_ready"]["p50"] == 31.0
+
+
+def test_adb_ready_is_probed_inside_the_container():
+    image = benchmark.LocalImage("emulator:latest")
+    container = mock.Mock()
+    container.exec_run.side_effect = [
+        mock.Mock(exit_code=1, output=b"error: no devices/emulators found"),
+        mock.Mock(exit_code=0, output=b"\n"),
+        mock.Mock(exit_code=0, output=b"1\n"),
+    ]
+
+    ready = image.wait_for_adb(container, threading.Event(), interval=0)
+
+    assert ready is not None
+    assert container.exec_run.call_count == 3
+    container.exec_run.assert_called_with(benchmark.ADB_PROBE)
+
+
+def test_adb_probe_gives_up_when_stopped():
+    container = mock.Mock()
+    container.exec_run.return_value = mock.Mock(exit_code=1, output=b"")
+    stop = threading.Event()
+    stop.set()
+
+    assert benchmark.LocalImage("emulator:latest").wait_for_adb(container, stop) is None
+    container.exec_run.assert_not_called()
+
+
+def test_replay_without_probe_has_no_adb_ready():
+    recording = _recording(10)
+    del recording["adb_ready_at"]
+
+    run = benchmark.BootBenchmark(benchmark.ReplayImage([recording]), 1).run()[0]
+    assert "adb_ready" not in run
+    assert run["adbd_started"] == 15.0
+
+
+def test_compare_against_baseline(temp_dir):
+    baseline = temp_dir / "baseline.json"
+    fast = benchmark.summarize(benchmark.BootBenchmark(benchmark.ReplayImage([_recording(10)]), 2).run())
+    benchmark.save_baseline(baseline, fast)
+    slow = benchmark.summarize(benchmark.BootBenchmark(benchmark.ReplayImage([_recording(40)]), 2).run())
+
+    assert benchmark.compare(fast, benchmark.load_baseline(baseline)) == []
+    regressions = benchmark.compare(slow, benchmark.load_baseline(baseline))
+    assert any(r.startswith("boot_completed p50") for r in regressions)
+    assert not any(r.startswith("kernel_boot") for r in regressions)
+
+
+def test_replay_from_file(temp_dir):
+    recording = temp_dir / "recording.json"
+    recording.write_text(json.dumps([_recording(10)]))
+
+    image = benchmark.ReplayImage.from_file(recording)
+    assert benchmark.BootBenchmark(image, 1).run()[0]["boot_completed"] == 20.0
@@ -0,0 +1,147 @@
+# Copyright 2026 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for the dependencies between cloud build steps, and sharding of builds."""
+import argparse
+import json
+import time
+import unittest.mock as mock
+
+import pytest
+import yaml
+
+from emu import cloud_build
+from emu.cloud_build import balance_shards, create_build_step, schedule_steps, shard_timeout, write_shards
+from emu.containers.emulator_container import EmulatorContainer
+
+
+def _step(name, *wait_for):
+    return {"id": name, "waitFor": list(wait_for) or ["-"]}
+
+
+def _wait_for(steps):
+    return {step["id"]: step["waitFor"] for step in steps}
+
+
+def test_steps_follow_their_dependencies():
+    steps = schedule_steps([_step("30-x64", "sys-30-x64"), _step("sys-30-x64"), _step("31-x64")])
+
+    assert [step["id"] for step in steps] == ["sys-30-x64", "30-x64", "31-x64"]
+    assert _wait_for(steps) == {"sys-30-x64": ["-"], "30-x64": ["sys-30-x64"], "31-x64": ["-"]}
+
+
+def test_dependencies_outside_the_build_are_dropped():
+    steps = schedule_steps([_step("30-x64", "sys-30-x64")])
+    assert _wait_for(steps) == {"30-x64": ["-"]}
+
+
+def test_max_parallel_chains_steps_in_lanes():
+    steps = schedule_steps([_step("a"), _step("b"), _step("c"), _step("d", "a"), _step("e")], max_parallel=2)
+
+    assert _wait_for(steps) == {"a": ["-"], "b": ["-"], "c": ["a"], "d": ["a", "b"], "e": ["c"]}
+
+
+def test_cycles_are_rejected():
+    with pytest.raises(ValueError):
+        schedule_steps([_step("a", "b"), _step("b", "a")])
+
+
+def test_build_step_waits_for_system_image(temp_dir):
+    container = mock.Mock()
+    container.image_name.return_value = "30-google-x64"
+    container.write_if_changed.return_value = True
+    container.in_registry.return_value = False
+    container.depends_on.return_value = "sys-30-google-x64"
+    container.create_cloud_build_step.return_value = {"name": "gcr.io/cloud-builders/docker"}
+
+    step = create_build_step(container, temp_dir)
+    assert step["waitFor"] == ["sys-30-google-x64"]
+
+
+def test_balance_shards():
+    costs = {"sys-a": 7, "sys-b": 5, "sys-c": 4, "sys-d": 3, "sys-e": 1}
+    assert balance_shards(costs, 2) == [["sys-a", "sys-d"], ["sys-b", "sys-c", "sys-e"]]
+    assert balance_shards({"sys-a": 1}, 3) == [["sys-a"], [], []]
+
+
+def test_shard_timeout_is_bounded():
+    assert shard_timeout(1, 0) == 3600
+    assert shard_timeout(10, 1024 * 1024 * 1000) == 7000
+    assert shard_timeout(1000, 0) == 86400
+
+
+def test_write_shards_keeps_dependencies_together(temp_dir):
+    steps = [
+        _step("sys-30"),
+        _step("30", "sys-30"),
+        _step("30-no-metrics", "sys-30"),
+        _step("31"),
+        _step("32"),
+    ]
+    images = {step["id"]: f"us.gcr.io/emu/{step['id']}" for step in steps}
+    groups = {"sys-30": "sys-30", "30": "sys-30", "30-no-metrics": "sys-30", "31": "sys-31", "32": "sys-32"}
+    sizes = {"sys-30": 3, "30": 3, "30-no-metrics": 3, "31": 8, "32": None}
+
+    written = write_shards(temp_dir, steps, images, sizes, groups, 3, options={"machineType": "E2_HIGHCPU_8"})
+    assert written == ["cloudbuild-1.yaml", "cloudbuild-2.yaml", "cloudbuild-3.yaml", "shards.json"]
+
+    index = json.loads((temp_dir / "shards.json").read_text())["shards"]
+    # The image of unknown size is assumed to be the largest.
+    assert [shard["steps"] for shard in index] == [["32"], ["sys-30", "30", "30-no-metrics"], ["31"]]
+
+    config = yaml.safe_load((temp_dir / "cloudbuild-2.yaml").read_text())
+    assert config["timeout"] == index[1]["timeout"]
+    assert config["options"] == {"machineType": "E2_HIGHCPU_8"}
+    assert config["images"] == ["us.gcr.io/emu/sys-30", "us.gcr.io/emu/30", "us.gcr.io/emu/30-no-metrics"]
+    assert _wait_for(config["steps"])["30"] == ["sys-30"]
+
+
+def test_contexts_are_written_in_parallel_in_matrix_order(temp_dir, monkeypatch):
+    names = ["sys-28", "sys-29", "sys-30", "sys-31"]
+    monkeypatch.setattr(cloud_build, "accept_licenses", lambda force: None)
+    monkeypatch.setattr(cloud_build.emu_downloads_menu, "find_image", lambda regex: names)
+
+    def image_build_steps(img, emulator_zips, repo, dest, sys, force, store=None, platform_tools=None):
+        assert platform_tools == "platform-tools.zip"
+        # The first image takes the longest, so it completes last.
+        time.sleep(0.05 * (len(names) - names.index(img)))
+        container = mock.Mock(spec=["image_name", "build_size", "full_name"])
+        container.image_name.return_value = img
+        container.build_size.return_value = None
+        container.full_name.return_value = f"us.gcr.io/emu/{img}"
+        return [(_step(img), container)], []
+
+    monkeypatch.setattr(cloud_build, "image_build_steps", image_build_steps)
+    # adb is downloaded once, before the contexts are written.
+    download = mock.Mock(return_value="platform-tools.zip")
+    monkeypatch.setattr(cloud_build.PlatformTools, "download", download)
+    args = argparse.Namespace(
+        img="Q|R|S|T", emuzip="emulator.zip", repo="us.gcr.io/emu/", dest=temp_dir, sys=True, git=False, jobs=4
+    )
+    cloud_build.cloud_build(args)
+
+    config = yaml.safe_load((temp_dir / "cloudbuild.yaml").read_text())
+    assert [step["id"] for step in config["steps"]] == names
+    download.assert_called_once_with()
+
+
+def test_emulator_depends_on_system_image_not_in_registry(emulator_zip, system_image_container):
+    system_image_container.in_registry.return_value = False
+
+    emulators = [
+        EmulatorContainer(str(emulator_zip), system_image_container, "us.gcr.io/emu", metrics)
+        for metrics in (False, True)
+    ]
+
+    assert [emulator.depends_on() for emulator in emulators] == ["sys-30-google-x64"] * 2
+    system_image_container.can_pull.assert_not_called()
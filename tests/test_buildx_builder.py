@@ -0,0 +1,51 @@
+# Copyright 2026 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for the buildx command line construction, no docker daemon needed."""
+from pathlib import Path
+
+from emu.containers.buildx_builder import BuildxBuilder
+
+
+def _command(builder, latest=None):
+    return builder.command(
+        Path("/bld/emulator"), "30-google-x64:1234", "30-google-x64", latest, "linux/amd64", Path("/tmp/iid")
+    )
+
+
+def test_inline_cache_only_by_default():
+    cmd = _command(BuildxBuilder())
+    assert cmd[:3] == ["docker", "buildx", "build"]
+    assert "--load" in cmd
+    assert cmd[cmd.index("--cache-to") + 1] == "type=inline"
+    assert "--cache-from" not in cmd
+    assert cmd[-1] == "/bld/emulator"
+
+
+def test_latest_image_is_a_cache_source():
+    cmd = _command(BuildxBuilder(), latest="us.gcr.io/emu/30-google-x64:latest")
+    assert cmd[cmd.index("--cache-from") + 1] == "type=registry,ref=us.gcr.io/emu/30-google-x64:latest"
+
+
+def test_registry_cache_import_and_export():
+    cmd = _command(BuildxBuilder("us.gcr.io/emu/cache", cache_mode="min", builder="emu"))
+    ref = "us.gcr.io/emu/cache/30-google-x64:buildcache"
+    assert ["--builder", "emu"] == cmd[3:5]
+    assert f"type=registry,ref={ref}" in cmd
+    assert f"type=registry,ref={ref},mode=min" in cmd
+    assert "type=inline" in cmd
+
+
+def test_no_inline_cache():
+    cmd = _command(BuildxBuilder(inline_cache=False))
+    assert "--cache-to" not in cmd
@@ -0,0 +1,53 @@
+# Copyright 2026 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tracks the cold start of the emu-docker cli, using python -X importtime.
+
+The time spent importing every subcommand is recorded as a property of the
+test, so it ends up in the junit xml of a run (pytest --junitxml).
+"""
+import subprocess
+import sys
+
+import pytest
+
+# Modules that are slow to import, only the commands that use them should load them.
+HEAVY = ["click", "colorlog", "consolemenu", "docker", "jinja2", "requests", "tqdm", "yaml"]
+
+
+def import_times(*argv):
+    """Runs the cli, returning the cumulative import time in microseconds of every module."""
+    # The same as the emu-docker console script.
+    entry_point = "import sys; from emu.emu_docker import main; sys.argv[0] = 'emu-docker'; main()"
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", entry_point, *argv],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _self, cumulative, module = line[len("import time:"):].split("|")
+        times[module.strip()] = int(cumulative)
+    return times
+
+
+@pytest.mark.parametrize(
+    "command", ["", "list", "licenses", "create", "interactive", "cloud-build", "bench", "snapshot"]
+)
+def test_help_does_not_import_heavy_modules(command, record_property):
+    times = import_times(*command.split(), "--help")
+    record_property("import_us", times["emu.emu_docker"])
+    assert [module for module in HEAVY if module in times] == []
@@ -14,9 +14,11 @@
 """Tests for DockerContainer helpers that don't need a real docker daemon."""
 import unittest.mock as mock
 
+import docker
 import pytest
 
-from emu.containers.docker_container import DockerContainer
+from emu.containers.docker_container import DockerContainer, push_all
+from emu.containers.progress_tracker import AggregateProgressTracker
 
 
 class _NamedContainer(DockerContainer):
@@ -118,3 +120,94 @@ def test_docker_image_skips_untagged_image(fake_client):
 
     c = _NamedContainer("36-google-x64")
     assert c.docker_image() is target
+
+
+# --------------------------------------------------------------------------- #
+# push_all() — concurrent pushes with aggregated progress
+# --------------------------------------------------------------------------- #
+
+
+def _push_stream(digest, layers):
+    """A push stream as decoded by the docker SDK."""
+    for layer, size in layers:
+        yield {"status": "Pushing", "id": layer, "progressDetail": {"current": size, "total": size}}
+        yield {"status": "Pushed", "id": layer, "progressDetail": {}}
+    yield {"status": f"latest: digest: {digest} size: 1234"}
+    yield {"progressDetail": {}, "aux": {"Tag": "latest", "Digest": digest, "Size": 1234}}
+
+
+def test_push_all_reports_digest_per_image(fake_client):
+    fake_client.images.list.return_value = [_img("a:1"), _img("b:1")]
+    streams = {
+        "a:1": _push_stream("sha256:aaa", [("base", 100), ("a", 10)]),
+        "b:1": _push_stream("sha256:bbb", [("base", 100), ("b", 20)]),
+    }
+    fake_client.images.push.side_effect = lambda image, tag, **kwargs: streams[image]
+
+    digests = push_all([_NamedContainer("a", "repo"), _NamedContainer("b", "repo")])
+
+    assert digests == {"a:1": "sha256:aaa", "b:1": "sha256:bbb"}
+
+
+def test_push_all_pushes_duplicates_once(fake_client):
+    fake_client.images.list.return_value = [_img("a:1")]
+    fake_client.images.push.side_effect = lambda image, tag, **kwargs: _push_stream(
+        "sha256:aaa", [("a", 10)]
+    )
+
+    digests = push_all([_NamedContainer("a", "repo"), _NamedContainer("a", "repo")])
+
+    assert digests == {"a:1": "sha256:aaa"}
+    assert fake_client.images.push.call_count == 1
+
+
+def test_push_all_reports_failure_as_none(fake_client):
+    fake_client.images.list.return_value = [_img("a:1")]
+    fake_client.images.push.return_value = iter([{"error": "denied: access forbidden"}])
+
+    assert push_all([_NamedContainer("a", "repo")]) == {"a:1": None}
+
+
+def test_aggregate_tracker_counts_shared_layers_once():
+    tracker = AggregateProgressTracker()
+    for _ in range(2):
+        tracker.update({"status": "Pushing", "id": "base", "progressDetail": {"current": 50, "total": 100}})
+    tracker.update({"status": "Pushing", "id": "top", "progressDetail": {"current": 10, "total": 10}})
+
+    assert tracker.tqdm.total == 110
+    assert tracker.tqdm.n == 60
+    tracker.close()
+
+
+# --------------------------------------------------------------------------- #
+# clean() — keeps the files that are about to be rewritten
+# --------------------------------------------------------------------------- #
+
+
+def test_clean_keeps_files_to_rewrite(temp_dir):
+    config = temp_dir / "avd" / "MediumPhone.avd" / "config.ini"
+    config.parent.mkdir(parents=True)
+    config.write_text("hw.ramSize=2048")
+    (config.parent / "userdata.img").write_text("data")
+    (temp_dir / "emu").mkdir()
+    (temp_dir / "Dockerfile").write_text("FROM scratch")
+
+    _NamedContainer("foo").clean(temp_dir, [config, temp_dir / "Dockerfile"])
+
+    remaining = sorted(str(path.relative_to(temp_dir)) for path in temp_dir.rglob("*"))
+    assert remaining == ["Dockerfile", "avd", "avd/MediumPhone.avd", "avd/MediumPhone.avd/config.ini"]
+
+
+@pytest.mark.parametrize("found", [True, False])
+def test_registry_lookup_is_remembered(monkeypatch, found):
+    client = mock.Mock()
+    if not found:
+        client.images.get_registry_data.side_effect = docker.errors.NotFound("manifest unknown")
+    monkeypatch.setattr("emu.containers.docker_container.docker.from_env", lambda: client)
+    container = _NamedContainer("sys-30", "us.gcr.io/emu")
+
+    assert container.in_registry() == found
+    assert container.in_registry() == found
+
+    client.images.get_registry_data.assert_called_once_with("us.gcr.io/emu/sys-30:latest")
+    client.api.pull.assert_not_called()
@@ -0,0 +1,44 @@
+# Copyright 2026 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for the argument validation of the emu-docker cli."""
+import subprocess
+import sys
+
+
+def run_cli(*argv):
+    """Runs emu-docker with the given arguments."""
+    entry_point = "import sys; from emu.emu_docker import main; sys.argv[0] = 'emu-docker'; main()"
+    return subprocess.run([sys.executable, "-c", entry_point, *argv], capture_output=True, text=True)
+
+
+def test_bench_requires_image_or_replay():
+    result = run_cli("bench")
+
+    assert result.returncode == 2
+    assert "an image or --replay is required" in result.stderr
+    assert "Traceback" not in result.stderr
+
+
+def test_cpuset_requires_profile():
+    result = run_cli("create", "latest", "P google_apis x86_64", "--cpuset", "0-3")
+
+    assert result.returncode == 2
+    assert "--cpuset requires --profile" in result.stderr
+
+
+def test_cache_repo_requires_buildkit():
+    result = run_cli("create", "latest", "P google_apis x86_64", "--cache-repo", "us.gcr.io/emu-dev/cache")
+
+    assert result.returncode == 2
+    assert "--cache-repo requires --buildkit" in result.stderr
@@ -0,0 +1,116 @@
+# Copyright 2026 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import socket
+import threading
+import unittest.mock as mock
+
+import pytest
+
+from emu.containers import emulator_console
+from emu.containers.emulator_console import ConsoleException, EmulatorConsole
+
+_BANNER = (
+    b"Android Console: Authentication required\r\n"
+    b"Android Console: type 'auth <auth_token>' to authenticate\r\n"
+    b"Android Console: you can find your <auth_token> in\r\n"
+    b"'/root/.emulator_console_auth_token'\r\n"
+    b"OK\r\n"
+)
+
+
+class _FakeConsole:
+    """Serves a single console connection, the way the emulator does."""
+
+    def __init__(self, token="secret"):
+        self.token = token
+        self.snapshots = ["default_boot"]
+        self.commands = []
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.bind(("127.0.0.1", 0))
+        self.server.listen(1)
+        self.port = self.server.getsockname()[1]
+        threading.Thread(target=self._serve, daemon=True).start()
+
+    def _serve(self):
+        conn, _ = self.server.accept()
+        with conn, conn.makefile("rwb") as stream:
+            stream.write(_BANNER)
+            stream.flush()
+            for raw in stream:
+                cmd = raw.decode().strip()
+                self.commands.append(cmd)
+                stream.write(self._handle(cmd.split(" ")))
+                stream.flush()
+
+    def _handle(self, args):
+        if args[0] == "auth":
+            if args[1] != self.token:
+                return b"KO: invalid auth token\r\n"
+            return b"Android Console: type 'help' for a list of commands\r\nOK\r\n"
+        if args[:3] == ["avd", "snapshot", "save"]:
+            self.snapshots.append(args[3])
+            return b"OK\r\n"
+        if args[:3] == ["avd", "snapshot", "load"]:
+            if args[3] not in self.snapshots:
+                return f"KO: Snapshot '{args[3]}' does not exist\r\n".encode()
+            return b"OK\r\n"
+        if args[:3] == ["avd", "snapshot", "list"]:
+            rows = "".join(
+                f"{idx}        {name}         94M 2026-10-19 10:00:00   00:00:12.000\r\n"
+                for idx, name in enumerate(self.snapshots)
+            )
+            header = "List of snapshots present on all disks:\r\nID        TAG               VM SIZE                DATE       VM CLOCK\r\n"
+            return (header + rows + "OK\r\n").encode()
+        return b"KO: unknown command, try 'help'\r\n"
+
+
+def _container(port):
+    container = mock.Mock()
+    container.name = "emulator_1"
+    container.ports = {"5554/tcp": [{"HostIp": "0.0.0.0", "HostPort": str(port)}]}
+    return container
+
+
+def test_authenticates_and_saves_snapshot():
+    fake = _FakeConsole()
+    with EmulatorConsole("127.0.0.1", fake.port, "secret", timeout=5) as console:
+        console.snapshot_save("clean")
+        assert console.snapshot_list() == ["default_boot", "clean"]
+
+    assert fake.commands[:2] == ["auth secret", "avd snapshot save clean"]
+
+
+def test_failed_command_raises():
+    fake = _FakeConsole()
+    with EmulatorConsole("127.0.0.1", fake.port, "secret", timeout=5) as console:
+        with pytest.raises(ConsoleException, match="does not exist"):
+            console.snapshot_load("missing")
+
+
+def test_token_is_required():
+    fake = _FakeConsole()
+    with pytest.raises(ConsoleException, match="requires a token"):
+        EmulatorConsole("127.0.0.1", fake.port, timeout=5)
+
+
+def test_reset_loads_snapshot_of_container():
+    fake = _FakeConsole()
+    assert emulator_console.reset(_container(fake.port), "secret")
+    assert fake.commands[-1] == "avd snapshot load default_boot"
+
+
+def test_reset_fails_without_published_console():
+    container = _container(0)
+    container.ports = {"5555/tcp": [{"HostIp": "0.0.0.0", "HostPort": "5555"}]}
+    assert not emulator_console.reset(container, "secret")
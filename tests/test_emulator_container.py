@@ -0,0 +1,170 @@
+# Copyright 2026 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for EmulatorContainer that don't need a real docker daemon."""
+import re
+import subprocess
+import unittest.mock as mock
+
+import pytest
+
+from emu.containers.emulator_container import EmulatorContainer
+
+
+@pytest.fixture
+def fake_client(monkeypatch):
+    """Patch docker.from_env so DockerContainer.get_client() returns our stub."""
+    client = mock.Mock()
+    client.images.list.return_value = []
+    monkeypatch.setattr(
+        "emu.containers.docker_container.docker.from_env", lambda: client
+    )
+    return client
+
+
+@pytest.fixture
+def emulator(emulator_zip, system_image_container):
+    return EmulatorContainer(
+        str(emulator_zip), system_image_container, "us.gcr.io/emu", snapshot=True
+    )
+
+
+def test_bake_snapshot_commits_booted_container(fake_client, emulator):
+    container = fake_client.containers.run.return_value
+    container.wait.return_value = {"StatusCode": 0}
+    container.commit.return_value.id = "sha256:snapshot"
+
+    assert emulator.bake_snapshot("sha256:cold") == "sha256:snapshot"
+
+    run = fake_client.containers.run.call_args.kwargs
+    assert run["image"] == "sha256:cold"
+    assert run["command"][:2] == ["/android/sdk/launch-emulator.sh", "--bake-snapshot"]
+    commit = container.commit.call_args.kwargs
+    assert commit["repository"] == "us.gcr.io/emu/30-google-x64-no-metrics"
+    assert commit["tag"] == "1234"
+    assert 'CMD ["/android/sdk/launch-emulator.sh"]' in commit["changes"]
+    container.remove.assert_called_once_with(force=True)
+
+
+def test_failed_boot_keeps_cold_image(fake_client, emulator):
+    container = fake_client.containers.run.return_value
+    container.wait.return_value = {"StatusCode": 1}
+    container.logs.return_value = b"emulator: boot failed"
+
+    assert emulator.bake_snapshot("sha256:cold") == "sha256:cold"
+    container.commit.assert_not_called()
+    container.remove.assert_called_once_with(force=True)
+
+
+def test_launcher_restores_from_snapshot(temp_dir, emulator):
+    emulator.write(temp_dir / "emulator")
+
+    launcher = (temp_dir / "emulator" / "launch-emulator.sh").read_text()
+    assert "--bake-snapshot" in launcher
+    assert "-quit-after-boot" in launcher
+    assert "QUICKBOOT_SNAPSHOT=/android-home/MediumPhone.avd/snapshots/default_boot" in launcher
+
+
+def test_data_partition_size_is_labeled(temp_dir, emulator):
+    emulator.write(temp_dir / "emulator")
+
+    config = (temp_dir / "emulator" / "avd" / "MediumPhone.avd" / "config.ini").read_text()
+    dockerfile = (temp_dir / "emulator" / "Dockerfile").read_text()
+    assert "disk.dataPartition.size=10G" in config
+    assert 'com.google.android.emulator.data_partition="10G"' in dockerfile
+
+
+def test_failed_run_keeps_cold_image(fake_client, emulator):
+    fake_client.containers.run.side_effect = RuntimeError("no space left on device")
+
+    assert emulator.bake_snapshot("sha256:cold") == "sha256:cold"
+
+
+def test_failed_commit_removes_container(fake_client, emulator):
+    container = fake_client.containers.run.return_value
+    container.wait.return_value = {"StatusCode": 0}
+    container.commit.side_effect = RuntimeError("commit failed")
+
+    assert emulator.bake_snapshot("sha256:cold") == "sha256:cold"
+    container.remove.assert_called_once_with(force=True)
+
+
+def test_snapshot_records_resources(fake_client, emulator):
+    container = fake_client.containers.run.return_value
+    container.wait.return_value = {"StatusCode": 0}
+
+    emulator.bake_snapshot("sha256:cold")
+
+    run = fake_client.containers.run.call_args.kwargs
+    assert run["environment"] == {"EMULATOR_CORES": "4", "EMULATOR_RAM_MB": "4096"}
+    changes = container.commit.call_args.kwargs["changes"]
+    assert 'LABEL com.google.android.emulator.snapshot.resources="4:4096"' in changes
+    assert "ENV EMULATOR_SNAPSHOT_CORES=4 EMULATOR_SNAPSHOT_RAM_MB=4096 EMULATOR_CORES= EMULATOR_RAM_MB=" in changes
+
+
+def test_avd_is_configured_with_snapshot_resources(temp_dir, emulator):
+    emulator.write(temp_dir / "emulator")
+
+    config = (temp_dir / "emulator" / "avd" / "MediumPhone.avd" / "config.ini").read_text()
+    assert "hw.cpu.ncore=4\n" in config
+    assert "hw.ramSize=4096\n" in config
+
+
+def _run_data_part(launcher, root, mounts):
+    """Runs initialize_data_part of the launcher, returning the AVD home it exports."""
+    functions = "".join(
+        re.search(rf"^{name} ?\(\) \{{.*?^\}}$", launcher, re.MULTILINE | re.DOTALL).group(0) + "\n"
+        for name in ["is_mounted", "run", "initialize_data_part"]
+    )
+    script = functions.replace("/root/.android", str(root / "root" / ".android")) + (
+        f"mount() {{ echo '{mounts}'; }}\n"
+        f"IMAGE_AVD_HOME={root}/android-home\n"
+        f"DATA_PART={root}/data\n"
+        "initialize_data_part\n"
+        'echo "${ANDROID_AVD_HOME}"\n'
+    )
+    result = subprocess.run(["bash", "-c", script], capture_output=True, text=True, check=True)
+    return result.stdout.strip().splitlines()[-1]
+
+
+@pytest.fixture
+def avd_root(temp_dir):
+    (temp_dir / "android-home" / "MediumPhone.avd").mkdir(parents=True)
+    (temp_dir / "android-home" / "MediumPhone.ini").write_text("path=/android-home/MediumPhone.avd\n")
+    (temp_dir / "data").mkdir()
+    return temp_dir
+
+
+def test_launcher_runs_avd_from_data_partition(avd_root, emulator):
+    emulator.write(avd_root / "emulator")
+    launcher = (avd_root / "emulator" / "launch-emulator.sh").read_text()
+
+    avd_home = _run_data_part(launcher, avd_root, f"tmpfs on {avd_root}/data type tmpfs (rw)")
+
+    assert avd_home == f"{avd_root}/data/android-home"
+    ini = (avd_root / "data" / "android-home" / "MediumPhone.ini").read_text()
+    assert ini == f"path={avd_root}/data/android-home/MediumPhone.avd\n"
+    assert (avd_root / "root" / ".android" / "avd").resolve() == avd_root / "data" / "android-home"
+    # Nothing points the emulator back to the copy in the image.
+    assert "export ANDROID_AVD_HOME=/android-home" not in launcher
+
+
+def test_launcher_runs_avd_from_image_without_data_partition(avd_root, emulator):
+    emulator.write(avd_root / "emulator")
+    launcher = (avd_root / "emulator" / "launch-emulator.sh").read_text()
+
+    avd_home = _run_data_part(launcher, avd_root, "overlay on / type overlay (rw)")
+
+    assert avd_home == f"{avd_root}/android-home"
+    assert not (avd_root / "data" / "android-home").exists()
+    assert (avd_root / "root" / ".android" / "avd").resolve() == avd_root / "android-home"
@@ -0,0 +1,171 @@
+# Copyright 2026 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for the warm emulator pool, using fake containers."""
+import itertools
+import unittest.mock as mock
+
+import pytest
+
+from emu.containers.emulator_pool import EmulatorPool, PoolExhaustedException
+
+
+class _FakeImage:
+    """Launches fake containers that have booted right away."""
+
+    def __init__(self, log=b"INFO    | Boot completed in 1234 ms\n"):
+        self.counter = itertools.count()
+        self.log = log
+        self.launched = []
+
+    def image_name(self):
+        return "30-google-x64"
+
+    def launch(self, port_map, profile=None, ephemeral=False, token=None):
+        idx = next(self.counter)
+        device = mock.Mock()
+        device.name = f"device-{idx}"
+        device.logs.return_value = iter([b"emulator: launching\n", self.log])
+        # Like a docker container, the bindings are only known after a reload.
+        device.ports = {}
+        bindings = {"5555/tcp": [{"HostIp": "0.0.0.0", "HostPort": str(49000 + idx)}]}
+        device.reload.side_effect = lambda: setattr(device, "ports", bindings)
+        self.launched.append(device)
+        return device
+
+
+@pytest.fixture
+def image():
+    return _FakeImage()
+
+
+def test_acquire_hands_out_booted_devices(image):
+    pool = EmulatorPool(image, size=2)
+    pool.start()
+
+    leases = [pool.acquire(timeout=5) for _ in range(2)]
+
+    assert {lease.device.name for lease in leases} == {"device-0", "device-1"}
+    assert leases[0].ports["5555/tcp"].startswith("490")
+    pool.shutdown()
+
+
+def test_exhausted_pool_times_out(image):
+    pool = EmulatorPool(image, size=1)
+    pool.start()
+    pool.acquire(timeout=5)
+
+    with pytest.raises(PoolExhaustedException):
+        pool.acquire(timeout=0.1)
+    pool.shutdown()
+
+
+def test_reset_device_is_reused(image):
+    pool = EmulatorPool(image, size=1, reset=lambda device, token: True)
+    pool.start()
+
+    with pool.acquire(timeout=5) as lease:
+        first = lease.device
+
+    assert pool.acquire(timeout=5).device is first
+    assert len(image.launched) == 1
+    pool.shutdown()
+
+
+def test_device_is_replaced_when_reset_fails(image):
+    pool = EmulatorPool(image, size=1, reset=lambda device, token: False)
+    pool.start()
+
+    lease = pool.acquire(timeout=5)
+    lease.release()
+
+    assert pool.acquire(timeout=5).device.name == "device-1"
+    lease.device.remove.assert_called_once_with(force=True)
+    pool.shutdown()
+
+
+def test_exited_device_is_removed():
+    image = _FakeImage(log=b"emulator: ERROR: x86_64 emulation currently requires hardware acceleration!\n")
+    pool = EmulatorPool(image, size=1)
+    pool.start()
+
+    with pytest.raises(PoolExhaustedException):
+        pool.acquire(timeout=0.5)
+    pool.shutdown()
+    image.launched[0].remove.assert_called_with(force=True)
+
+
+class _FlakyImage(_FakeImage):
+    """The first launches exit before the device has booted."""
+
+    def __init__(self, failures):
+        super().__init__()
+        self.failures = failures
+
+    def launch(self, port_map, profile=None, ephemeral=False, token=None):
+        device = super().launch(port_map, profile, ephemeral, token)
+        if len(self.launched) <= self.failures:
+            device.logs.return_value = iter([b"emulator: ERROR: boot failed\n"])
+        return device
+
+
+def test_failed_boot_is_retried():
+    image = _FlakyImage(failures=1)
+    pool = EmulatorPool(image, size=1, retry_delay=0.01)
+    pool.start()
+
+    assert pool.acquire(timeout=5).device.name == "device-1"
+    image.launched[0].remove.assert_called_with(force=True)
+    pool.shutdown()
+
+
+def test_acquire_fails_when_no_device_boots():
+    image = _FlakyImage(failures=10)
+    pool = EmulatorPool(image, size=2, boot_attempts=2, retry_delay=0.01)
+    pool.start()
+
+    with pytest.raises(PoolExhaustedException):
+        pool.acquire()
+    with pytest.raises(PoolExhaustedException):
+        pool.acquire()
+    assert len(image.launched) == 4
+    pool.shutdown()
+
+
+def test_double_release_recycles_once(image):
+    resets = []
+    pool = EmulatorPool(image, size=1, reset=lambda device, token: resets.append(device) or True)
+    pool.start()
+
+    lease = pool.acquire(timeout=5)
+    lease.release()
+    lease.release()
+
+    assert pool.acquire(timeout=5).device is lease.device
+    with pytest.raises(PoolExhaustedException):
+        pool.acquire(timeout=0.1)
+    assert resets == [lease.device]
+    pool.shutdown()
+
+
+def test_reset_uses_token_of_pool(image):
+    reset = mock.Mock(return_value=True)
+    pool = EmulatorPool(image, size=1, reset=reset, token="secret")
+    pool.start()
+
+    lease = pool.acquire(timeout=5)
+    lease.release()
+
+    assert pool.acquire(timeout=5).device is lease.device
+    reset.assert_called_once_with(lease.device, "secret")
+    pool.shutdown()
@@ -0,0 +1,101 @@
+# Copyright 2026 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import pytest
+import yaml
+
+from emu.emulator_stack import (
+    DEFAULT_IMAGE,
+    FIREBASE_PROJECT_ID,
+    StackDevice,
+    stack_devices,
+    write_stack,
+)
+
+
+def _routes(envoy):
+    listener = envoy["static_resources"]["listeners"][0]
+    config = listener["filter_chains"][0]["filters"][0]["typed_config"]
+    return config["route_config"]["virtual_hosts"][0]["routes"]
+
+
+def test_device_count():
+    assert stack_devices(2) == [
+        StackDevice("emulator-1", DEFAULT_IMAGE, None),
+        StackDevice("emulator-2", DEFAULT_IMAGE, None),
+    ]
+
+
+def test_device_list_with_images_and_adb_ports():
+    assert stack_devices(["pixel", "tablet=tablet:1"], "phone:1", adb_port=6000) == [
+        StackDevice("pixel", "phone:1", 6000),
+        StackDevice("tablet", "tablet:1", 6001),
+    ]
+
+
+@pytest.mark.parametrize("devices", [["Pixel"], ["nginx"], ["a", "a"], []])
+def test_invalid_devices(devices):
+    with pytest.raises(ValueError):
+        stack_devices(devices)
+
+
+def test_write_stack(temp_dir):
+    compose_file, envoy_file = write_stack(temp_dir, stack_devices(3, adb_port=6000), "my-project")
+
+    compose = yaml.safe_load(compose_file.read_text())
+    assert sorted(compose["services"]) == [
+        "emulator-1", "emulator-2", "emulator-3", "front-envoy", "nginx"
+    ]
+    assert compose["services"]["emulator-3"]["ports"] == ["6002:5555"]
+    # envoy runs the generated config, not the one baked into its image.
+    assert compose["services"]["front-envoy"]["volumes"] == ["./envoy.yaml:/etc/envoy/envoy.yaml:ro"]
+
+    envoy = yaml.safe_load(envoy_file.read_text())
+    routes = _routes(envoy)
+    assert [route["match"]["prefix"] for route in routes[2:4]] == [
+        "/emulator-2/android.emulation.control.Rtc",
+        "/emulator-2/android.emulation.control",
+    ]
+    assert routes[3] == {
+        "match": {"prefix": "/emulator-2/android.emulation.control"},
+        "route": {
+            "cluster": "emulator-2_grpc",
+            "timeout": "0s",
+            "max_stream_duration": {"grpc_timeout_header_max": "0s"},
+            "prefix_rewrite": "/android.emulation.control",
+        },
+    }
+    # Requests without a device prefix go to the first device.
+    assert [route["route"]["cluster"] for route in routes[6:]] == ["emulator-1_grpc", "emulator-1_grpc", "nginx"]
+    clusters = envoy["static_resources"]["clusters"]
+    assert [cluster["name"] for cluster in clusters] == [
+        "jwks_cluster", "emulator-1_grpc", "emulator-2_grpc", "emulator-3_grpc", "nginx"
+    ]
+    endpoint = clusters[2]["load_assignment"]["endpoints"][0]["lb_endpoints"][0]["endpoint"]
+    assert endpoint["address"]["socket_address"] == {"address": "emulator-2", "port_value": 8554}
+    assert "my-project" in envoy_file.read_text()
+    assert FIREBASE_PROJECT_ID not in envoy_file.read_text()
+
+
+def test_stack_requires_auth_for_every_device(temp_dir):
+    _, envoy_file = write_stack(temp_dir, stack_devices(["pixel"]), "my-project")
+
+    manager = yaml.safe_load(envoy_file.read_text())["static_resources"]["listeners"][0]
+    http_filters = manager["filter_chains"][0]["filters"][0]["typed_config"]["http_filters"]
+    jwt = next(f for f in http_filters if f["name"] == "envoy.filters.http.jwt_authn")
+    assert [rule["match"]["prefix"] for rule in jwt["typed_config"]["rules"]] == [
+        "/pixel/android.emulation.control",
+        "/pixel/android.emulation.control.Rtc",
+        "/android.emulation.control",
+        "/android.emulation.control.Rtc",
+    ]
@@ -0,0 +1,112 @@
+# Copyright 2026 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for skipping build contexts whose inputs did not change."""
+import unittest.mock as mock
+import xml.etree.ElementTree as ET
+
+import pytest
+
+from emu.cloud_build import create_build_step
+from emu.containers.emulator_container import EmulatorContainer
+from emu.emu_downloads_menu import SysImgInfo
+
+
+@pytest.fixture
+def fake_client(monkeypatch):
+    client = mock.Mock()
+    client.images.list.return_value = []
+    monkeypatch.setattr("emu.containers.docker_container.docker.from_env", lambda: client)
+    return client
+
+
+@pytest.fixture
+def emulator(emulator_zip, system_image_container):
+    container = EmulatorContainer(str(emulator_zip), system_image_container, "us.gcr.io/emu")
+    container.in_registry = lambda: False
+    return container
+
+
+def test_unchanged_context_is_not_rewritten(temp_dir, emulator):
+    dest = temp_dir / "emulator"
+    assert emulator.write_if_changed(dest)
+    (dest / "marker").write_text("kept")
+
+    assert not emulator.write_if_changed(dest)
+    assert (dest / "marker").exists()
+
+
+def test_changed_inputs_rewrite_context(temp_dir, emulator, emulator_zip, system_image_container):
+    dest = temp_dir / "emulator"
+    emulator.write_if_changed(dest)
+
+    metrics = EmulatorContainer(str(emulator_zip), system_image_container, "us.gcr.io/emu", True)
+    assert metrics.fingerprint() != emulator.fingerprint()
+    assert metrics.write_if_changed(dest)
+
+
+def test_fingerprint_follows_zip_contents(emulator, emulator_zip, system_image_container):
+    before = emulator.fingerprint()
+    with open(emulator_zip, "ab") as zip_file:
+        zip_file.write(b"\0")
+
+    changed = EmulatorContainer(str(emulator_zip), system_image_container, "us.gcr.io/emu")
+    assert changed.fingerprint() != before
+
+
+def test_unchanged_context_in_registry_gets_no_step(fake_client, temp_dir, emulator):
+    step = create_build_step(emulator, temp_dir)
+    assert step["id"] == emulator.image_name()
+
+    emulator.in_registry = lambda: True
+    assert create_build_step(emulator, temp_dir) == {}
+
+
+def test_unchanged_context_missing_from_registry_gets_step(fake_client, temp_dir, emulator):
+    dest = temp_dir / emulator.image_name()
+    create_build_step(emulator, temp_dir)
+    (dest / "marker").write_text("kept")
+
+    step = create_build_step(emulator, temp_dir)
+
+    assert step["id"] == emulator.image_name()
+    assert (dest / "marker").exists()
+    assert create_build_step(emulator, temp_dir, force=True)["id"] == emulator.image_name()
+    assert not (dest / "marker").exists()
+
+
+def test_sys_img_info_checksum():
+    pkg = ET.fromstring(
+        """
+<remotePackage path="system-images;android-30;google_apis;x86_64">
+  <type-details>
+    <api-level>30</api-level>
+    <tag><id>google_apis</id></tag>
+    <abi>x86_64</abi>
+  </type-details>
+  <uses-license ref="android-sdk-license"/>
+  <archives>
+    <archive>
+      <complete><size>10</size><checksum type="sha1">darwin</checksum><url>mac.zip</url></complete>
+      <host-os>macosx</host-os>
+    </archive>
+    <archive>
+      <complete><size>20</size><checksum type="sha1">linux</checksum><url>linux.zip</url></complete>
+      <host-os>linux</host-os>
+    </archive>
+  </archives>
+</remotePackage>
+""".strip()
+    )
+    info = SysImgInfo(pkg, {"android-sdk-license": object()})
+    assert (info.zip, info.checksum, info.size) == ("linux.zip", "linux", 20)
@@ -0,0 +1,97 @@
+# Copyright 2026 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import asyncio
+import gzip
+
+from emu.log_collector import ChannelBuffer, LogCollector, RotatingGzipFile
+
+
+def _read(path):
+    with gzip.open(path, "rt", encoding="utf-8") as log:
+        return log.read().splitlines()
+
+
+def _source(logs):
+    async def _lines(name):
+        for line in logs[name]:
+            await asyncio.sleep(0)
+            yield line
+
+    return _lines
+
+
+def test_channel_buffer_drops_oldest_lines():
+    buffer = ChannelBuffer(max_lines=2)
+    for line in ["a", "b", "c"]:
+        buffer.append(line)
+
+    assert buffer.take() == ["b", "c"]
+    assert (buffer.received, buffer.dropped) == (3, 1)
+    assert buffer.take() == []
+
+
+def test_rotating_file_keeps_backups(temp_dir):
+    log = RotatingGzipFile(temp_dir / "kernel.log.gz", max_bytes=4, backups=2)
+    log.write(["one", "two", "six", "ten"])
+    log.close()
+
+    assert _read(temp_dir / "kernel.1.log.gz") == ["ten"]
+    assert _read(temp_dir / "kernel.2.log.gz") == ["six"]
+    assert not (temp_dir / "kernel.3.log.gz").exists()
+
+
+def test_collects_channels_per_device(temp_dir):
+    logs = {
+        "emulator_1": ["emulator: launching", "kernel: [0.0] Linux", "logcat: I/adbd: up"],
+        "emulator_2": ["INFO | Boot completed", "kernel: [0.1] Linux"],
+    }
+    collector = LogCollector(temp_dir, source=_source(logs), flush_interval=0.01)
+    asyncio.run(collector.run(logs.keys()))
+
+    assert _read(temp_dir / "emulator_1" / "kernel.log.gz") == ["[0.0] Linux"]
+    assert _read(temp_dir / "emulator_1" / "logcat.log.gz") == ["I/adbd: up"]
+    assert _read(temp_dir / "emulator_2" / "emulator.log.gz") == ["INFO | Boot completed"]
+    assert collector.stats()["emulator_2"]["kernel"] == {"received": 1, "dropped": 0}
+
+
+def test_stop_ends_endless_streams(temp_dir):
+    async def endless(name):
+        while True:
+            yield "logcat: spam"
+            await asyncio.sleep(0.001)
+
+    async def main():
+        collector = LogCollector(temp_dir, source=endless, flush_interval=0.01)
+        task = asyncio.create_task(collector.run(["emulator_1"]))
+        await asyncio.sleep(0.05)
+        collector.stop()
+        await asyncio.wait_for(task, 5)
+        return collector
+
+    collector = asyncio.run(main())
+
+    written = _read(temp_dir / "emulator_1" / "logcat.log.gz")
+    assert written and len(written) == collector.stats()["emulator_1"]["logcat"]["received"]
+
+
+def test_failing_source_does_not_stop_others(temp_dir):
+    async def source(name):
+        if name == "broken":
+            raise RuntimeError("no such container")
+        yield "kernel: fine"
+
+    collector = LogCollector(temp_dir, source=source, flush_interval=0.01)
+    asyncio.run(collector.run(["broken", "emulator_1"]))
+
+    assert _read(temp_dir / "emulator_1" / "kernel.log.gz") == ["fine"]
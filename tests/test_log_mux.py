@@ -0,0 +1,99 @@
+# Copyright 2026 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Runs the log multiplexer of launch-emulator.sh against fifos and regular files."""
+import json
+import os
+import re
+import shutil
+import signal
+import subprocess
+import time
+
+import pytest
+
+from emu.containers.readiness import parse_line
+from emu.template_writer import TemplateWriter
+
+pytestmark = pytest.mark.skipif(
+    not shutil.which("perl") or not hasattr(os, "mkfifo"), reason="Requires perl and fifos"
+)
+
+
+@pytest.fixture
+def log_mux(temp_dir):
+    TemplateWriter(temp_dir).write_template("log-mux.pl", {})
+    return temp_dir / "log-mux.pl"
+
+
+def _run(log_mux, temp_dir, env=None):
+    kernel = temp_dir / "kernel.log"
+    os.mkfifo(kernel)
+    video = temp_dir / "goldfish_rtc_0"
+    proc = subprocess.Popen(
+        ["perl", str(log_mux), f"kernel={kernel}", f"video={video}"],
+        stdout=subprocess.PIPE,
+        env=dict(os.environ, **(env or {})),
+    )
+    time.sleep(0.3)
+    # The fifo writer may come and go, the multiplexer keeps reading.
+    with open(kernel, "w") as fifo:
+        fifo.write("booting\npart")
+    with open(kernel, "w") as fifo:
+        fifo.write("ial line\n")
+    # The video log only comes into existence later on.
+    video.write_text("frame 1\nframe 2\n")
+    time.sleep(0.8)
+    proc.send_signal(signal.SIGTERM)
+    out, _ = proc.communicate(timeout=5)
+    return out.decode("utf-8").splitlines()
+
+
+# Modules of the Ubuntu perl-base package the multiplexer may use. Everything else,
+# Time::HiRes included, lives in perl-modules which the images do not install.
+PERL_BASE = {"strict", "warnings", "Fcntl", "IO::Select", "POSIX"}
+
+
+def test_only_uses_perl_base_modules():
+    source = TemplateWriter(".").template_source("log-mux.pl")
+    used = set(re.findall(r"^\s*(?:use|require)\s+([\w:]+)", source, re.MULTILINE))
+    assert used and used <= PERL_BASE
+
+
+def test_template_is_not_altered_by_rendering(log_mux):
+    source = TemplateWriter(".").template_source("log-mux.pl")
+    assert log_mux.read_text().rstrip("\n") == source.rstrip("\n")
+
+
+def test_prefixes_lines_with_channel(log_mux, temp_dir):
+    lines = _run(log_mux, temp_dir)
+
+    assert [line for line in lines if line.startswith("kernel:")] == [
+        "kernel: booting",
+        "kernel: partial line",
+    ]
+    assert [line for line in lines if line.startswith("video:")] == [
+        "video: frame 1",
+        "video: frame 2",
+    ]
+
+
+def test_json_lines(log_mux, temp_dir):
+    lines = _run(log_mux, temp_dir, {"LOG_FORMAT": "json"})
+
+    records = [json.loads(line) for line in lines]
+    assert {"channel": "kernel", "message": "booting"} in [
+        {k: r[k] for k in ("channel", "message")} for r in records
+    ]
+    assert all(r["time"].endswith("Z") for r in records)
+    assert parse_line(lines[0])[0] in ("kernel", "video")
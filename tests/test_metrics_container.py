@@ -0,0 +1,85 @@
+# Copyright 2026 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import os
+import unittest.mock as mock
+
+import pytest
+
+from emu import cloud_build
+from emu.containers.emulator_container import EmulatorContainer
+from emu.containers.metrics_container import MetricsContainer
+from emu.template_writer import TemplateWriter
+
+
+@pytest.fixture
+def fake_client(monkeypatch):
+    client = mock.Mock()
+    client.images.list.return_value = []
+    monkeypatch.setattr("emu.containers.docker_container.docker.from_env", lambda: client)
+    return client
+
+
+@pytest.fixture
+def base(fake_client, emulator_zip, system_image_container):
+    return EmulatorContainer(str(emulator_zip), system_image_container, "us.gcr.io/emu")
+
+
+def test_metrics_image_is_named_after_base(base):
+    metrics = MetricsContainer(base)
+    assert base.image_name() == "30-google-x64-no-metrics"
+    assert metrics.image_name() == "30-google-x64"
+    assert metrics.docker_tag() == base.docker_tag()
+    assert metrics.depends_on() == base.image_name()
+
+
+def test_metrics_layer_is_small(base):
+    # Balancing must not mistake the layer for an image of unknown size.
+    assert 0 < MetricsContainer(base).build_size() < cloud_build.UNKNOWN_BUILD_SIZE
+
+
+def test_base_must_not_collect_metrics(fake_client, emulator_zip, system_image_container):
+    with pytest.raises(AssertionError):
+        MetricsContainer(EmulatorContainer(str(emulator_zip), system_image_container, metrics=True))
+
+
+def test_metrics_context_is_a_single_layer(temp_dir, base):
+    MetricsContainer(base).write(temp_dir)
+
+    dockerfile = (temp_dir / "Dockerfile").read_text()
+    assert "FROM us.gcr.io/emu/30-google-x64-no-metrics:1234\n" in dockerfile
+    assert "ENV EMULATOR_METRICS=true" in dockerfile
+    assert EmulatorContainer.METRICS_MESSAGE.strip() in (temp_dir / "README.MD").read_text()
+    assert sorted(path.name for path in temp_dir.iterdir()) == ["Dockerfile", "README.MD"]
+
+
+def test_fingerprint_follows_base(base, emulator_zip, system_image_container):
+    other = EmulatorContainer(str(emulator_zip), system_image_container, "us.gcr.io/emu", extra="-no-audio")
+    assert MetricsContainer(base).fingerprint() == MetricsContainer(base).fingerprint()
+    assert MetricsContainer(base).fingerprint() != MetricsContainer(other).fingerprint()
+
+
+def test_launch_script_enables_metrics_from_environment(temp_dir):
+    TemplateWriter(temp_dir).write_template("launch-emulator.sh", {"extra": "", "version": "1"})
+    assert 'if [ "${EMULATOR_METRICS}" = "true" ]; then' in (temp_dir / "launch-emulator.sh").read_text()
+
+
+def test_rewriting_context_keeps_unchanged_files(temp_dir, base):
+    metrics = MetricsContainer(base)
+    metrics.write(temp_dir)
+    (temp_dir / "stale").write_text("stale")
+    os.utime(temp_dir / "Dockerfile", ns=(0, 0))
+
+    metrics.write(temp_dir)
+    assert not (temp_dir / "stale").exists()
+    assert (temp_dir / "Dockerfile").stat().st_mtime_ns == 0
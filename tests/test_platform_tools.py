@@ -37,3 +37,29 @@ def test_extract_unzips_something(mock_zip, platform_tools):
     mock_zip.assert_called_with("/tmp/tools.zip", "r")
     zip_handle = mock_zip.return_value.__enter__.return_value
     zip_handle.extract.assert_called_with("platform-tools/adb", "foo")
+
+
+def test_interrupted_download_leaves_no_file(temp_dir):
+    response = mock.MagicMock()
+    response.__enter__.return_value.headers = {"content-length": "8"}
+    response.__enter__.return_value.__iter__.side_effect = ConnectionError("reset")
+    dest = temp_dir / PlatformTools.PLATFORM_TOOLS_ZIP
+
+    with mock.patch("emu.utils.requests.get", return_value=response):
+        with pytest.raises(ConnectionError):
+            PlatformTools().download(dest)
+
+    assert list(temp_dir.iterdir()) == []
+
+
+def test_download_is_moved_into_place(temp_dir):
+    response = mock.MagicMock()
+    response.__enter__.return_value.headers = {"content-length": "8"}
+    response.__enter__.return_value.__iter__.return_value = iter([b"adb", b"bytes"])
+    dest = temp_dir / PlatformTools.PLATFORM_TOOLS_ZIP
+
+    with mock.patch("emu.utils.requests.get", return_value=response):
+        assert PlatformTools().download(dest) == dest
+
+    assert dest.read_bytes() == b"adbbytes"
+    assert list(temp_dir.iterdir()) == [dest]
@@ -0,0 +1,156 @@
+# Copyright 2026 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for the host port allocator."""
+import multiprocessing
+import random
+import socket
+import unittest.mock as mock
+from contextlib import closing
+
+import pytest
+
+from emu.containers import port_allocator
+from emu.containers.port_allocator import (
+    EmulatorPorts,
+    PortAllocator,
+    PortsExhaustedException,
+    launch,
+)
+
+
+def _is_free(port):
+    with closing(socket.socket(socket.AF_INET, socket.SOCK_STREAM)) as sock:
+        try:
+            sock.bind(("127.0.0.1", port))
+            return True
+        except OSError:
+            return False
+
+
+@pytest.fixture
+def first_port():
+    """The first of 9 free ports, below the ephemeral range so other connections do not take them."""
+    start = random.randrange(20000, 30000)
+    for port in range(start, start + 1000):
+        if all(_is_free(p) for p in range(port, port + 9)):
+            return port
+    pytest.skip("No free ports")
+
+
+def _allocator(first_port, **kwargs):
+    return PortAllocator(first_port, first_port + 8, host="127.0.0.1", **kwargs)
+
+
+def test_allocates_distinct_triples(first_port):
+    allocator = _allocator(first_port)
+
+    first = allocator.allocate("a")
+    second = allocator.allocate("b")
+
+    assert first == EmulatorPorts(first_port, first_port + 1, first_port + 2)
+    assert second == EmulatorPorts(first_port + 3, first_port + 4, first_port + 5)
+    assert first.port_map() == {"5554/tcp": first_port, "5555/tcp": first_port + 1, "8554/tcp": first_port + 2}
+
+
+def test_skips_ports_in_use(first_port):
+    allocator = _allocator(first_port)
+    with closing(socket.socket(socket.AF_INET, socket.SOCK_STREAM)) as busy:
+        busy.bind(("127.0.0.1", first_port + 1))
+        busy.listen()
+        assert allocator.allocate().console == first_port + 3
+
+
+def test_exhausted_and_released(first_port):
+    allocator = _allocator(first_port)
+    allocated = [allocator.allocate() for _ in range(3)]
+
+    with pytest.raises(PortsExhaustedException):
+        allocator.allocate()
+
+    allocator.release(allocated[1])
+    assert allocator.allocate() == allocated[1]
+
+
+@pytest.fixture
+def live_containers(monkeypatch):
+    """The names of the containers that exist on the host."""
+    names = set()
+    monkeypatch.setattr(port_allocator, "_live_containers", lambda: names)
+    return names
+
+
+def test_state_file_is_shared(first_port, temp_dir, live_containers):
+    live_containers.add("emulator_1")
+    state = temp_dir / "ports.json"
+    _allocator(first_port, state_file=state).allocate("emulator_1")
+
+    assert _allocator(first_port, state_file=state).allocate().console == first_port + 3
+
+
+def test_launch_returns_handle_and_stop_releases(first_port):
+    allocator = _allocator(first_port)
+    container = mock.Mock()
+    container.launch.return_value.name = "emulator_1"
+
+    handle = launch(container, allocator)
+
+    container.launch.assert_called_once_with(handle.ports.port_map(), None, False, None)
+    assert allocator.allocations == {first_port: "emulator_1"}
+    assert handle.adb_address() == f"localhost:{first_port + 1}"
+    handle.stop()
+    assert allocator.allocations == {}
+
+
+def test_failed_launch_releases_ports(first_port):
+    allocator = _allocator(first_port)
+    container = mock.Mock()
+    container.launch.return_value = None
+
+    assert launch(container, allocator) is None
+    assert allocator.allocations == {}
+
+
+def test_allocations_of_removed_containers_are_reclaimed(first_port, temp_dir, live_containers):
+    state = temp_dir / "ports.json"
+    _allocator(first_port, state_file=state).allocate("emulator_1")
+    _allocator(first_port, state_file=state).allocate("pid:999999999")
+
+    # Neither the container nor the process exist anymore.
+    assert _allocator(first_port, state_file=state).allocate("emulator_2").console == first_port
+
+
+def _allocate_in_process(first_port, state, results, done):
+    allocator = _allocator(first_port, state_file=state)
+    results.put(allocator.allocate().console)
+    # Stay alive, the allocation of an exited process is reclaimed.
+    done.wait(30)
+
+
+def test_processes_do_not_share_ports(first_port, temp_dir):
+    state = temp_dir / "ports.json"
+    results, done = multiprocessing.Queue(), multiprocessing.Event()
+    processes = [
+        multiprocessing.Process(target=_allocate_in_process, args=(first_port, state, results, done))
+        for _ in range(3)
+    ]
+    for process in processes:
+        process.start()
+    try:
+        consoles = sorted(results.get(timeout=30) for _ in processes)
+    finally:
+        done.set()
+        for process in processes:
+            process.join(timeout=30)
+
+    assert consoles == [first_port, first_port + 3, first_port + 6]
@@ -0,0 +1,93 @@
+# Copyright 2026 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for log based boot detection."""
+import socket
+import time
+import unittest.mock as mock
+from contextlib import closing
+
+import pytest
+
+from emu.containers.readiness import (
+    BootTimeoutException,
+    DeviceBootException,
+    parse_line,
+    split_lines,
+    wait_for_boot,
+    wait_for_port,
+)
+
+
+def _container(chunks):
+    container = mock.Mock()
+    container.name = "emulator_1"
+    container.logs.return_value = iter(chunks)
+    return container
+
+
+@pytest.mark.parametrize(
+    "line, expected",
+    [
+        ("kernel: [    0.000000] Linux version 5.4", ("kernel", "[    0.000000] Linux version 5.4")),
+        ("logcat: 01-01 I/ActivityManager: Start proc", ("logcat", "01-01 I/ActivityManager: Start proc")),
+        ("emulator: No adb key provided", ("emulator", "No adb key provided")),
+        ("INFO    | Boot completed in 1234 ms", ("emulator", "INFO    | Boot completed in 1234 ms")),
+        (
+            '{"time":"2026-10-19T10:00:00.123Z","channel":"logcat","message":"I/adbd: started"}',
+            ("logcat", "I/adbd: started"),
+        ),
+        ('{"time": broken', ("emulator", '{"time": broken')),
+    ],
+)
+def test_parse_line(line, expected):
+    assert parse_line(line) == expected
+
+
+def test_split_lines_joins_partial_chunks():
+    assert list(split_lines([b"kernel: a", b"b\nlogcat: c\n", b"tail"])) == [
+        "kernel: ab",
+        "logcat: c",
+        "tail",
+    ]
+
+
+def test_boot_detected_from_kernel_log():
+    container = _container([b"kernel: init: processing action (sys.boot_completed=1 && )\n"])
+    assert wait_for_boot(container, timeout=5) < 5
+
+
+def test_boot_detected_from_emulator_output():
+    container = _container([b"emulator: launching\n", b"INFO    | Boot completed in 1234 ms\n"])
+    assert wait_for_boot(container, timeout=5) < 5
+
+
+def test_exited_container_fails():
+    with pytest.raises(DeviceBootException):
+        wait_for_boot(_container([b"emulator: launching\n"]), timeout=5)
+
+
+def test_timeout():
+    def slow():
+        yield b"emulator: launching\n"
+        time.sleep(1)
+
+    with pytest.raises(BootTimeoutException):
+        wait_for_boot(_container(slow()), timeout=0.1)
+
+
+def test_wait_for_port():
+    with closing(socket.socket(socket.AF_INET, socket.SOCK_STREAM)) as server:
+        server.bind(("127.0.0.1", 0))
+        server.listen()
+        assert wait_for_port("127.0.0.1", server.getsockname()[1], timeout=5) < 5
@@ -0,0 +1,143 @@
+# Copyright 2026 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import unittest.mock as mock
+
+import pytest
+
+from emu.containers.docker_container import DockerContainer
+from emu.containers.resource_profile import (
+    DATA_PARTITION_LABEL,
+    PROFILES,
+    SNAPSHOT_RESOURCES_LABEL,
+    ResourceProfile,
+    ephemeral_tmpfs,
+    get_profile,
+    size_mb,
+    tmpfs_size_mb,
+)
+
+
+class _Image(DockerContainer):
+    def image_name(self):
+        return "emulator"
+
+    def docker_tag(self):
+        return "latest"
+
+    def write(self, dest):
+        pass
+
+
+@pytest.fixture
+def fake_client(monkeypatch):
+    client = mock.Mock()
+    monkeypatch.setattr("emu.containers.docker_container.docker.from_env", lambda: client)
+    image = mock.Mock()
+    image.tags = ["emulator:latest"]
+    client.images.list.return_value = [image]
+    return client
+
+
+def test_unpinned_profile_limits_cpus():
+    profile = ResourceProfile("test", cores=2, ram_mb=2048, overhead_mb=1024, shm_size="64m")
+    assert profile.docker_args() == {
+        "mem_limit": "3072m",
+        "shm_size": "64m",
+        "nano_cpus": 2_000_000_000,
+    }
+
+
+def test_pinned_profile_uses_cpuset():
+    profile = get_profile("medium", cpuset="4-7")
+    args = profile.docker_args()
+    assert args["cpuset_cpus"] == "4-7"
+    assert "nano_cpus" not in args
+    assert args["tmpfs"] == {"/tmp": "size=1g"}
+    # The predefined profile is left untouched.
+    assert PROFILES["medium"].cpuset is None
+
+
+def test_environment_matches_avd_to_profile():
+    assert PROFILES["small"].environment() == {"EMULATOR_CORES": "2", "EMULATOR_RAM_MB": "2048"}
+
+
+def test_launch_applies_profile(fake_client):
+    _Image().launch({"5555/tcp": 5555}, PROFILES["large"])
+
+    kwargs = fake_client.containers.run.call_args.kwargs
+    assert kwargs["ports"] == {"5555/tcp": 5555}
+    assert kwargs["mem_limit"] == "9728m"
+    assert kwargs["shm_size"] == "512m"
+    assert kwargs["environment"] == {"EMULATOR_CORES": "8", "EMULATOR_RAM_MB": "8192"}
+
+
+def test_launch_without_profile_is_unlimited(fake_client):
+    _Image().launch({})
+
+    kwargs = fake_client.containers.run.call_args.kwargs
+    assert "mem_limit" not in kwargs
+    assert "environment" not in kwargs
+
+
+@pytest.mark.parametrize(
+    "size, expected", [("10G", 10240), ("800M", 800), ("512MB", 512), ("1073741824", 1024)]
+)
+def test_size_mb(size, expected):
+    assert size_mb(size) == expected
+
+
+def test_ephemeral_tmpfs_sized_after_data_partition():
+    assert ephemeral_tmpfs("4G") == {"/data": "size=5120m", "/tmp": "size=1g"}
+
+
+def test_ephemeral_launch_uses_image_label(fake_client):
+    fake_client.images.list.return_value[0].labels = {DATA_PARTITION_LABEL: "2G"}
+    _Image().launch({}, PROFILES["small"], ephemeral=True)
+
+    kwargs = fake_client.containers.run.call_args.kwargs
+    # The /tmp of the profile is kept, and the limit makes room for /data.
+    assert kwargs["tmpfs"] == {"/data": "size=3072m", "/tmp": "size=512m"}
+    assert kwargs["mem_limit"] == f"{2048 + 1536 + 3072}m"
+    # The profile itself is not modified.
+    assert PROFILES["small"].tmpfs == {"/tmp": "size=512m"}
+    assert PROFILES["small"].overhead_mb == 1536
+
+
+def test_ephemeral_launch_without_profile(fake_client):
+    fake_client.images.list.return_value[0].labels = {}
+    _Image().launch({}, ephemeral=True)
+
+    kwargs = fake_client.containers.run.call_args.kwargs
+    assert kwargs["tmpfs"] == {"/data": "size=11264m", "/tmp": "size=1g"}
+    assert "mem_limit" not in kwargs
+
+
+def test_ephemeral_profile_accounts_for_tmpfs():
+    profile = ResourceProfile("test", cores=2, ram_mb=2048, overhead_mb=1024).ephemeral("4G")
+
+    assert profile.tmpfs == {"/data": "size=5120m", "/tmp": "size=1g"}
+    assert profile.docker_args()["mem_limit"] == f"{2048 + 1024 + 5120 + 1024}m"
+
+
+@pytest.mark.parametrize("options, expected", [("size=1g", 1024), ("mode=1777,size=512m", 512), ("rw", 0)])
+def test_tmpfs_size_mb(options, expected):
+    assert tmpfs_size_mb(options) == expected
+
+
+def test_snapshot_only_matches_bake_resources():
+    assert PROFILES["medium"].matches_snapshot({SNAPSHOT_RESOURCES_LABEL: "4:4096"})
+    assert not PROFILES["small"].matches_snapshot({SNAPSHOT_RESOURCES_LABEL: "4:4096"})
+    # Images without a recorded snapshot can run with any profile.
+    assert PROFILES["small"].matches_snapshot({})
+    assert PROFILES["small"].matches_snapshot(None)
@@ -0,0 +1,49 @@
+# Copyright 2026 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for the shared emulator runtime image, no docker daemon needed."""
+from emu.containers.emulator_container import EmulatorContainer
+from emu.containers.runtime_container import EmulatorRuntimeContainer
+
+
+def test_runtime_is_versioned_by_content():
+    runtime = EmulatorRuntimeContainer("us.gcr.io/emu")
+    assert runtime.docker_tag() == EmulatorRuntimeContainer().docker_tag()
+    assert runtime.full_name() == f"us.gcr.io/emu/emulator-runtime:{runtime.docker_tag()}"
+
+
+def test_runtime_writes_launcher_and_dependencies(temp_dir):
+    runtime = EmulatorRuntimeContainer("us.gcr.io/emu")
+    runtime.write(temp_dir)
+
+    dockerfile = (temp_dir / "Dockerfile").read_text()
+    assert "apt-get install" in dockerfile
+    assert (temp_dir / "launch-emulator.sh").exists()
+    assert (temp_dir / "default.pa").exists()
+    assert (temp_dir / "log-mux.pl").exists()
+
+
+def test_emulator_on_runtime_only_adds_payload(temp_dir, emulator_zip, system_image_container):
+    runtime = EmulatorRuntimeContainer("us.gcr.io/emu")
+    emulator = EmulatorContainer(
+        str(emulator_zip), system_image_container, "us.gcr.io/emu", runtime=runtime
+    )
+    emulator.write(temp_dir / "emulator")
+
+    dockerfile = (temp_dir / "emulator" / "Dockerfile").read_text()
+    assert f"FROM {runtime.full_name()} AS emulator" in dockerfile
+    assert "FROM us.gcr.io/emu/sys-30-google-x64:6848311 AS system_image" in dockerfile
+    assert "apt-get" not in dockerfile
+    assert not (temp_dir / "emulator" / "launch-emulator.sh").exists()
+    assert '"-shell-serial"' in (temp_dir / "emulator" / "launch-flags.sh").read_text()
+    assert (temp_dir / "emulator" / "emu" / "emulator" / "emulator").exists()
@@ -11,9 +11,12 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import os
+
 import pytest
 
-from emu.template_writer import TemplateWriter
+from emu import template_writer
+from emu.template_writer import Render, TemplateWriter, write_all
 
 
 def test_writer_writes_file(temp_dir):
@@ -26,3 +29,48 @@ def test_renames_file(temp_dir):
     writer = TemplateWriter(temp_dir)
     writer.write_template("cloudbuild.README.MD", {}, "foo")
     assert (temp_dir / "foo").exists()
+
+
+def test_writers_share_environment(temp_dir):
+    assert TemplateWriter(temp_dir).env is TemplateWriter(temp_dir / "other").env
+
+
+def test_write_all(temp_dir):
+    written = write_all(
+        [
+            Render(temp_dir / "a", "default.pa", {}),
+            Render(temp_dir / "b", "launch-flags.sh", {"extra": '"-no-audio"'}),
+            Render(temp_dir / "a", "cloudbuild.README.MD", {}, "README.MD"),
+        ]
+    )
+    assert written == [temp_dir / "a" / "default.pa", temp_dir / "b" / "launch-flags.sh", temp_dir / "a" / "README.MD"]
+    assert '"-no-audio"' in (temp_dir / "b" / "launch-flags.sh").read_text()
+
+
+def test_compiled_templates_are_cached_on_disk(temp_dir, monkeypatch):
+    cache = temp_dir / "cache"
+    monkeypatch.setattr(template_writer, "TEMPLATE_CACHE", str(cache))
+    template_writer.shared_environment.cache_clear()
+    try:
+        template_writer.shared_environment()
+        # Templates are only compiled once they are used.
+        assert list(cache.iterdir()) == []
+
+        TemplateWriter(temp_dir).write_template("default.pa", {})
+        TemplateWriter(temp_dir).write_template("default.pa", {})
+        assert len(list(cache.glob("emu-docker-*.cache"))) == 1
+    finally:
+        template_writer.shared_environment.cache_clear()
+
+
+def test_unchanged_files_are_not_rewritten(temp_dir):
+    renders = [
+        Render(temp_dir, "launch-flags.sh", {"extra": '"-no-audio"'}),
+        Render(temp_dir, "default.pa", {}),
+    ]
+    assert write_all(renders) == [temp_dir / "launch-flags.sh", temp_dir / "default.pa"]
+    os.utime(temp_dir / "default.pa", ns=(0, 0))
+
+    renders[0] = Render(temp_dir, "launch-flags.sh", {"extra": '"-no-window"'})
+    assert write_all(renders) == [temp_dir / "launch-flags.sh"]
+    assert (temp_dir / "default.pa").stat().st_mtime_ns == 0
@@ -0,0 +1,86 @@
+# Copyright 2026 The Android Open Source Project
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import io
+import logging
+
+import pytest
+
+from emu import tracing
+from emu.template_writer import TemplateWriter
+
+
+@pytest.fixture(autouse=True)
+def restore():
+    tracing.reset()
+    yield
+    tracing.configure("off")
+    tracing.reset()
+
+
+def _expensive():
+    raise AssertionError("Fields must not be formatted")
+
+
+def test_disabled_tracing_records_nothing():
+    with tracing.span("template", "default.pa", props=_expensive):
+        pass
+    tracing.event("catalog", "find_image", matches=_expensive)
+    assert tracing.summary() == {}
+
+
+def test_counts_and_timings():
+    tracing.configure("counts")
+    for _ in range(3):
+        with tracing.span("docker", "pull", image=_expensive):
+            pass
+    tracing.event("catalog", "find_image")
+
+    summary = tracing.summary()
+    assert sorted(summary) == ["catalog:find_image", "docker:pull"]
+    assert summary["docker:pull"]["count"] == 3
+    assert summary["docker:pull"]["max"] <= summary["docker:pull"]["total"]
+
+
+def test_errors_are_recorded(caplog):
+    tracing.configure("events")
+    with caplog.at_level(logging.DEBUG, logger="emu.tracing"):
+        with pytest.raises(ValueError):
+            with tracing.span("docker", "build"):
+                raise ValueError()
+    assert "error='ValueError'" in caplog.text
+
+
+def test_events_are_sampled_and_truncated(caplog):
+    tracing.configure("events", sample=0.0)
+    with caplog.at_level(logging.DEBUG, logger="emu.tracing"):
+        tracing.event("catalog", "find_image", matches=_expensive)
+        assert not caplog.records
+
+        tracing.configure("events", sample=1.0)
+        tracing.event("catalog", "find_image", matches=lambda: ["image"] * 1000)
+    assert len(caplog.records) == 1
+    assert len(caplog.records[0].getMessage()) < 200
+    assert tracing.summary()["catalog:find_image"]["count"] == 2
+
+
+def test_template_rendering_is_traced(temp_dir):
+    tracing.configure("counts")
+    writer = TemplateWriter(temp_dir)
+    writer.write_template("default.pa", {})
+    writer.write_template("default.pa", {})
+    assert tracing.summary()["template:default.pa"]["count"] == 2
+
+    report = io.StringIO()
+    tracing.report(report)
+    assert "template:default.pa" in report.getvalue()